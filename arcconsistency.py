@@ -1,3 +1,8 @@
+from collections import deque
+
+import numpy as np
+
+from misc import bits
 from pattern import Pattern
 
 
@@ -31,70 +36,91 @@ class ArcConsistency:
                 return True
         return False
 
+    # Removes candidates until every candidate of a node has a witness among the candidates of every neighbour (AC-3).
+    # The candidate sets are bitmasks over the positions in pattern2.nodes, so a candidate has a witness iff its
+    # successors (or predecessors) intersect the candidates of the neighbour. A worklist holds the arcs that have to
+    # be revised, and when the candidates of a node shrink, only the arcs that check against this node are added
+    # again. A loop in pattern1 only allows candidates with a loop of the same color.
     def do_arc_consistency(self):
-        change = True
-        while change:
-            total_number_of_candidates = sum(len(list) for list in self.candidates.values())
-            for node1 in self.pattern1.nodes:
-                for node2 in self.pattern1.get_green_successors(node1):
-                    for candidate1 in self.candidates[node1]:
-                        found_witness = False
-
-                        # green successor
-                        for candidate2 in self.candidates[node2]:
-                            if self.pattern2.has_green_edge(candidate1, candidate2):
-                                found_witness = True
-                                break
-                        if not found_witness:
-                            print(f"Edge {node1}-{node2} first node candidate {candidate1} removed")
-                            self.candidates[node1].remove(candidate1)
-                            break
-                    for candidate2 in self.candidates[node2]:
-                        found_witness = False
-
-                        # green successor
-                        for candidate1 in self.candidates[node1]:
-                            if self.pattern2.has_green_edge(candidate1, candidate2):
-                                found_witness = True
-                                break
-                        if not found_witness:
-                            print(f"Edge {node1}-{node2} second node candidate {candidate2} removed")
-                            self.candidates[node2].remove(candidate2)
-                            break
-
-            for node1 in self.pattern1.nodes:
-                for node2 in self.pattern1.get_red_successors(node1):
-                    for candidate1 in self.candidates[node1]:
-                        found_witness = False
-
-                        # green successor
-                        for candidate2 in self.candidates[node2]:
-                            if self.pattern2.has_red_edge(candidate1, candidate2):
-                                found_witness = True
-                                break
-                        if not found_witness:
-                            #print(f"Edge {node1}-{node2} first node candidate {candidate1} removed")
-                            self.candidates[node1].remove(candidate1)
-                            break
-                    for candidate2 in self.candidates[node2]:
-                        found_witness = False
-
-                        # green successor
-                        for candidate1 in self.candidates[node1]:
-                            if self.pattern2.has_red_edge(candidate1, candidate2):
-                                found_witness = True
-                                break
-                        if not found_witness:
-                            #print(f"Edge {node1}-{node2} second node candidate {candidate2} removed")
-                            self.candidates[node2].remove(candidate2)
-                            break
-
+        nodes2 = self.pattern2.nodes
+        position = {}
+        for j in range(len(nodes2)):
+            position[nodes2[j]] = j
+        successors = {"green": [0] * len(nodes2), "red": [0] * len(nodes2)}
+        predecessors = {"green": [0] * len(nodes2), "red": [0] * len(nodes2)}
+        for j in range(len(nodes2)):
+            for color, get_successors in (("green", self.pattern2.get_green_successors),
+                                          ("red", self.pattern2.get_red_successors)):
+                for node in get_successors(nodes2[j]):
+                    successors[color][j] |= 1 << position[node]
+                    predecessors[color][position[node]] |= 1 << j
+
+        domains = {}
+        for node in self.pattern1.nodes:
+            domains[node] = sum(1 << position[candidate] for candidate in self.candidates[node])
+        # an arc (x, y, supports) is revised by keeping the candidates a of x with supports[a] & domains[y] != 0
+        arcs_to = {node: [] for node in self.pattern1.nodes}
+        for color, get_successors in (("green", self.pattern1.get_green_successors),
+                                      ("red", self.pattern1.get_red_successors)):
             for node1 in self.pattern1.nodes:
-                if len(self.candidates[node1]) == 0:
-                    return
-
-            change = True
-            new_total_number_of_candidates = sum(len(list) for list in self.candidates.values())
-            if new_total_number_of_candidates == total_number_of_candidates:
-                change = False
+                for node2 in get_successors(node1):
+                    if node1 == node2:
+                        domains[node1] &= sum(1 << j for j in range(len(nodes2)) if (successors[color][j] >> j) & 1)
+                    else:
+                        arcs_to[node2].append((node1, node2, successors[color]))
+                        arcs_to[node1].append((node2, node1, predecessors[color]))
+
+        worklist = deque(arc for arcs in arcs_to.values() for arc in arcs)
+        while worklist:
+            x, y, supports = worklist.popleft()
+            domain = domains[x]
+            for a in bits(domain):
+                if supports[a] & domains[y] == 0:
+                    domain &= ~(1 << a)
+            if domain != domains[x]:
+                domains[x] = domain
+                if domain == 0:
+                    break
+                worklist.extend(arcs_to[x])
 
+        for node in self.pattern1.nodes:
+            self.candidates[node] = {nodes2[j] for j in bits(domains[node])}
+
+
+# Returns the arc consistent candidates for the images of the nodes of T_n under a homomorphism into the pattern given
+# by its green and red successor lists, as a boolean array whose entry [i, j] says whether node i may go to node j.
+# Node i of T_n has the green predecessor i // 2, the red predecessor i // 2 + 2^(n-1), and the successors 2i mod 2^n
+# and 2i+1 mod 2^n, which are green if i < 2^(n-1) and red otherwise. The loops at 0 and at 2^n - 1 only allow nodes
+# with a green and a red loop, respectively. The worklist is the array of nodes whose candidates changed, and all
+# their neighbours are revised at once by multiplying the candidates with the adjacency matrices of the pattern.
+def get_t_n_domains(n, number_of_nodes, green, red):
+    number_of_t_n_nodes = 2**n
+    half = number_of_t_n_nodes // 2
+    green_matrix = np.zeros((number_of_nodes, number_of_nodes), dtype=np.float32)
+    red_matrix = np.zeros((number_of_nodes, number_of_nodes), dtype=np.float32)
+    for j in range(number_of_nodes):
+        green_matrix[j, green[j]] = 1
+        red_matrix[j, red[j]] = 1
+    domains = np.ones((number_of_t_n_nodes, number_of_nodes), dtype=bool)
+    domains[0] &= np.diagonal(green_matrix) > 0
+    domains[-1] &= np.diagonal(red_matrix) > 0
+
+    # entry [i, j] says whether some candidate c of nodes[i] has matrix[c, j] = 1
+    def witnesses(nodes, matrix):
+        return domains[nodes].astype(np.float32) @ matrix > 0
+
+    changed = np.arange(number_of_t_n_nodes)
+    while len(changed) > 0:
+        affected = np.unique(np.concatenate((changed // 2, changed // 2 + half,
+                                             2*changed % number_of_t_n_nodes, (2*changed + 1) % number_of_t_n_nodes)))
+        # a candidate needs a witness at both predecessors and at both successors
+        from_predecessors = witnesses(affected // 2, green_matrix) & witnesses(affected // 2 + half, red_matrix)
+        first = 2*affected % number_of_t_n_nodes
+        second = (2*affected + 1) % number_of_t_n_nodes
+        to_green_successors = witnesses(first, green_matrix.T) & witnesses(second, green_matrix.T)
+        to_red_successors = witnesses(first, red_matrix.T) & witnesses(second, red_matrix.T)
+        to_successors = np.where((affected < half)[:, None], to_green_successors, to_red_successors)
+        revised = domains[affected] & from_predecessors & to_successors
+        changed = affected[(revised != domains[affected]).any(axis=1)]
+        domains[affected] = revised
+    return domains
@@ -0,0 +1,151 @@
+import numpy as np
+
+# The cheap tests of codes.py on whole arrays of codes. A code of a pattern with n <= 5 nodes has at most 2*25 = 50
+# bits, so the codes are stored as uint64 and every test is a fixed sequence of shifts, masks and popcounts on the
+# whole array. As in codes.py, bit number_of_nodes*j+i of the green (or red) half is the edge from node i to node j.
+
+MAX_NUMBER_OF_NODES = 5
+
+
+# Returns the codes as an uint64 array and checks that they fit.
+def as_code_array(number_of_nodes, codes):
+    if number_of_nodes > MAX_NUMBER_OF_NODES:
+        raise ValueError(f"Codes of patterns with {number_of_nodes} nodes do not fit into 64 bits.")
+    return np.asarray(codes, dtype=np.uint64)
+
+
+# Returns the predecessor masks of both colors as two lists of arrays, like codes.get_green_predecessor_masks and
+# codes.get_red_predecessor_masks.
+def get_predecessor_masks(number_of_nodes, codes):
+    block = np.uint64((1 << number_of_nodes) - 1)
+    green = [(codes >> np.uint64(number_of_nodes*j)) & block for j in range(number_of_nodes)]
+    red = [(codes >> np.uint64(number_of_nodes*(number_of_nodes + j))) & block for j in range(number_of_nodes)]
+    return green, red
+
+
+# Like codes.transpose_masks: turns predecessor masks into successor masks.
+def transpose_masks(number_of_nodes, masks):
+    result = [np.zeros_like(masks[0]) for _ in range(number_of_nodes)]
+    for j in range(number_of_nodes):
+        for i in range(number_of_nodes):
+            result[i] |= ((masks[j] >> np.uint64(i)) & np.uint64(1)) << np.uint64(j)
+    return result
+
+
+def get_diagonal_mask(number_of_nodes):
+    return np.uint64(sum(1 << (number_of_nodes*j + j) for j in range(number_of_nodes)))
+
+
+def has_double_selfloop(number_of_nodes, codes):
+    return codes & (codes >> np.uint64(number_of_nodes*number_of_nodes)) & get_diagonal_mask(number_of_nodes) != 0
+
+
+def has_green_selfloop(number_of_nodes, codes):
+    return codes & get_diagonal_mask(number_of_nodes) != 0
+
+
+def has_red_selfloop(number_of_nodes, codes):
+    return (codes >> np.uint64(number_of_nodes*number_of_nodes)) & get_diagonal_mask(number_of_nodes) != 0
+
+
+# Like codes.has_useless_nodes.
+def has_useless_nodes(number_of_nodes, codes):
+    green_pred, red_pred = get_predecessor_masks(number_of_nodes, codes)
+    useless = np.zeros(len(codes), dtype=bool)
+    with_successor = np.zeros_like(codes)
+    for j in range(number_of_nodes):
+        useless |= (green_pred[j] == 0) | (red_pred[j] == 0)
+        with_successor |= green_pred[j] | red_pred[j]
+    useless |= with_successor != np.uint64((1 << number_of_nodes) - 1)
+    green_succ = transpose_masks(number_of_nodes, green_pred)
+    red_succ = transpose_masks(number_of_nodes, red_pred)
+    for a in range(number_of_nodes):
+        for b in range(number_of_nodes):
+            if a != b:
+                useless |= (red_pred[a] & ~red_pred[b] == 0) & (red_succ[a] & ~red_succ[b] == 0) & \
+                    (green_pred[a] & ~green_pred[b] == 0) & (green_succ[a] & ~green_succ[b] == 0)
+    return useless
+
+
+# Like codes.has_selfloop_that_can_reach_all, for the successor masks of one color. The nodes reachable from a node
+# are found by number_of_nodes - 1 rounds that add the successors of all nodes reached so far.
+def has_selfloop_that_can_reach_all(number_of_nodes, successor_masks):
+    all_nodes = np.uint64((1 << number_of_nodes) - 1)
+    one = np.uint64(1)
+    result = np.zeros(len(successor_masks[0]), dtype=bool)
+    for node in range(number_of_nodes):
+        reachable = np.full_like(successor_masks[0], 1 << node)
+        for _ in range(number_of_nodes - 1):
+            successors = np.zeros_like(reachable)
+            for i in range(number_of_nodes):
+                successors |= np.where((reachable >> np.uint64(i)) & one == one, successor_masks[i], np.uint64(0))
+            reachable |= successors
+        has_selfloop = (successor_masks[node] >> np.uint64(node)) & one == one
+        result |= has_selfloop & (reachable == all_nodes)
+    return result
+
+
+def check_red_connected(number_of_nodes, codes):
+    red_pred = get_predecessor_masks(number_of_nodes, codes)[1]
+    return has_selfloop_that_can_reach_all(number_of_nodes, transpose_masks(number_of_nodes, red_pred))
+
+
+def check_green_connected(number_of_nodes, codes):
+    green_pred = get_predecessor_masks(number_of_nodes, codes)[0]
+    return has_selfloop_that_can_reach_all(number_of_nodes, transpose_masks(number_of_nodes, green_pred))
+
+
+# Like Pattern.check_code_normal_form: at least as many green as red edges, and the blocks of the green half, and
+# then those of the red half, have non increasing numbers of edges.
+def check_code_normal_form(number_of_nodes, codes):
+    green_pred, red_pred = get_predecessor_masks(number_of_nodes, codes)
+    green_counts = [np.bitwise_count(mask) for mask in green_pred]
+    red_counts = [np.bitwise_count(mask) for mask in red_pred]
+    normal_form = sum(red_counts) <= sum(green_counts)
+    for i in range(number_of_nodes - 1):
+        normal_form &= green_counts[i] >= green_counts[i + 1]
+        normal_form &= (green_counts[i] != green_counts[i + 1]) | (red_counts[i] >= red_counts[i + 1])
+    return normal_form
+
+
+# Returns the results of codes.screen_code for all codes as an int8 array, with -1 for the codes that pass all the
+# tests. Every test is only applied to the codes that passed the tests before it, so the expensive ones run on few
+# codes.
+def screen_codes(number_of_nodes, codes):
+    codes = as_code_array(number_of_nodes, codes)
+    results = np.full(len(codes), -1, dtype=np.int8)
+    remaining = np.arange(len(codes))
+    tests = [(1, lambda c: has_double_selfloop(number_of_nodes, c)),
+             (0, lambda c: ~has_green_selfloop(number_of_nodes, c) | ~has_red_selfloop(number_of_nodes, c)),
+             (2, lambda c: has_useless_nodes(number_of_nodes, c)),
+             (2, lambda c: ~check_red_connected(number_of_nodes, c)),
+             (2, lambda c: ~check_green_connected(number_of_nodes, c))]
+    for result, test in tests:
+        rejected = test(codes[remaining])
+        results[remaining[rejected]] = result
+        remaining = remaining[~rejected]
+    return results
+
+
+# Returns the codes that pass codes.screen_code, and if normal_form is True also Pattern.check_code_normal_form.
+def get_survivors(number_of_nodes, codes, normal_form=False):
+    codes = as_code_array(number_of_nodes, codes)
+    survivors = codes[screen_codes(number_of_nodes, codes) == -1]
+    if normal_form:
+        survivors = survivors[check_code_normal_form(number_of_nodes, survivors)]
+    return survivors
+
+
+# Returns a list with the number of codes that screen_codes rejects with each result, as long as the outcome lists of
+# main.check_pattern_range.
+def count_rejections(results):
+    return np.bincount(results[results != -1], minlength=7).tolist()
+
+
+# Screens the codes start <= code < finish in blocks of block_size, and yields for every block the codes that pass
+# codes.screen_code, in increasing order, together with count_rejections of the block.
+def screen_code_blocks(number_of_nodes, start, finish, block_size=2**20):
+    for block_start in range(start, finish, block_size):
+        block = np.arange(block_start, min(finish, block_start + block_size), dtype=np.uint64)
+        results = screen_codes(number_of_nodes, block)
+        yield block[results == -1].tolist(), count_rejections(results)
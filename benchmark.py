@@ -0,0 +1,265 @@
+import sys
+import time
+
+import codes
+import matrixlifting
+from bitrelation import BitRelation
+from caleygraph import CaleyGraph
+from debruijn import DeBruijnHomSolver
+from pattern import Pattern
+from relation import Relation
+from satsolver import IncrementalHomSolver, SatSolver
+
+
+# Reads a file with one pattern code per line (optionally prefixed by "number_of_nodes,") and returns the codes.
+def read_codes(filename):
+    result = []
+    input_file = open(filename, "r")
+    for line in input_file:
+        line = line.strip()
+        if line == "":
+            continue
+        result.append(int(line.split(",")[-1]))
+    input_file.close()
+    return result
+
+
+# Calls the function once and returns the result together with the number of seconds it took.
+def time_call(function, *args):
+    start_time = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start_time
+
+
+def lifting_chain(code, relation_class, max_size):
+    pattern = Pattern.from_code(codes.get_number_of_nodes(code), code, relation_class)
+    pattern.remove_useless_nodes()
+    pattern.remove_useless_edges()
+    return pattern.get_liftings(max_size)
+
+
+def caley_graph(code, relation_class):
+    pattern = Pattern.from_code(codes.get_number_of_nodes(code), code, relation_class)
+    return CaleyGraph(pattern)
+
+
+# The preprocessing of main.check_pattern as it is done on a Pattern object. Returns the same values as
+# codes.screen_code.
+def screen_pattern(number_of_nodes, code):
+    pattern = Pattern.from_code(number_of_nodes, code)
+    if pattern.has_double_selfloop():
+        return 1
+    if not pattern.has_green_selfloop() or not pattern.has_red_selfloop():
+        return 0
+    if pattern.has_useless_nodes():
+        return 2
+    if not pattern.check_red_connected():
+        return 2
+    if not pattern.check_green_connected():
+        return 2
+    return None
+
+
+def screen_codes(screen, number_of_nodes, codes_to_check):
+    return [screen(number_of_nodes, code) for code in codes_to_check]
+
+
+# Compares the preprocessing on Pattern objects with the preprocessing on the codes.
+def benchmark_code_screening(number_of_nodes, codes_to_check):
+    results, seconds_patterns = time_call(screen_codes, screen_pattern, number_of_nodes, codes_to_check)
+    code_results, seconds_codes = time_call(screen_codes, codes.screen_code, number_of_nodes, codes_to_check)
+    if results != code_results:
+        raise ValueError("The preprocessing on patterns and on codes disagree.")
+    survivors = results.count(None)
+    print(f"Screened {len(codes_to_check)} codes, {survivors} survived.")
+    print(f"Pattern objects: {len(codes_to_check) / seconds_patterns:>12,.0f} codes per second")
+    print(f"Codes:           {len(codes_to_check) / seconds_codes:>12,.0f} codes per second")
+
+
+# Lifts the pattern with the given function as long as it has at most max_size nodes. Returns the sizes of the
+# liftings.
+def lift_up_to(pattern, lift, max_size):
+    sizes = [pattern.get_number_of_nodes()]
+    while sizes[-1] <= max_size:
+        pattern = lift(pattern)
+        sizes.append(pattern.get_number_of_nodes())
+        if sizes[-1] == sizes[-2]:
+            break
+    return sizes
+
+
+def lift_with_patterns(pattern):
+    lifting = pattern.lifting()
+    lifting.remove_useless_nodes()
+    return lifting.normalize_names()
+
+
+class MatrixPattern:
+
+    def __init__(self, green, red):
+        self.green = green
+        self.red = red
+
+    def get_number_of_nodes(self):
+        return len(self.green)
+
+
+def lift_with_matrices(pattern):
+    green, red = matrixlifting.lifting(pattern.green, pattern.red)
+    return MatrixPattern(*matrixlifting.remove_useless_nodes(green, red))
+
+
+# Compares the lifting chains computed with Relation patterns, BitRelation patterns and adjacency matrices.
+def benchmark_lifting_engines(codes_to_check, max_size=150):
+    for code in codes_to_check:
+        print(f"{code}:")
+        for name in ["Relation", "BitRelation", "Matrices"]:
+            relation_class = Relation if name == "Relation" else BitRelation
+            pattern = Pattern.from_code(codes.get_number_of_nodes(code), code, relation_class)
+            pattern.remove_useless_nodes()
+            pattern.remove_useless_edges()
+            if name == "Matrices":
+                pattern = MatrixPattern(*matrixlifting.pattern_to_matrices(pattern))
+                sizes, seconds = time_call(lift_up_to, pattern, lift_with_matrices, max_size)
+            else:
+                sizes, seconds = time_call(lift_up_to, pattern, lift_with_patterns, max_size)
+            print(f"    {name:<12} {seconds:>8.3f}s   {', '.join(str(size) for size in sizes)}")
+
+
+# Solves the depths 0, ..., max_depth with a new solver per depth until one is satisfiable. Returns that depth or -1.
+def search_depth_fresh(pattern, max_depth):
+    for n in range(max_depth + 1):
+        solver = SatSolver()
+        solver.make_hom_clauses_efficient(n, pattern)
+        satisfiable = solver.solve()
+        solver.delete()
+        if satisfiable:
+            return n
+    return -1
+
+
+# Like search_depth_fresh, but with one IncrementalHomSolver for all depths.
+def search_depth_incremental(pattern, max_depth):
+    solver = IncrementalHomSolver(pattern, max_depth)
+    for n in range(max_depth + 1):
+        solver.set_depth(n)
+        if solver.solve():
+            solver.delete()
+            return n
+    solver.delete()
+    return -1
+
+
+# Compares solving the depths of the homomorphism search with a new solver per depth and with one incremental solver.
+def benchmark_incremental_search(codes_to_check, max_depth=22):
+    print(f"{'code':>16} {'depth':>6} {'fresh':>10} {'incremental':>12}")
+    for code in codes_to_check:
+        pattern = Pattern.from_code(codes.get_number_of_nodes(code), code)
+        pattern.remove_useless_nodes()
+        pattern.remove_useless_edges()
+        depth, seconds_fresh = time_call(search_depth_fresh, pattern, max_depth)
+        incremental_depth, seconds_incremental = time_call(search_depth_incremental, pattern, max_depth)
+        if depth != incremental_depth:
+            raise ValueError(f"The searches disagree on {code}.")
+        print(f"{code:>16} {depth:>6} {seconds_fresh:>9.3f}s {seconds_incremental:>11.3f}s")
+
+
+# Like search_depth_fresh, but with DeBruijnHomSolver. The pattern is replaced by its last lifting with at most
+# max_size nodes, so that T_n only has to be mapped into it for n - number of liftings.
+def search_depth_de_bruijn(pattern, max_depth, max_size=30):
+    return search_depth_in_lifting(pattern, max_depth, max_size,
+                                   lambda n, lifting: DeBruijnHomSolver(n, lifting).solve())
+
+
+def search_depth_sat(pattern, max_depth, max_size=30):
+    def solve(n, lifting):
+        solver = build_solver(n, lifting)
+        satisfiable = solver.solve()
+        solver.delete()
+        return satisfiable
+    return search_depth_in_lifting(pattern, max_depth, max_size, solve)
+
+
+def search_depth_in_lifting(pattern, max_depth, max_size, solve):
+    liftings = pattern.get_liftings(max_size)
+    for n in range(len(liftings)):
+        if liftings[n].has_double_selfloop():
+            return n
+    best = len(liftings) - 1
+    for n in range(len(liftings), max_depth + 1):
+        if solve(n - best, liftings[best]):
+            return n
+    return -1
+
+
+# Compares the SAT solver with DeBruijnHomSolver on the homomorphism search, both on the same lifting.
+def benchmark_hom_backends(codes_to_check, max_depth=22):
+    print(f"{'code':>16} {'depth':>6} {'sat':>10} {'debruijn':>10}")
+    total_sat = 0
+    total_de_bruijn = 0
+    for code in codes_to_check:
+        pattern = Pattern.from_code(codes.get_number_of_nodes(code), code)
+        pattern.remove_useless_nodes()
+        pattern.remove_useless_edges()
+        depth, seconds_sat = time_call(search_depth_sat, pattern, max_depth)
+        de_bruijn_depth, seconds_de_bruijn = time_call(search_depth_de_bruijn, pattern, max_depth)
+        if depth != de_bruijn_depth:
+            raise ValueError(f"The backends disagree on {code}.")
+        total_sat += seconds_sat
+        total_de_bruijn += seconds_de_bruijn
+        print(f"{code:>16} {depth:>6} {seconds_sat:>9.3f}s {seconds_de_bruijn:>9.3f}s")
+    print(f"{'total':>16} {'':>6} {total_sat:>9.3f}s {total_de_bruijn:>9.3f}s")
+
+
+def build_solver(n, pattern):
+    solver = SatSolver()
+    solver.make_hom_clauses_efficient(n, pattern)
+    return solver
+
+
+# Reports for every depth how long it takes to build the CNF of the homomorphism search and to solve it.
+def benchmark_cnf_generation(code, depths):
+    pattern = Pattern.from_code(codes.get_number_of_nodes(code), code)
+    print(f"{'depth':>6} {'clauses':>12} {'build':>9} {'solve':>9}")
+    for n in depths:
+        solver, seconds_build = time_call(build_solver, n, pattern)
+        satisfiable, seconds_solve = time_call(solver.solve)
+        print(f"{n:>6} {solver.solver.nof_clauses():>12,} {seconds_build:>8.3f}s {seconds_solve:>8.3f}s"
+              f"   {'SAT' if satisfiable else 'UNSAT'}")
+        solver.delete()
+
+
+# Compares the set-based Relation with the bitmask-based BitRelation on the lifting chains and the Caley graphs
+# of the given codes.
+def benchmark_relation_engines(codes_to_check, max_size=50):
+    print(f"{'code':>16} {'lifting sizes':>28} {'Relation':>10} {'BitRelation':>12} {'speedup':>8}")
+    total_sets = 0
+    total_bits = 0
+    for code in codes_to_check:
+        liftings, seconds_sets = time_call(lifting_chain, code, Relation, max_size)
+        bit_liftings, seconds_bits = time_call(lifting_chain, code, BitRelation, max_size)
+        if [l.to_code() for l in liftings] != [l.to_code() for l in bit_liftings]:
+            raise ValueError(f"The relation engines disagree on the liftings of {code}.")
+        cg, cg_seconds_sets = time_call(caley_graph, code, Relation)
+        bit_cg, cg_seconds_bits = time_call(caley_graph, code, BitRelation)
+        seconds_sets += cg_seconds_sets
+        seconds_bits += cg_seconds_bits
+        total_sets += seconds_sets
+        total_bits += seconds_bits
+        sizes = ", ".join(str(l.get_number_of_nodes()) for l in liftings)
+        print(f"{code:>16} {sizes:>28} {seconds_sets:>9.3f}s {seconds_bits:>11.3f}s {seconds_sets / seconds_bits:>7.1f}x")
+    print(f"{'total':>16} {'':>28} {total_sets:>9.3f}s {total_bits:>11.3f}s {total_sets / total_bits:>7.1f}x")
+
+
+if __name__ == "__main__":
+    files = sys.argv[1:] if len(sys.argv) > 1 else ["patternlists/5/homo_at_21.txt", "patternlists/5/homo_at_22.txt",
+                                                    "patternlists/5/no_homo_until_21.txt"]
+    all_codes = []
+    for filename in files:
+        all_codes.extend(read_codes(filename))
+    benchmark_relation_engines(all_codes)
+    benchmark_code_screening(4, range(2**31, 2**31 + 100000))
+    benchmark_lifting_engines(all_codes[:2])
+    benchmark_cnf_generation(586082719390259, range(12, 19))
+    for depth in range(9, 16):
+        benchmark_hom_backends(read_codes(f"patternlists/4/homo_at_{depth}.txt")[:5], depth)
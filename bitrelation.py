@@ -0,0 +1,345 @@
+from collections.abc import Mapping
+
+from misc import bits, mask_of
+
+
+# A read-only view that presents the rows of a BitRelation as a dictionary of sets, like Relation.succ and
+# Relation.pred. Every access builds a fresh set, so it is meant for compatibility and not for inner loops.
+class MaskView(Mapping):
+
+    def __init__(self, rows, node_mask):
+        self.rows = rows
+        self.node_mask = node_mask
+
+    def __getitem__(self, node):
+        if node < 0 or not (self.node_mask >> node) & 1:
+            raise KeyError(node)
+        return set(bits(self.rows[node]))
+
+    def __iter__(self):
+        return bits(self.node_mask)
+
+    def __len__(self):
+        return self.node_mask.bit_count()
+
+    def __repr__(self):
+        return str(dict(self))
+
+
+# A relation on nodes that are non-negative integers. The successors of node i are stored as an integer whose j-th
+# bit is set iff there is an edge from i to j, so that compose, union and closure work on whole rows at once.
+# The public interface is the same as the one of Relation.
+class BitRelation:
+
+    def __init__(self):
+        self.node_mask = 0
+        self.succ_rows = []
+        self._pred_rows = []
+
+    @classmethod
+    def from_rows(cls, node_mask, succ_rows):
+        relation = cls()
+        relation.node_mask = node_mask
+        relation.succ_rows = succ_rows
+        relation._pred_rows = None
+        return relation
+
+    @classmethod
+    def from_edge_list(cls, nodes, edges):
+        relation = cls()
+        for node in nodes:
+            relation.add_node(node)
+        for (u, v) in edges:
+            relation.add_edge(u, v)
+        return relation
+
+    # Uses the same bit order as Relation.from_code and Relation.to_code: bit number_of_nodes*i+j is the edge i->j.
+    @classmethod
+    def from_code(cls, number_of_nodes, code):
+        row_mask = (1 << number_of_nodes) - 1
+        rows = []
+        for i in range(number_of_nodes):
+            rows.append(code & row_mask)
+            code >>= number_of_nodes
+        return cls.from_rows(row_mask, rows)
+
+    # Returns the diagonal relation on the given number of nodes, also called the identity.
+    @classmethod
+    def diagonal(cls, number_of_nodes):
+        return cls.from_rows((1 << number_of_nodes) - 1, [1 << i for i in range(number_of_nodes)])
+
+    @property
+    def pred_rows(self):
+        if self._pred_rows is None:
+            pred_rows = [0] * len(self.succ_rows)
+            for node in bits(self.node_mask):
+                for succ in bits(self.succ_rows[node]):
+                    pred_rows[succ] |= 1 << node
+            self._pred_rows = pred_rows
+        return self._pred_rows
+
+    @property
+    def succ(self):
+        return MaskView(self.succ_rows, self.node_mask)
+
+    @property
+    def pred(self):
+        return MaskView(self.pred_rows, self.node_mask)
+
+    def get_nodes(self):
+        return list(bits(self.node_mask))
+
+    def get_number_of_nodes(self):
+        return self.node_mask.bit_count()
+
+    def add_node(self, node):
+        if node >= len(self.succ_rows):
+            extension = [0] * (node + 1 - len(self.succ_rows))
+            self.succ_rows.extend(extension)
+            if self._pred_rows is not None:
+                self._pred_rows.extend(extension)
+        self.node_mask |= 1 << node
+        self.succ_rows[node] = 0
+        if self._pred_rows is not None:
+            self._pred_rows[node] = 0
+
+    def remove_node(self, node):
+        if self._pred_rows is None:
+            self.remove_nodes({node})
+            return
+        bit = 1 << node
+        for pred in bits(self._pred_rows[node]):
+            self.succ_rows[pred] &= ~bit
+        for succ in bits(self.succ_rows[node]):
+            self._pred_rows[succ] &= ~bit
+        self.node_mask &= ~bit
+        self.succ_rows[node] = 0
+        self._pred_rows[node] = 0
+
+    # Removes all the given nodes in a single pass over the rows.
+    def remove_nodes(self, nodes):
+        removed = mask_of(nodes) & self.node_mask
+        self.node_mask &= ~removed
+        keep = ~removed
+        for node in bits(removed):
+            self.succ_rows[node] = 0
+        for node in bits(self.node_mask):
+            self.succ_rows[node] &= keep
+        self._pred_rows = None
+
+    def add_edge(self, node1, node2):
+        self.succ_rows[node1] |= 1 << node2
+        if self._pred_rows is not None:
+            self._pred_rows[node2] |= 1 << node1
+
+    def remove_edge(self, node1, node2):
+        if not (self.succ_rows[node1] >> node2) & 1:
+            raise KeyError(node2)
+        self.succ_rows[node1] &= ~(1 << node2)
+        if self._pred_rows is not None:
+            self._pred_rows[node2] &= ~(1 << node1)
+
+    def has_edge(self, node1, node2):
+        return (self.succ_rows[node1] >> node2) & 1 == 1
+
+    def get_number_of_edges(self):
+        result = 0
+        for node in bits(self.node_mask):
+            result += self.succ_rows[node].bit_count()
+        return result
+
+    def get_predecessor_mask(self, node):
+        return self.pred_rows[node]
+
+    def get_successor_mask(self, node):
+        return self.succ_rows[node]
+
+    def get_predecessors(self, node):
+        return set(bits(self.pred_rows[node]))
+
+    def get_successors(self, node):
+        return set(bits(self.succ_rows[node]))
+
+    def get_successors_of_mask(self, mask):
+        result = 0
+        for node in bits(mask):
+            result |= self.succ_rows[node]
+        return result
+
+    def get_successors_of_set(self, s):
+        return set(bits(self.get_successors_of_mask(mask_of(s))))
+
+    # Returns the mask of all nodes that are reachable from the given node via a directed path.
+    def get_reachable_mask(self, start):
+        reachable = 1 << start
+        frontier = reachable
+        while frontier:
+            frontier = self.get_successors_of_mask(frontier) & ~reachable
+            reachable |= frontier
+        return reachable
+
+    # Returns the set of all nodes that are reachable from the given node via a directed path.
+    def get_reachable_nodes(self, start):
+        return set(bits(self.get_reachable_mask(start)))
+
+    # Returns the set of all nodes that have at least one successor.
+    def get_nodes_with_a_successor(self):
+        return {node for node in bits(self.node_mask) if self.succ_rows[node]}
+
+    # Returns the set of all nodes that have at least one predecessor.
+    def get_nodes_with_a_predecessor(self):
+        return set(bits(self.get_successors_of_mask(self.node_mask)))
+
+    def get_selfloop_mask(self):
+        result = 0
+        for node in bits(self.node_mask):
+            result |= self.succ_rows[node] & (1 << node)
+        return result
+
+    # Returns the set of all nodes that have a selfloop.
+    def get_nodes_with_a_selfloop(self):
+        return set(bits(self.get_selfloop_mask()))
+
+    def get_nodes_reachable_from_a_selfloop(self):
+        start = self.get_selfloop_mask()
+        reachable = start
+        frontier = start
+        while frontier:
+            frontier = self.get_successors_of_mask(frontier) & ~reachable
+            reachable |= frontier
+        return set(bits(reachable))
+
+    # Returns True if there is a node that has a selfloop and such that all nodes are reachable from there.
+    def has_selfloop_that_can_reach_all(self):
+        for node in bits(self.get_selfloop_mask()):
+            if self.get_reachable_mask(node) == self.node_mask:
+                return True
+        return False
+
+    # Returns the set of nodes that have a selfloop and such that all nodes are reachable from there.
+    def get_selfloops_that_can_reach_all(self):
+        return {node for node in bits(self.get_selfloop_mask()) if self.get_reachable_mask(node) == self.node_mask}
+
+    # Removes all outgoing edges of the given node.
+    def remove_all_successors(self, node):
+        self.succ_rows[node] = 0
+        self._pred_rows = None
+
+    # Given an ordered list of the nodes, this function computes the code of this relation.
+    def to_code(self, nodes):
+        number_of_nodes = len(nodes)
+        code = 0
+        if self.node_mask == (1 << number_of_nodes) - 1 and nodes == list(range(number_of_nodes)):
+            for i in range(number_of_nodes - 1, -1, -1):
+                code = (code << number_of_nodes) | self.succ_rows[i]
+            return number_of_nodes, code
+        current_bit = 1
+        for i in range(number_of_nodes):
+            row = self.succ_rows[nodes[i]]
+            for j in range(number_of_nodes):
+                if (row >> nodes[j]) & 1:
+                    code += current_bit
+                current_bit <<= 1
+        return number_of_nodes, code
+
+    def copy(self):
+        return BitRelation.from_rows(self.node_mask, list(self.succ_rows))
+
+    # Returns a new relation that is isomorphic to the old one, but names are according to the given renaming.
+    # The renaming has to be a dictionary, the keys are the nodes, the values are the new (integer) names.
+    def rename(self, renaming):
+        new_relation = BitRelation()
+        for node in bits(self.node_mask):
+            new_relation.add_node(renaming[node])
+        for node in bits(self.node_mask):
+            row = 0
+            for node2 in bits(self.succ_rows[node]):
+                row |= 1 << renaming[node2]
+            new_relation.succ_rows[renaming[node]] = row
+        new_relation._pred_rows = None
+        return new_relation
+
+    # returns True if node1 and node2 have a common predecessor
+    def common_pred(self, node1, node2):
+        return self.pred_rows[node1] & self.pred_rows[node2] != 0
+
+    def has_selfloop(self):
+        return self.get_selfloop_mask() != 0
+
+    def union(self, other):
+        other_rows = _rows_of(other, len(self.succ_rows))
+        rows = [0] * len(self.succ_rows)
+        for node in bits(self.node_mask):
+            rows[node] = self.succ_rows[node] | other_rows[node]
+        return BitRelation.from_rows(self.node_mask, rows)
+
+    def transitive_closure(self):
+        rows = list(self.succ_rows)
+        for k in bits(self.node_mask):
+            bit_k = 1 << k
+            row_k = rows[k]
+            for i in bits(self.node_mask):
+                if rows[i] & bit_k:
+                    rows[i] |= row_k
+        return BitRelation.from_rows(self.node_mask, rows)
+
+    # Computes the composition of this relation with the given relation.
+    def compose(self, rel2):
+        other_rows = _rows_of(rel2, len(self.succ_rows))
+        rows = [0] * len(self.succ_rows)
+        for node in bits(self.node_mask):
+            row = 0
+            for succ in bits(self.succ_rows[node]):
+                row |= other_rows[succ]
+            rows[node] = row
+        return BitRelation.from_rows(self.node_mask, rows)
+
+    # Returns whether the given node is a predecessor of every node.
+    def sees_all(self, node):
+        return self.succ_rows[node] == self.node_mask
+
+    def has_node_that_sees_all(self):
+        for node in bits(self.node_mask):
+            if self.succ_rows[node] == self.node_mask:
+                return True
+        return False
+
+    def get_nodes_that_see_all(self):
+        return {node for node in bits(self.node_mask) if self.succ_rows[node] == self.node_mask}
+
+    def get_indices_of_nodes(self, set_of_nodes, node_list):
+        indices = []
+        for index in range(self.get_number_of_nodes()):
+            if node_list[index] in set_of_nodes:
+                indices.append(index)
+        return indices
+
+    def __eq__(self, other):
+        if not isinstance(other, BitRelation):
+            return set(self.succ.keys()) == set(other.succ.keys()) and all(
+                self.succ[node] == other.succ[node] for node in self.succ)
+        if self.node_mask != other.node_mask:
+            return False
+        for node in bits(self.node_mask):
+            if self.succ_rows[node] != other.succ_rows[node]:
+                return False
+        return True
+
+    def __repr__(self):
+        return str(self.succ)
+
+
+# Returns the successor rows of the given relation as a list with at least the given length, converting a
+# set-based Relation if necessary.
+def _rows_of(relation, length):
+    if isinstance(relation, BitRelation):
+        rows = relation.succ_rows
+        if len(rows) < length:
+            rows = rows + [0] * (length - len(rows))
+        return rows
+    rows = [0] * length
+    for node in relation.succ:
+        if node >= len(rows):
+            rows.extend([0] * (node + 1 - len(rows)))
+        rows[node] = mask_of(relation.succ[node])
+    return rows
@@ -1,97 +1,269 @@
+from array import array
+
 from pattern import Pattern
 from relation import Relation
 
+
+# Raised if the Caley graph has more nodes than the given maximum size.
+class CaleyGraphTooLarge(Exception):
+    pass
+
+
+# The Caley graph of a pattern has a node for every relation that is the relation of some word over green and red,
+# and an edge of color c from R to R composed with the c-colored relation of the pattern.
+# A relation on the nodes of the pattern is identified with the integer code that Relation.to_code(pattern.nodes)
+# computes, so the nodes of the Caley graph are numbered 0, 1, ... in the order in which they are found, codes[i] is
+# the code of node i and index maps a code to its node. green_successors[i] and red_successors[i] are the green and
+# the red successor of node i. Node 0 is the diagonal.
 class CaleyGraph:
 
-    def __init__(self, pattern):
+    def __init__(self, pattern, max_size=None):
         self.pattern = pattern
-        self.caley_graph = self.compute_caley_graph(pattern)
-        self.start = Relation.diagonal(pattern.get_number_of_nodes())
+        self.number_of_pattern_nodes = pattern.get_number_of_nodes()
+        self.codes, self.index, self.green_successors, self.red_successors = self.compute_caley_graph(pattern,
+                                                                                                      max_size)
+        self.start = type(pattern.green).diagonal(pattern.get_number_of_nodes())
+        self._caley_graph = None
+        self._infinitely_reachable = None
+        self._idempotent_powers = {}
 
-    def compute_caley_graph(self, pattern):
-        caley_graph = Pattern.empty_pattern()
-        nodes = pattern.nodes
+    # Returns the images of all rows under the relation, given by its rows: image[mask] is the union of the rows of
+    # the nodes in mask.
+    @staticmethod
+    def get_row_images(rows):
+        images = [0] * (1 << len(rows))
+        for mask in range(1, len(images)):
+            lowest = mask & -mask
+            images[mask] = images[mask ^ lowest] | rows[lowest.bit_length() - 1]
+        return images
 
-        diagonal = Relation.diagonal(pattern.get_number_of_nodes())
-        green = pattern.green
-        red = pattern.red
+    # Returns the code of the composition of the relation with the given code and the relation with the given row
+    # images. Row i of the code is the set of successors of node i.
+    def compose(self, code, images):
+        n = self.number_of_pattern_nodes
+        row_mask = (1 << n) - 1
+        result = 0
+        for shift in range(0, n * n, n):
+            result |= images[(code >> shift) & row_mask] << shift
+        return result
 
-        caley_graph.add_node(diagonal.to_code(nodes))
+    # Enumerates the relations of all words by a breadth first search. The list of codes is the queue of the search,
+    # and the dictionary index finds known relations. Raises CaleyGraphTooLarge if there are more than max_size.
+    def compute_caley_graph(self, pattern, max_size=None):
+        nodes = pattern.nodes
+        n = len(nodes)
+        position = {}
+        for i in range(n):
+            position[nodes[i]] = i
+        green_rows = [0] * n
+        red_rows = [0] * n
+        for i in range(n):
+            for node in pattern.get_green_successors(nodes[i]):
+                green_rows[i] |= 1 << position[node]
+            for node in pattern.get_red_successors(nodes[i]):
+                red_rows[i] |= 1 << position[node]
+        green_images = self.get_row_images(green_rows)
+        red_images = self.get_row_images(red_rows)
+
+        diagonal = 0
+        for i in range(n):
+            diagonal |= 1 << (n * i + i)
+        codes = [diagonal]
+        index = {diagonal: 0}
+        green_successors = array("i")
+        red_successors = array("i")
+        current = 0
+        while current < len(codes):
+            code = codes[current]
+            for images, successors in ((green_images, green_successors), (red_images, red_successors)):
+                successor = self.compose(code, images)
+                if successor not in index:
+                    if max_size is not None and len(codes) >= max_size:
+                        raise CaleyGraphTooLarge(f"The Caley graph has more than {max_size} nodes.")
+                    index[successor] = len(codes)
+                    codes.append(successor)
+                successors.append(index[successor])
+            current += 1
+        return codes, index, green_successors, red_successors
 
-        queue = [diagonal]
-        while len(queue) > 0:
-            current = queue.pop(0)
+    def get_number_of_nodes(self):
+        return len(self.codes)
 
-            # Add the green successor
-            green_succ = current.compose(green)
-            if green_succ.to_code(nodes) not in caley_graph.nodes:
-                caley_graph.add_node(green_succ.to_code(nodes))
-                queue.append(green_succ)
-            caley_graph.add_green_edge(current.to_code(nodes), green_succ.to_code(nodes))
+    # The Caley graph as a pattern whose nodes are the pairs (number of nodes, code) of the relations. It is only
+    # built when it is used.
+    @property
+    def caley_graph(self):
+        if self._caley_graph is None:
+            nodes = [(self.number_of_pattern_nodes, code) for code in self.codes]
+            green = Relation()
+            red = Relation()
+            for node in nodes:
+                green.add_node(node)
+                red.add_node(node)
+            for i in range(len(nodes)):
+                green.add_edge(nodes[i], nodes[self.green_successors[i]])
+                red.add_edge(nodes[i], nodes[self.red_successors[i]])
+            self._caley_graph = Pattern(nodes, green, red)
+        return self._caley_graph
 
-            # Add the red successor
-            red_succ = current.compose(red)
-            if red_succ.to_code(nodes) not in caley_graph.nodes:
-                caley_graph.add_node(red_succ.to_code(nodes))
-                queue.append(red_succ)
-            caley_graph.add_red_edge(current.to_code(nodes), red_succ.to_code(nodes))
+    # Returns a list that says for every node of the Caley graph whether its relation is the relation of infinitely
+    # many words. These are the nodes that can be reached from a cycle, i.e., from a strongly connected component with
+    # more than one node or with a selfloop. The components are found with Tarjan's algorithm, so this takes linear
+    # time, and the result is computed only once.
+    def get_infinitely_reachable(self):
+        if self._infinitely_reachable is not None:
+            return self._infinitely_reachable
+        number_of_nodes = len(self.codes)
+        successors = (self.green_successors, self.red_successors)
+        order = [-1] * number_of_nodes
+        low = [0] * number_of_nodes
+        on_stack = [False] * number_of_nodes
+        stack = []
+        on_cycle = []
+        counter = 0
+        for root in range(number_of_nodes):
+            if order[root] != -1:
+                continue
+            # every entry of the call stack is a node and the number of its successors visited so far
+            calls = [(root, 0)]
+            order[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = True
+            while calls:
+                node, visited = calls.pop()
+                if visited < 2:
+                    calls.append((node, visited + 1))
+                    successor = successors[visited][node]
+                    if order[successor] == -1:
+                        order[successor] = low[successor] = counter
+                        counter += 1
+                        stack.append(successor)
+                        on_stack[successor] = True
+                        calls.append((successor, 0))
+                    elif on_stack[successor]:
+                        low[node] = min(low[node], order[successor])
+                    continue
+                if calls:
+                    parent = calls[-1][0]
+                    low[parent] = min(low[parent], low[node])
+                if low[node] == order[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component.append(member)
+                        if member == node:
+                            break
+                    if len(component) > 1 or self.green_successors[node] == node or self.red_successors[node] == node:
+                        on_cycle.extend(component)
 
-        return caley_graph
+        infinitely_reachable = [False] * number_of_nodes
+        for node in on_cycle:
+            infinitely_reachable[node] = True
+        queue = on_cycle
+        while queue:
+            node = queue.pop()
+            for successor in (self.green_successors[node], self.red_successors[node]):
+                if not infinitely_reachable[successor]:
+                    infinitely_reachable[successor] = True
+                    queue.append(successor)
+        self._infinitely_reachable = infinitely_reachable
+        return infinitely_reachable
 
     def get_nodes_reachable_by_infinitely_many_words(self):
-        forget_colors = self.caley_graph.red.union(self.caley_graph.green)
-        transitive_closure = forget_colors.transitive_closure()
-        return transitive_closure.get_nodes_reachable_from_a_selfloop()
+        infinitely_reachable = self.get_infinitely_reachable()
+        return {(self.number_of_pattern_nodes, self.codes[i]) for i in range(len(self.codes))
+                if infinitely_reachable[i]}
 
     def get_nodes_reachable_by_finitely_many_words(self):
-        return set(self.caley_graph.nodes).difference(self.get_nodes_reachable_by_infinitely_many_words())
+        infinitely_reachable = self.get_infinitely_reachable()
+        return {(self.number_of_pattern_nodes, self.codes[i]) for i in range(len(self.codes))
+                if not infinitely_reachable[i]}
 
     # The first path condition: For every relation R that is hit by finitely many words, there is a node in the
     # pattern who sees itself under R and that sees every node under a multiple of R.
+    # If a node c sees itself under R, then the successors of c under R, R^2, R^3, ... form an increasing chain, so c
+    # sees every node under some power of R iff it does so under the idempotent power of R.
     def check_first_path_condition(self):
-        finite = self.get_nodes_reachable_by_finitely_many_words()
-        diag = self.start.to_code(self.pattern.nodes)
-        if diag in finite:
-            finite.remove(diag)
-        for number, code in finite:
-            rel = Relation.from_code(number, code)
-            selfloops = rel.get_nodes_with_a_selfloop()
-            if selfloops == set():
-                #print(f"No selfloop for relation {rel}")
+        all_nodes = (1 << self.number_of_pattern_nodes) - 1
+        infinitely_reachable = self.get_infinitely_reachable()
+        # node 0 is the diagonal
+        for i in range(1, len(self.codes)):
+            if infinitely_reachable[i]:
+                continue
+            rows = self.get_rows(self.codes[i])
+            selfloops = [c for c in range(len(rows)) if (rows[c] >> c) & 1]
+            if not selfloops:
                 return False
-            found_candidate = False
-            for candidate in selfloops:
-                if rel.sees_all(candidate):
-                    found_candidate = True
-                    break
-                multiple = rel
-                for i in range(self.caley_graph.get_number_of_nodes()):
-                    multiple = multiple.compose(rel)
-                    if multiple.sees_all(candidate):
-                        found_candidate = True
-                        break
-                if found_candidate:
-                    break
-            if not found_candidate:
-                #print(f"Not found a candidate for relation {rel}")
+            idempotent_rows = self.get_rows(self.get_idempotent_power(self.codes[i]))
+            if not any(idempotent_rows[c] == all_nodes for c in selfloops):
                 return False
         return True
 
+    # Returns the code of the composition of the relations with the given codes.
+    def compose_codes(self, code1, code2):
+        rows2 = self.get_rows(code2)
+        n = self.number_of_pattern_nodes
+        row_mask = (1 << n) - 1
+        result = 0
+        for shift in range(0, n * n, n):
+            row = (code1 >> shift) & row_mask
+            image = 0
+            while row:
+                lowest = row & -row
+                image |= rows2[lowest.bit_length() - 1]
+                row ^= lowest
+            result |= image << shift
+        return result
+
+    # Returns the code of the idempotent power of the relation with the given code, i.e., the unique power R^k with
+    # R^k R^k = R^k. The powers R, R^2, ... run into a cycle after index many steps, which then repeats with some
+    # period, and the idempotent power is the element of that cycle whose exponent is a multiple of the period.
+    # The results are cached.
+    def get_idempotent_power(self, code):
+        if code in self._idempotent_powers:
+            return self._idempotent_powers[code]
+        powers = [code]
+        exponent = {code: 1}
+        while True:
+            power = self.compose_codes(powers[-1], code)
+            if power in exponent:
+                break
+            exponent[power] = len(powers) + 1
+            powers.append(power)
+        index = exponent[power]
+        period = len(powers) + 1 - index
+        # the smallest multiple of the period that is at least the index
+        k = -(-index // period) * period
+        idempotent = powers[k - 1]
+        self._idempotent_powers[code] = idempotent
+        return idempotent
+
+    # Returns the rows of the relation with the given code, where row i is the bitmask of the successors of node i.
+    def get_rows(self, code):
+        n = self.number_of_pattern_nodes
+        row_mask = (1 << n) - 1
+        return [(code >> shift) & row_mask for shift in range(0, n * n, n)]
+
     # The second path condition: For every relation R that is hit by infinitely many words, there is a node in
     # the pattern that sees every node of the pattern under R.
     def check_second_path_condition(self):
-        infinite = self.get_nodes_reachable_by_infinitely_many_words()
-        for number, code in infinite:
-            rel = Relation.from_code(number, code)
-            if not rel.has_node_that_sees_all():
+        all_nodes = (1 << self.number_of_pattern_nodes) - 1
+        infinitely_reachable = self.get_infinitely_reachable()
+        for i in range(len(self.codes)):
+            if infinitely_reachable[i] and all_nodes not in self.get_rows(self.codes[i]):
                 return False
         return True
 
     # The third path condition: For every node in the pattern, there is a word w such that the node sees every
     # node under w.
     def check_third_path_condition(self):
+        all_nodes = (1 << self.number_of_pattern_nodes) - 1
         nodes = set()
-        for (number, code) in self.caley_graph.nodes:
-            relation = Relation.from_code(number, code)
-            nodes = nodes.union(relation.get_nodes_that_see_all())
-        return nodes == set(self.pattern.nodes)
\ No newline at end of file
+        for code in self.codes:
+            rows = self.get_rows(code)
+            for i in range(len(rows)):
+                if rows[i] == all_nodes:
+                    nodes.add(i)
+        return nodes == set(self.pattern.nodes)
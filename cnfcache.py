@@ -0,0 +1,101 @@
+import gc
+import gzip
+import hashlib
+import os
+import shutil
+
+import numpy as np
+from pysat.formula import CNF
+
+
+# Writes the cnf in the DIMACS format, compressed with gzip if the filename ends with .gz. Every comment becomes a
+# line starting with c.
+def write_dimacs(filename, cnf, comments=()):
+    if filename.endswith(".gz"):
+        file = gzip.open(filename, "wt", compresslevel=1)
+    else:
+        file = open(filename, "w")
+    with file:
+        for comment in comments:
+            file.write(f"c {comment}\n")
+        file.write(f"p cnf {cnf.nv} {len(cnf.clauses)}\n")
+        file.writelines(f"{' '.join(map(str, clause))} 0\n" for clause in cnf.clauses)
+
+
+# Reads a cnf in the DIMACS format, compressed with gzip if the filename ends with .gz. The literals are parsed by
+# numpy, and the clauses are cut out of runs of clauses of the same length, which is how SatSolver.code_to_cnf
+# produces them. The garbage collector is paused meanwhile, since it would otherwise scan the millions of new lists
+# again and again.
+def read_dimacs(filename):
+    opener = gzip.open if filename.endswith(".gz") else open
+    with opener(filename, "rb") as file:
+        data = file.read()
+    cnf = CNF()
+    body_start = 0
+    while data.startswith(b"c", body_start) or data.startswith(b"p", body_start):
+        line_end = data.index(b"\n", body_start)
+        if data.startswith(b"p", body_start):
+            cnf.nv = int(data[body_start:line_end].split()[2])
+        body_start = line_end + 1
+    literals = np.fromstring(data[body_start:], dtype=np.int64, sep=" ")
+    ends = np.flatnonzero(literals == 0)
+    if len(ends) == 0:
+        return cnf
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    lengths = ends - starts
+    runs = np.concatenate(([0], np.flatnonzero(np.diff(lengths)) + 1, [len(lengths)]))
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for first, last in zip(runs[:-1].tolist(), runs[1:].tolist()):
+            length = int(lengths[first])
+            block = literals[starts[first]:ends[last - 1] + 1].reshape(-1, length + 1)
+            cnf.clauses.extend(block[:, :length].tolist())
+    finally:
+        if was_enabled:
+            gc.enable()
+    return cnf
+
+
+# A directory of compressed DIMACS files of the cnfs of SatSolver.code_to_cnf, which say whether there is a
+# homomorphism from T_n to a pattern. The file of a cnf is named by a hash of n and the number of nodes and the code of
+# the pattern, so a lifting that several patterns share is stored once, and the files do not depend on how the
+# pattern was found. The comments of a file say which pattern, lifting and depth it was first written for.
+# If an export directory is given, export writes the cnfs there as plain DIMACS files, which standalone solvers read.
+class CnfCache:
+
+    def __init__(self, directory, export_directory=None):
+        self.directory = directory
+        self.export_directory = export_directory
+        os.makedirs(directory, exist_ok=True)
+        if export_directory is not None:
+            os.makedirs(export_directory, exist_ok=True)
+
+    def get_filename(self, n, number_of_nodes, code):
+        key = hashlib.sha256(f"{n} {number_of_nodes} {code}".encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.cnf.gz")
+
+    def contains(self, n, number_of_nodes, code):
+        return os.path.exists(self.get_filename(n, number_of_nodes, code))
+
+    # Returns the cached cnf, or None if there is none.
+    def load(self, n, number_of_nodes, code):
+        filename = self.get_filename(n, number_of_nodes, code)
+        if not os.path.exists(filename):
+            return None
+        return read_dimacs(filename)
+
+    # The file is written under a temporary name and then renamed, so that other processes never read half of it.
+    def store(self, n, number_of_nodes, code, cnf, comments=()):
+        filename = self.get_filename(n, number_of_nodes, code)
+        temporary_filename = f"{filename}.{os.getpid()}.tmp.gz"
+        write_dimacs(temporary_filename, cnf, comments)
+        os.replace(temporary_filename, filename)
+
+    # Copies the cached cnf uncompressed into the export directory, under the given name with the ending .cnf, and
+    # returns the filename.
+    def export(self, n, number_of_nodes, code, name):
+        filename = os.path.join(self.export_directory, f"{name}.cnf")
+        with gzip.open(self.get_filename(n, number_of_nodes, code), "rb") as source, open(filename, "wb") as target:
+            shutil.copyfileobj(source, target)
+        return filename
@@ -6,11 +6,15 @@
 # as a number that has at most 2*n^2 bits and at least 2*n^2-n+1 bits.
 
 # Returns true iff the i-th bit of n equals 1.
-from random import random
+import random
+from functools import lru_cache
+from itertools import combinations
+
+from misc import bits, mask_of
 
 
 def bit(n, i):
-    return (n & (2**i)) > 0
+    return (n >> i) & 1 == 1
 
 
 # Converts the old code format into the new format. In the old format, bits were ordered such that the first
@@ -101,27 +105,358 @@ def get_red_successor_lists(number_of_nodes, code):
     return result
 
 
-# Returns a random code of a pattern of size n, where each bit has the given chance to be a 1.
-# TODO: Return only patterns where every node has at least one incoming edge of each color.
-def bias_random_code(n, chance):
+# Returns a list of bitmasks, the i-th bit of result[j] is set iff there is a green edge from node i to node j.
+def get_green_predecessor_masks(number_of_nodes, code):
+    block = (1 << number_of_nodes) - 1
+    return [(code >> (number_of_nodes*j)) & block for j in range(number_of_nodes)]
+
+
+# Returns a list of bitmasks, the i-th bit of result[j] is set iff there is a red edge from node i to node j.
+def get_red_predecessor_masks(number_of_nodes, code):
+    return get_green_predecessor_masks(number_of_nodes, code >> (number_of_nodes*number_of_nodes))
+
+
+# Given the predecessor masks of one color, returns the successor masks of that color (and vice versa).
+def transpose_masks(masks):
+    result = [0] * len(masks)
+    for j in range(len(masks)):
+        mask = masks[j]
+        i = 0
+        while mask:
+            if mask & 1:
+                result[i] |= 1 << j
+            mask >>= 1
+            i += 1
+    return result
+
+
+# Returns the mask of the green selfloops within the green half of a code, that is, the bits number_of_nodes*j+j.
+@lru_cache(maxsize=None)
+def get_diagonal_mask(number_of_nodes):
     result = 0
-    bits = 2*n*n
-    for i in range(bits):
-        result *= 2
-        if random.random() < chance:
-            result += 1
+    for j in range(number_of_nodes):
+        result |= 1 << (number_of_nodes*j + j)
     return result
 
 
-# Generates a list of all patterns that have hamming distance one from the given pattern.
-# TODO: Let the hamming distance be an input parameter.
-def generate_nearby_patterns(number_of_nodes, code):
+# Is there a node that has a green and a red selfloop?
+def has_double_selfloop(number_of_nodes, code):
+    diagonal = get_diagonal_mask(number_of_nodes)
+    return code & (code >> (number_of_nodes*number_of_nodes)) & diagonal != 0
+
+
+def has_green_selfloop(number_of_nodes, code):
+    return code & get_diagonal_mask(number_of_nodes) != 0
+
+
+def has_red_selfloop(number_of_nodes, code):
+    return (code >> (number_of_nodes*number_of_nodes)) & get_diagonal_mask(number_of_nodes) != 0
+
+
+# Same as Pattern.has_useless_nodes, but computed on the code: Is there a node without green or red predecessor,
+# a node without any successor, or a node whose neighbourhood is contained in the neighbourhood of another node?
+def has_useless_nodes(number_of_nodes, code):
+    green_pred = get_green_predecessor_masks(number_of_nodes, code)
+    red_pred = get_red_predecessor_masks(number_of_nodes, code)
+    with_successor = 0
+    for j in range(number_of_nodes):
+        if green_pred[j] == 0 or red_pred[j] == 0:
+            return True
+        with_successor |= green_pred[j] | red_pred[j]
+    if with_successor != (1 << number_of_nodes) - 1:
+        return True
+    green_succ = transpose_masks(green_pred)
+    red_succ = transpose_masks(red_pred)
+    for a in range(number_of_nodes):
+        for b in range(number_of_nodes):
+            if a != b and red_pred[a] & ~red_pred[b] == 0 and red_succ[a] & ~red_succ[b] == 0 and \
+                    green_pred[a] & ~green_pred[b] == 0 and green_succ[a] & ~green_succ[b] == 0:
+                return True
+    return False
+
+
+# Given the successor masks of one color, returns whether there is a node with a selfloop such that every node is
+# reachable from it.
+def has_selfloop_that_can_reach_all(successor_masks):
+    all_nodes = (1 << len(successor_masks)) - 1
+    for node in range(len(successor_masks)):
+        if not (successor_masks[node] >> node) & 1:
+            continue
+        reachable = 1 << node
+        frontier = reachable
+        while frontier:
+            successors = 0
+            i = 0
+            while frontier:
+                if frontier & 1:
+                    successors |= successor_masks[i]
+                frontier >>= 1
+                i += 1
+            frontier = successors & ~reachable
+            reachable |= frontier
+        if reachable == all_nodes:
+            return True
+    return False
+
+
+# Same as Pattern.check_red_connected, but computed on the code.
+def check_red_connected(number_of_nodes, code):
+    return has_selfloop_that_can_reach_all(transpose_masks(get_red_predecessor_masks(number_of_nodes, code)))
+
+
+# Same as Pattern.check_green_connected, but computed on the code.
+def check_green_connected(number_of_nodes, code):
+    return has_selfloop_that_can_reach_all(transpose_masks(get_green_predecessor_masks(number_of_nodes, code)))
+
+
+# Runs the cheap preprocessing of main.check_pattern directly on the code, so that rejected codes never have to
+# be turned into a Pattern. Returns the result check_pattern gives for a rejected code, or None if the code
+# passes all the tests.
+def screen_code(number_of_nodes, code):
+    if has_double_selfloop(number_of_nodes, code):
+        return 1
+    if not has_green_selfloop(number_of_nodes, code) or not has_red_selfloop(number_of_nodes, code):
+        return 0
+    if has_useless_nodes(number_of_nodes, code):
+        return 2
+    if not check_red_connected(number_of_nodes, code):
+        return 2
+    if not check_green_connected(number_of_nodes, code):
+        return 2
+    return None
+
+
+# Builds a code from the predecessor masks of both colors.
+def code_from_predecessor_masks(green_pred, red_pred):
+    number_of_nodes = len(green_pred)
+    code = 0
+    for j in range(number_of_nodes - 1, -1, -1):
+        code = (code << number_of_nodes) | red_pred[j]
+    for j in range(number_of_nodes - 1, -1, -1):
+        code = (code << number_of_nodes) | green_pred[j]
+    return code
+
+
+# Returns the code of the pattern in which node t is the node order[t] of the given pattern. If swap is True,
+# red and green are exchanged as well.
+def relabel_code(number_of_nodes, code, order, swap=False):
+    green_pred = get_green_predecessor_masks(number_of_nodes, code)
+    red_pred = get_red_predecessor_masks(number_of_nodes, code)
+    if swap:
+        green_pred, red_pred = red_pred, green_pred
+    position = [0] * number_of_nodes
+    for t in range(number_of_nodes):
+        position[order[t]] = t
+    new_green_pred = []
+    new_red_pred = []
+    for t in range(number_of_nodes):
+        new_green = 0
+        new_red = 0
+        for s in range(number_of_nodes):
+            if (green_pred[order[t]] >> order[s]) & 1:
+                new_green |= 1 << s
+            if (red_pred[order[t]] >> order[s]) & 1:
+                new_red |= 1 << s
+        new_green_pred.append(new_green)
+        new_red_pred.append(new_red)
+    return code_from_predecessor_masks(new_green_pred, new_red_pred)
+
+
+# Two patterns are equivalent if one arises from the other by reordering the nodes and possibly exchanging red and
+# green. To choose a representative of each class, the nodes of a pattern are read in the given order and node t
+# contributes the "orderly chunk" of all edges between node t and the nodes before it (and its selfloops), first
+# for the first color, then for the second. The representative of a class is the pattern whose sequence of chunks
+# is lexicographically smallest. Since the chunks of the first k nodes only depend on these nodes, the first k
+# nodes of a representative form a representative as well, which allows to generate representatives node by node.
+def _orderly_chunk(first_pred, second_pred, order, t):
+    v = order[t]
+    chunk = 0
+    for pred in (first_pred, second_pred):
+        chunk = (chunk << 1) | ((pred[v] >> v) & 1)
+        for i in range(t):
+            u = order[i]
+            chunk = (chunk << 2) | (((pred[v] >> u) & 1) << 1) | ((pred[u] >> v) & 1)
+    return chunk
+
+
+# Searches the relabelling (order of the nodes and whether colors are exchanged) with the smallest sequence of
+# orderly chunks, by extending node orders one node at a time and cutting off every order whose chunks are already
+# larger than the best ones found so far. Returns (order, swap) of the best relabelling. If stop_if_smaller is True,
+# it returns None as soon as some relabelling beats the identity, which is how canonical codes are recognised.
+def _minimal_relabelling(green_pred, red_pred, stop_if_smaller=False):
+    number_of_nodes = len(green_pred)
+    identity = list(range(number_of_nodes))
+    best_chunks = [_orderly_chunk(green_pred, red_pred, identity, t) for t in range(number_of_nodes)]
+    best = [identity, False]
+    order = []
+
+    # Returns False if the search has to stop.
+    def extend(first_pred, second_pred, swap, used):
+        t = len(order)
+        if t == number_of_nodes:
+            best[0] = list(order)
+            best[1] = swap
+            return True
+        for v in range(number_of_nodes):
+            if (used >> v) & 1:
+                continue
+            order.append(v)
+            chunk = _orderly_chunk(first_pred, second_pred, order, t)
+            if chunk < best_chunks[t]:
+                if stop_if_smaller:
+                    return False
+                best_chunks[t] = chunk
+                for i in range(t + 1, number_of_nodes):
+                    best_chunks[i] = float("inf")
+            if chunk == best_chunks[t]:
+                if not extend(first_pred, second_pred, swap, used | (1 << v)):
+                    return False
+            order.pop()
+        return True
+
+    if not extend(green_pred, red_pred, False, 0):
+        return None
+    order.clear()
+    if not extend(red_pred, green_pred, True, 0):
+        return None
+    return best[0], best[1]
+
+
+# Returns the canonical code of the class of the given code, that is, the same code for all codes that arise
+# from each other by reordering the nodes and exchanging red and green.
+def canonical_code(number_of_nodes, code):
+    green_pred = get_green_predecessor_masks(number_of_nodes, code)
+    red_pred = get_red_predecessor_masks(number_of_nodes, code)
+    order, swap = _minimal_relabelling(green_pred, red_pred)
+    return relabel_code(number_of_nodes, code, order, swap)
+
+
+# Returns whether the code is the canonical code of its class.
+def is_canonical_code(number_of_nodes, code):
+    green_pred = get_green_predecessor_masks(number_of_nodes, code)
+    red_pred = get_red_predecessor_masks(number_of_nodes, code)
+    return _minimal_relabelling(green_pred, red_pred, stop_if_smaller=True) is not None
+
+
+# Refines the colors of the nodes until two nodes of the same color have equally many neighbours of every color in
+# each of the given lists of masks. The new color of a node is the rank of its old color together with the sorted
+# colors of its neighbours, so isomorphic patterns get the same colors.
+def _refine_colors(colors, masks):
+    while True:
+        signatures = [(colors[v],) + tuple(tuple(sorted(colors[u] for u in bits(neighbours[v]))) for neighbours in masks)
+                      for v in range(len(colors))]
+        ranks = {signature: rank for rank, signature in enumerate(sorted(set(signatures)))}
+        refined = [ranks[signature] for signature in signatures]
+        if len(ranks) == len(set(colors)):
+            return refined
+        colors = refined
+
+
+# Like canonical_code, the same code for all codes that arise from each other by reordering the nodes and exchanging
+# red and green, but usually much faster for larger patterns such as liftings. The codes are in general not those of
+# canonical_code. The nodes are colored by their selfloops and the colors are refined, and while two nodes share a
+# color, the search branches over which node of the first such color comes first. Every branch ends with distinct
+# colors, which order the nodes, and the smallest of the resulting codes is returned.
+def refined_canonical_code(number_of_nodes, code):
+    best = None
+    for swap in (False, True):
+        first_pred = get_green_predecessor_masks(number_of_nodes, code)
+        second_pred = get_red_predecessor_masks(number_of_nodes, code)
+        if swap:
+            first_pred, second_pred = second_pred, first_pred
+        masks = (first_pred, transpose_masks(first_pred), second_pred, transpose_masks(second_pred))
+        start = [2*((first_pred[v] >> v) & 1) + ((second_pred[v] >> v) & 1) for v in range(number_of_nodes)]
+        stack = [start]
+        while stack:
+            colors = _refine_colors(stack.pop(), masks)
+            if len(set(colors)) == number_of_nodes:
+                order = sorted(range(number_of_nodes), key=colors.__getitem__)
+                candidate = relabel_code(number_of_nodes, code, order, swap)
+                if best is None or candidate < best:
+                    best = candidate
+                continue
+            shared = min(color for color in set(colors) if colors.count(color) > 1)
+            for v in range(number_of_nodes):
+                if colors[v] == shared:
+                    stack.append([2*color + (color == shared and u != v) for u, color in enumerate(colors)])
+    return best
+
+
+# Yields the canonical code of every class of patterns with the given number of nodes, each exactly once.
+# The patterns are built node by node and a partial pattern is only extended if it is canonical itself.
+# If screen is True, only codes that pass codes.screen_code are yielded, and partial patterns with a double
+# selfloop are not extended at all, because every extension has the double selfloop as well.
+def canonical_codes(number_of_nodes, screen=False):
+    green_pred = []
+    red_pred = []
+
+    def extend():
+        k = len(green_pred)
+        if k == number_of_nodes:
+            yield code_from_predecessor_masks(green_pred, red_pred)
+            return
+        old_green = list(green_pred)
+        old_red = list(red_pred)
+        for chunk in range(2**(4*k + 2)):
+            # the chunk encodes the selfloops of node k and its edges from and to the nodes 0, ..., k-1
+            green_loop = chunk & 1
+            red_loop = (chunk >> 1) & 1
+            if screen and green_loop and red_loop:
+                continue
+            edges = chunk >> 2
+            new_green = old_green + [green_loop << k]
+            new_red = old_red + [red_loop << k]
+            for i in range(k):
+                new_green[k] |= (edges & 1) << i
+                new_green[i] |= ((edges >> 1) & 1) << k
+                new_red[k] |= ((edges >> 2) & 1) << i
+                new_red[i] |= ((edges >> 3) & 1) << k
+                edges >>= 4
+            if screen and k == number_of_nodes - 1 and \
+                    screen_code(number_of_nodes, code_from_predecessor_masks(new_green, new_red)) is not None:
+                continue
+            if _minimal_relabelling(new_green, new_red, stop_if_smaller=True) is None:
+                continue
+            green_pred[:] = new_green
+            red_pred[:] = new_red
+            yield from extend()
+        green_pred[:] = old_green
+        red_pred[:] = old_red
+
+    yield from extend()
+
+
+# Returns a random code of a pattern of size n, where each bit has the given chance to be a 1, among the codes in
+# which every node has at least one incoming edge of each color, see random_valid_code.
+def bias_random_code(n, chance):
+    return random_valid_code(n, chance)
+
+
+# Returns a random code of a pattern with n nodes in which every node has at least one incoming edge of each color.
+# Each edge is there with the given chance, given that the pattern has this property, so for chance 0.5 all these
+# codes are equally likely. The code is drawn block by block, where the block of a node and a color is the mask of
+# the predecessors, and a block without any bit is drawn again. The random numbers come from rng, a random.Random.
+def random_valid_code(n, chance=0.5, rng=random):
+    if chance <= 0:
+        raise ValueError("Every node needs a predecessor of each color, so the chance of an edge must be positive.")
+    code = 0
+    for block in range(2*n):
+        mask = 0
+        while mask == 0:
+            if chance == 0.5:
+                mask = rng.getrandbits(n)
+            else:
+                mask = mask_of(i for i in range(n) if rng.random() < chance)
+        code |= mask << (n*block)
+    return code
+
+
+# Generates a list of all patterns that have the given hamming distance from the given pattern, that is, whose
+# codes differ from the given code in exactly distance bits.
+def generate_nearby_patterns(number_of_nodes, code, distance=1):
     result = []
-    for i in range(2*number_of_nodes**2):
-        if bit(code, i):
-            result.append(code - 2**i)
-        else:
-            result.append(code + 2**i)
+    for positions in combinations(range(2*number_of_nodes**2), distance):
+        result.append(code ^ mask_of(positions))
     return result
 
 
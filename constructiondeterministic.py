@@ -1,38 +1,62 @@
-def is_construction_deterministic(pattern):
-    sets = {frozenset({node}) for node in pattern.nodes}
-    change = True
-    while change:
-        change = False
+from misc import bits
 
-        # Calculate new sets
-        sets_to_add = set()
-        for set1 in sets:
-            for set2 in sets:
-                set1_green_succ = pattern.get_green_successors_of_set(set1)
-                set2_red_succ = pattern.get_red_successors_of_set(set2)
-                intersection = set1_green_succ.intersection(set2_red_succ)
-                is_new = True
-                for set3 in sets:
-                    if intersection.issubset(set3):
-                        is_new = False
-                        break
-                if is_new:
-                    sets_to_add.add(frozenset(intersection))
 
-        # Add new sets
-        for new_set in sets_to_add:
-            change = True
-            sets.add(new_set)
+# A pattern is construction deterministic if the set of all nodes cannot be constructed from the singletons by
+# taking green successors of one constructed set, red successors of another one and their intersection.
+# Sets of nodes are bitmasks over the positions in pattern.nodes. Only the maximal constructed sets are kept, since
+# the successors of a subset are subsets of the successors of the set. Every new maximal set is put on a worklist and,
+# once it is taken from there, only combined with itself and with the sets that were taken before it. The successors
+# of every set are computed only once.
+def is_construction_deterministic(pattern):
+    nodes = pattern.nodes
+    n = len(nodes)
+    if n == 0:
+        return True
+    all_nodes = (1 << n) - 1
+    if n == 1:
+        return False
+    position = {}
+    for i in range(n):
+        position[nodes[i]] = i
+    green_rows = [0] * n
+    red_rows = [0] * n
+    for i in range(n):
+        for node in pattern.get_green_successors(nodes[i]):
+            green_rows[i] |= 1 << position[node]
+        for node in pattern.get_red_successors(nodes[i]):
+            red_rows[i] |= 1 << position[node]
 
-        # Remove subsets
-        sets_to_remove = set()
-        for set1 in sets:
-            for set2 in sets:
-                if set1 != set2 and set1.issubset(set2):
-                    sets_to_remove.add(set1)
-        for set_to_remove in sets_to_remove:
-            sets.remove(set_to_remove)
+    green_images = {}
+    red_images = {}
 
-    set_of_all_nodes = set(pattern.nodes)
-    return set_of_all_nodes not in sets
+    def get_images(s):
+        if s not in green_images:
+            green_image = 0
+            red_image = 0
+            for i in bits(s):
+                green_image |= green_rows[i]
+                red_image |= red_rows[i]
+            green_images[s] = green_image
+            red_images[s] = red_image
 
+    # the maximal constructed sets
+    sets = {1 << i for i in range(n)}
+    worklist = [1 << i for i in range(n)]
+    done = []
+    while worklist:
+        set1 = worklist.pop()
+        if set1 not in sets:
+            continue
+        get_images(set1)
+        done = [s for s in done if s in sets]
+        done.append(set1)
+        for set2 in done:
+            for intersection in (green_images[set1] & red_images[set2], green_images[set2] & red_images[set1]):
+                if intersection == all_nodes:
+                    return False
+                if any(intersection & ~s == 0 for s in sets):
+                    continue
+                sets = {s for s in sets if s & ~intersection != 0}
+                sets.add(intersection)
+                worklist.append(intersection)
+    return True
@@ -0,0 +1,133 @@
+import numpy as np
+
+import codes
+from misc import bits
+
+
+# The images of sets of nodes under a relation given by its rows, where row j is the bitmask of the successors of
+# node j. images[mask] is the union of the rows of the nodes in mask, computed when it is first needed.
+class Images(dict):
+
+    def __init__(self, rows):
+        super().__init__()
+        self.rows = rows
+
+    def __missing__(self, mask):
+        image = 0
+        for j in bits(mask):
+            image |= self.rows[j]
+        self[mask] = image
+        return image
+
+
+# Decides whether there is a homomorphism from T_n into a pattern by backtracking over the nodes of T_n, without a
+# SAT solver. Node x of T_n has the green predecessor x // 2, the red predecessor x // 2 + 2^(n-1), and the
+# successors 2x mod 2^n and 2x+1 mod 2^n, which are green if x < 2^(n-1) and red otherwise, so the candidates for the
+# image of x are bitmasks and are revised against its four neighbours by four lookups of Images. After every choice
+# the candidates are made arc consistent again, and the changes are recorded on a trail to undo them when
+# backtracking. The next node is chosen by dom/wdeg: among the nodes with more than one candidate, the one with the
+# fewest candidates per weight. Every node starts with weight 1, and when revising a node leaves it without a candidate,
+# propagate adds 1 to its weight and to that of the neighbour whose change caused it, so the search turns to the nodes
+# that fail most often. The chosen node is first mapped to its smallest candidate and, if that fails, forbidden to go
+# there.
+class DeBruijnHomSolver:
+
+    def __init__(self, n, pattern):
+        number_of_nodes, code = pattern.to_code()
+        self.n = n
+        self.number_of_nodes = number_of_nodes
+        green = codes.get_green_successor_lists(number_of_nodes, code)
+        red = codes.get_red_successor_lists(number_of_nodes, code)
+        green_rows = [sum(1 << k for k in green[j]) for j in range(number_of_nodes)]
+        red_rows = [sum(1 << k for k in red[j]) for j in range(number_of_nodes)]
+        green_predecessor_rows = [sum(1 << j for j in range(number_of_nodes) if (green_rows[j] >> k) & 1)
+                                  for k in range(number_of_nodes)]
+        red_predecessor_rows = [sum(1 << j for j in range(number_of_nodes) if (red_rows[j] >> k) & 1)
+                                for k in range(number_of_nodes)]
+        self.green_images = Images(green_rows)
+        self.red_images = Images(red_rows)
+        self.green_preimages = Images(green_predecessor_rows)
+        self.red_preimages = Images(red_predecessor_rows)
+        self.green_loops = sum(1 << j for j in range(number_of_nodes) if (green_rows[j] >> j) & 1)
+        self.red_loops = sum(1 << j for j in range(number_of_nodes) if (red_rows[j] >> j) & 1)
+        self.domains = None
+
+    # Returns the candidates of node x that have a witness at all four neighbours.
+    def revise(self, x):
+        domains = self.domains
+        size = len(domains)
+        half = size // 2
+        first = 2*x % size
+        preimages = self.green_preimages if x < half else self.red_preimages
+        return domains[x] & self.green_images[domains[x // 2]] & self.red_images[domains[x // 2 + half]] & \
+            preimages[domains[first]] & preimages[domains[(first + 1) % size]]
+
+    # Makes the candidates arc consistent again after the candidates of the given nodes changed. Returns False if a
+    # node has no candidate left.
+    def propagate(self, changed, trail):
+        domains = self.domains
+        size = len(domains)
+        half = size // 2
+        while changed:
+            y = changed.pop()
+            for x in (y // 2, y // 2 + half, 2*y % size, (2*y + 1) % size):
+                domain = self.revise(x)
+                if domain != domains[x]:
+                    if domain == 0:
+                        self.weights[x] += 1
+                        self.weights[y] += 1
+                        return False
+                    trail.append((x, domains[x]))
+                    domains[x] = domain
+                    changed.append(x)
+        return True
+
+    def solve(self):
+        size = 2**self.n
+        self.domains = [(1 << self.number_of_nodes) - 1] * size
+        self.domains[0] &= self.green_loops
+        self.domains[-1] &= self.red_loops
+        if self.domains[0] == 0 or self.domains[-1] == 0:
+            return False
+        self.weights = [1] * size
+        trail = []
+        if not self.propagate(list(range(size)), trail):
+            return False
+        domains = self.domains
+        weights = self.weights
+        # the nodes with more than one candidate
+        open_nodes = list(range(size))
+        # every choice point is a node, the candidate it was mapped to, the length of the trail and the open nodes
+        # before
+        choices = []
+        while True:
+            open_nodes = [y for y in open_nodes if domains[y] & (domains[y] - 1)]
+            if not open_nodes:
+                return True
+            x = min(open_nodes, key=lambda y: bin(domains[y]).count("1") / weights[y])
+            candidate = domains[x] & -domains[x]
+            choices.append((x, candidate, len(trail), open_nodes))
+            trail.append((x, domains[x]))
+            domains[x] = candidate
+            if self.propagate([x], trail):
+                continue
+            # undo choices until forbidding the candidate of one of them is consistent
+            while True:
+                if not choices:
+                    return False
+                x, candidate, trail_length, open_nodes = choices.pop()
+                while len(trail) > trail_length:
+                    y, domain = trail.pop()
+                    domains[y] = domain
+                trail.append((x, domains[x]))
+                domains[x] &= ~candidate
+                if domains[x] != 0 and self.propagate([x], trail):
+                    break
+
+    # Returns the homomorphism found by solve as an array whose entry x is the image of node x.
+    def get_image_array(self):
+        return np.array([domain.bit_length() - 1 for domain in self.domains], dtype=np.int64)
+
+    # Like get_image_array, but returns a dictionary from the nodes of T_n to the indices of the nodes of the pattern.
+    def get_homo(self):
+        return dict(enumerate(self.get_image_array().tolist()))
@@ -77,15 +77,7 @@ def filter_patterns_using_first_path_condition(input, output):
     for line in input_file:
         number_of_nodes, code = line.split(",")
         nfa = Nfa.from_pattern_code(int(number_of_nodes), int(code))
-        all = nfa.states
-        # print(nfa)
-        nfa = nfa.power_nfa(full=True)
-        nfa.clear_final_states()
-        nfa.clear_start_states()
-        for state in all:
-            nfa.add_start_state(frozenset({state}))
-        nfa.add_final_state(frozenset(all))
-        if nfa.is_language_cofinite():
+        if nfa.is_cofinite_from_singletons():
             count += 1
             output_file.write(f"{number_of_nodes},{code}")
         else:
@@ -98,7 +90,9 @@ def filter_patterns_using_first_path_condition(input, output):
     print(f"Checked {total} patterns.")
     print(f"{count} of them satisfied the first path condition, {total - count} did not.")
 
-def filter_patterns_using_sat_solver(input, solved, unsolved, number):
+# If a liftingcache.LiftingCache is given, the liftings are taken from it, and a pattern that it already classifies up
+# to hom_until is not given to the SAT solver again.
+def filter_patterns_using_sat_solver(input, solved, unsolved, number, lifting_cache=None):
     input_file = open(input, "r")
     solved_file = open(solved, "a")
     unsolved_file = open(unsolved, "a")
@@ -109,20 +103,35 @@ def filter_patterns_using_sat_solver(input, solved, unsolved, number):
             break
         number_of_nodes, code = line.split(",")
         pattern = Pattern.from_code(int(number_of_nodes), int(code))
-        solved = False
+        solved = None
         hom_until = 20
-        n = hom_until
-        while pattern.get_number_of_nodes() < 14:
-            pattern = pattern.lifting().normalize_names()
-            pattern.remove_useless_nodes()
-            n = n - 1
-        print(f"Check Homo from T_{n} to L^{hom_until - n}(P)")
-        solver = satsolver.SatSolver()
-        solver.make_hom_clauses(Pattern.T_n(n), pattern)
-        if solver.solve():
-            solved = True
-        solver.delete()
-        del solver
+        if lifting_cache is not None:
+            original = pattern
+            homo_depth, depth_checked = lifting_cache.get_classification(pattern)
+            if homo_depth is not None and homo_depth <= hom_until:
+                solved = True
+            elif depth_checked is not None and depth_checked >= hom_until:
+                solved = False
+        if solved is None:
+            n = hom_until
+            while pattern.get_number_of_nodes() < 14:
+                if lifting_cache is not None:
+                    pattern = lifting_cache.get_lifting(pattern)
+                else:
+                    pattern = pattern.lifting().normalize_names()
+                    pattern.remove_useless_nodes()
+                n = n - 1
+            print(f"Check Homo from T_{n} to L^{hom_until - n}(P)")
+            solver = satsolver.SatSolver()
+            solver.make_hom_clauses(Pattern.T_n(n), pattern)
+            solved = solver.solve()
+            solver.delete()
+            del solver
+            if lifting_cache is not None:
+                if solved:
+                    lifting_cache.add_classification(original, homo_depth=hom_until)
+                else:
+                    lifting_cache.add_classification(original, depth_checked=hom_until)
         if solved:
             print(colored(f'Homo at {hom_until}', "green"))
             solved_file.write(f"{number_of_nodes},{code}")
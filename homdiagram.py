@@ -0,0 +1,121 @@
+import mmap
+import struct
+import sys
+
+import numpy as np
+
+# A homomorphism from T_n is stored as a reduced ordered decision diagram. The node x of T_n is read as n bits, most
+# significant bit first, like the keys of the files written by log_pattern. An inner node of the diagram tests the
+# bit at its level and continues with its low (bit 0) or high (bit 1) child. A leaf is the image of all nodes that end
+# there. Inner nodes with two equal children are left out, which is what the stars in the text files stand for, and
+# equal subdiagrams are shared.
+#
+# File layout (little endian):
+#   header:  magic, n, number of leaves, number of inner nodes, root      "<4sIIII"
+#   leaves:  the images                                                     "<i" each
+#   inner:   level, low, high                                              "<III" each
+# A reference r < number of leaves is the leaf r, otherwise it is the inner node r - number of leaves.
+
+MAGIC = b"HOMD"
+HEADER = struct.Struct("<4sIIII")
+LEAF = struct.Struct("<i")
+INNER = struct.Struct("<III")
+
+
+# Returns the references of the leaves and the inner nodes of the diagram of the image array, see get_diagram.
+def build_diagram(images):
+    images = np.asarray(images, dtype=np.int64)
+    n = len(images).bit_length() - 1
+    if 2**n != len(images):
+        raise ValueError("Length of hom is not a power of 2.")
+    leaves, references = np.unique(images, return_inverse=True)
+    levels, lows, highs = [], [], []
+    number_of_references = len(leaves)
+    for level in range(n-1, -1, -1):
+        low = references[0::2]
+        high = references[1::2]
+        different = low != high
+        # equal pairs of children at the same level become the same inner node
+        pairs, inverse = np.unique(np.stack((low[different], high[different]), axis=1), axis=0, return_inverse=True)
+        references = low.copy()
+        references[different] = number_of_references + inverse.reshape(-1)
+        levels.append(np.full(len(pairs), level, dtype=np.int64))
+        lows.append(pairs[:, 0])
+        highs.append(pairs[:, 1])
+        number_of_references += len(pairs)
+    inner = np.stack((np.concatenate(levels), np.concatenate(lows), np.concatenate(highs)), axis=1) if levels \
+        else np.zeros((0, 3), dtype=np.int64)
+    return n, leaves, inner, int(references[0])
+
+
+# Writes the homomorphism, given as an array whose entry i is the image of node i of T_n, as a decision diagram.
+def write_hom_diagram(filename, images):
+    n, leaves, inner, root = build_diagram(images)
+    file = open(filename, "wb")
+    file.write(HEADER.pack(MAGIC, n, len(leaves), len(inner), root))
+    file.write(leaves.astype("<i4").tobytes())
+    file.write(inner.astype("<u4").tobytes())
+    file.close()
+
+
+# Reads a file written by log_pattern and returns the homomorphism as an array whose entry i is the image of node i.
+def read_hom_text_file(filename):
+    entries = []
+    input_file = open(filename, "r")
+    for line in input_file:
+        line = line.strip()
+        if line == "":
+            continue
+        key, image = line.split(" : ")
+        entries.append((key.rstrip("*"), len(key), int(image)))
+    input_file.close()
+    n = entries[0][1]
+    images = np.zeros(2**n, dtype=np.int64)
+    for prefix, _, image in entries:
+        c = len(prefix)
+        start = int(prefix, 2) << (n - c) if c > 0 else 0
+        images[start:start + 2**(n - c)] = image
+    return images
+
+
+# Converts a file written by log_pattern into a decision diagram file.
+def convert_hom_text_file(text_filename, diagram_filename):
+    write_hom_diagram(diagram_filename, read_hom_text_file(text_filename))
+
+
+# Gives access to a decision diagram file without loading it. The image of a node is found by following one path
+# of the diagram, which reads at most n inner nodes.
+class HomDiagram:
+
+    def __init__(self, filename):
+        self.file = open(filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n, self.number_of_leaves, self.number_of_inner_nodes, self.root = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a decision diagram file.")
+        self.inner_offset = HEADER.size + LEAF.size * self.number_of_leaves
+
+    # Returns the image of node x of T_n.
+    def get_image(self, x):
+        reference = self.root
+        while reference >= self.number_of_leaves:
+            offset = self.inner_offset + INNER.size * (reference - self.number_of_leaves)
+            level, low, high = INNER.unpack_from(self.map, offset)
+            reference = high if (x >> (self.n - 1 - level)) & 1 else low
+        return LEAF.unpack_from(self.map, HEADER.size + LEAF.size * reference)[0]
+
+    # Returns the array whose entry i is the image of node i of T_n.
+    def to_image_array(self):
+        return np.array([self.get_image(x) for x in range(2**self.n)], dtype=np.int64)
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+# Converts the given text files, e.g. hom/*.txt, into decision diagram files with the ending .hom.
+if __name__ == "__main__":
+    for text_filename in sys.argv[1:]:
+        diagram_filename = text_filename.rsplit(".", 1)[0] + ".hom"
+        convert_hom_text_file(text_filename, diagram_filename)
+        print(f"{text_filename} -> {diagram_filename}")
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def convert_keys_of_hom_to_binary_strings(hom):
     newhom = {}
     n = 0
@@ -29,3 +32,31 @@ def compress_homomorphism(hom):
     for i in hom:
         filled_with_stars[i.ljust(n, '*')] = hom[i]
     return filled_with_stars
+
+
+# Does the same as compress_homomorphism(convert_keys_of_hom_to_binary_strings(hom)), where hom is given as an
+# array whose entry i is the image of node i. The nodes with a common prefix of length c are merged level by level:
+# levels[c][p] is the common image of all nodes with prefix p, or -1 if they do not all have the same image.
+# Only the strings of the merged prefixes are built.
+def compress_image_array(images):
+    images = np.asarray(images, dtype=np.int64)
+    n = len(images).bit_length() - 1
+    if 2**n != len(images):
+        raise ValueError("Length of hom is not a power of 2.")
+    levels = [images]
+    for c in range(n-1, 0, -1):
+        left = levels[-1][0::2]
+        right = levels[-1][1::2]
+        levels.append(np.where((left == right) & (left >= 0), left, -1))
+    levels.reverse()
+    if n == 0:
+        return {"0": int(images[0])}
+    filled_with_stars = {}
+    for c in range(1, n+1):
+        merged = levels[c-1] >= 0
+        if c > 1:
+            # a prefix is only written if its parent was not merged
+            merged &= np.repeat(levels[c-2] < 0, 2)
+        for p in np.nonzero(merged)[0]:
+            filled_with_stars[format(p, f"0{c}b").ljust(n, "*")] = int(levels[c-1][p])
+    return filled_with_stars
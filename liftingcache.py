@@ -0,0 +1,158 @@
+import sqlite3
+from collections import OrderedDict
+
+import codes
+from pattern import Pattern
+
+
+# Remembers the liftings of patterns and what is known about their homomorphisms, for all patterns that arise from
+# each other by reordering the nodes and exchanging red and green, since they have isomorphic liftings and
+# homomorphisms from the same T_n. A class is identified by its key (number of nodes, codes.refined_canonical_code),
+# and its entry is the key of the lifting of the class (with the useless nodes removed), the smallest known depth of
+# a homomorphism and the largest depth up to which there is known to be none, each None if it is unknown.
+# The most recently used max_size entries are kept in memory. If a filename is given, all entries are stored in an
+# SQLite database as well, in batches of batch_size, and entries that are not in memory are read from there. The codes
+# are stored as hexadecimal text, since the codes of liftings do not fit into 64 bits, and those of large liftings
+# have more decimal digits than Python converts by default.
+class LiftingCache:
+
+    def __init__(self, filename=None, max_size=100000, batch_size=1000):
+        self.entries = OrderedDict()
+        self.max_size = max_size
+        self.connection = None
+        if filename is not None:
+            self.connection = sqlite3.connect(filename, timeout=60)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS liftings (
+                    number_of_nodes INTEGER NOT NULL,
+                    code TEXT NOT NULL,
+                    lifting_number_of_nodes INTEGER,
+                    lifting_code TEXT,
+                    homo_depth INTEGER,
+                    depth_checked INTEGER,
+                    PRIMARY KEY (number_of_nodes, code)
+                ) WITHOUT ROWID""")
+            self.connection.commit()
+        self.batch_size = batch_size
+        self.pending = {}
+        # the number of liftings that were computed, and not found in the cache
+        self.computed = 0
+
+    @staticmethod
+    def get_key(pattern):
+        number_of_nodes, code = pattern.to_code()
+        return number_of_nodes, codes.refined_canonical_code(number_of_nodes, code)
+
+    # Returns the entry of the key as a list [lifting key, homo depth, depth checked], or None if there is none.
+    def get_entry(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        entry = self.pending.get(key)
+        if entry is None and self.connection is not None:
+            row = self.connection.execute("SELECT * FROM liftings WHERE number_of_nodes = ? AND code = ?",
+                                          (key[0], format(key[1], "x"))).fetchone()
+            if row is not None:
+                lifting_key = None if row[2] is None else (row[2], int(row[3], 16))
+                entry = [lifting_key, row[4], row[5]]
+        if entry is not None:
+            self.remember(key, entry)
+        return entry
+
+    def remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def write(self, key, entry):
+        self.remember(key, entry)
+        if self.connection is None:
+            return
+        self.pending[key] = entry
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    # Returns the key of the lifting of the class with the given key, and computes the lifting if it is not known.
+    def get_lifting_key(self, key, relation_class):
+        entry = self.get_entry(key)
+        if entry is None:
+            entry = [None, None, None]
+        if entry[0] is None:
+            lifting = Pattern.from_code(key[0], key[1], relation_class).lifting()
+            lifting.remove_useless_nodes()
+            entry[0] = self.get_key(lifting.normalize_names())
+            self.computed += 1
+            self.write(key, entry)
+        return entry[0]
+
+    # Returns the lifting of the pattern with the useless nodes removed, as the pattern of the canonical code of its
+    # class, with the relations of the same class as those of the given pattern.
+    def get_lifting(self, pattern):
+        relation_class = type(pattern.green)
+        return Pattern.from_code(*self.get_lifting_key(self.get_key(pattern), relation_class), relation_class)
+
+    # Like Pattern.get_liftings, but the liftings after the pattern itself are those of get_lifting.
+    def get_liftings(self, pattern, max_size=30):
+        relation_class = type(pattern.green)
+        liftings = [pattern]
+        key = self.get_key(pattern)
+        for i in range(10):
+            if key[0] > max_size:
+                break
+            key = self.get_lifting_key(key, relation_class)
+            liftings.append(Pattern.from_code(*key, relation_class))
+        return liftings
+
+    # Returns the smallest known depth of a homomorphism into the pattern and the largest depth up to which there is
+    # known to be none, each None if it is unknown. Since there is a homomorphism from T_n to a pattern iff there is
+    # one from T_{n-1} to its lifting, the entries of the known liftings count as well, shifted by their number.
+    def get_classification(self, pattern):
+        homo_depth = None
+        depth_checked = None
+        key = self.get_key(pattern)
+        shift = 0
+        while key is not None:
+            entry = self.get_entry(key)
+            if entry is None:
+                break
+            if entry[1] is not None and (homo_depth is None or entry[1] + shift < homo_depth):
+                homo_depth = entry[1] + shift
+            if entry[2] is not None and (depth_checked is None or entry[2] + shift > depth_checked):
+                depth_checked = entry[2] + shift
+            key = entry[0]
+            shift += 1
+            if shift > 10:
+                break
+        return homo_depth, depth_checked
+
+    # Records that there is a homomorphism from T_homo_depth into the pattern, or none from T_depth_checked.
+    def add_classification(self, pattern, homo_depth=None, depth_checked=None):
+        key = self.get_key(pattern)
+        entry = self.get_entry(key)
+        if entry is None:
+            entry = [None, None, None]
+        if homo_depth is not None and (entry[1] is None or homo_depth < entry[1]):
+            entry[1] = homo_depth
+        if depth_checked is not None and (entry[2] is None or depth_checked > entry[2]):
+            entry[2] = depth_checked
+        self.write(key, entry)
+
+    # Writes all pending entries to the database.
+    def flush(self):
+        if not self.pending:
+            return
+        rows = []
+        for (number_of_nodes, code), (lifting_key, homo_depth, depth_checked) in self.pending.items():
+            lifting_number_of_nodes, lifting_code = (None, None) if lifting_key is None else lifting_key
+            rows.append((number_of_nodes, format(code, "x"), lifting_number_of_nodes,
+                         None if lifting_code is None else format(lifting_code, "x"), homo_depth, depth_checked))
+        self.connection.executemany("INSERT OR REPLACE INTO liftings VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.connection.commit()
+        self.pending = {}
+
+    def close(self):
+        if self.connection is not None:
+            self.flush()
+            self.connection.close()
@@ -1,65 +1,137 @@
 import gc
+import os
+import queue
+import random
+import signal
 import sys
-from multiprocessing import Process
+from contextlib import contextmanager
+from multiprocessing import Manager, Process, Queue
 import time
 
 from termcolor import colored
 
+import batchcodes
 import codes
 import constructiondeterministic
+import debruijn
+import homdiagram
 import homomorphism
+import matrixlifting
 import misc
 
 import satsolver
 from pattern import Pattern
 from caleygraph import CaleyGraph
+from liftingcache import LiftingCache
 from relation import Relation
+from resultstore import ResultStore
+from workerpool import WorkerPool
 
 
-def check_pattern(number_of_nodes, code):
+# If a list lifting_sizes is given, the sizes of the liftings are appended to it. If a liftingcache.LiftingCache is
+# given, the liftings are taken from it, and a homomorphism found by a double selfloop is recorded there. If verbose is
+# True, the number of nodes of every lifting is printed.
+def check_pattern(number_of_nodes, code, max_nodes=100, vectorized=False, lifting_sizes=None, lifting_cache=None,
+                  verbose=False):
     # if not Pattern.check_code_normal_form(number_of_nodes, code):
     #    return 6
-    pattern = Pattern.from_code(number_of_nodes, code)
 
-    # some preprocessing
-    if pattern.has_double_selfloop():
-        return 1
-    if not pattern.has_green_selfloop() or not pattern.has_red_selfloop():
-        return 0
-    if pattern.has_useless_nodes():
-        return 2
-    if not pattern.check_red_connected():
-        return 2
-    if not pattern.check_green_connected():
-        return 2
+    # some preprocessing, done on the code so that rejected codes never become a Pattern
+    result = codes.screen_code(number_of_nodes, code)
+    if result is not None:
+        return result
+    pattern = Pattern.from_code(number_of_nodes, code)
     pattern.remove_useless_edges()
     pattern.remove_useless_nodes()
     if len(pattern.nodes) == 0:
         return 0
+    if vectorized:
+        return check_liftings_vectorized(pattern, max_nodes, lifting_sizes, verbose)
 
     # iterate L
+    start = pattern
     for i in range(9):
         if pattern.has_double_selfloop():
+            if lifting_cache is not None:
+                lifting_cache.add_classification(start, homo_depth=i, depth_checked=i-1)
             return 3
         num_nodes = pattern.get_number_of_nodes()
+        if lifting_sizes is not None:
+            lifting_sizes.append(num_nodes)
         num_red_edges = pattern.get_number_of_red_edges()
         num_green_edges = pattern.get_number_of_green_edges()
-        if num_nodes > 100:
+        if num_nodes > max_nodes:
             return 5
-        pattern = pattern.lifting()
-        pattern = pattern.normalize_names()
-        gc.collect()  # call garbage collector to free memory
-        pattern.remove_useless_nodes()
+        if lifting_cache is not None:
+            pattern = lifting_cache.get_lifting(pattern)
+        else:
+            pattern = pattern.lifting()
+            pattern = pattern.normalize_names()
+            gc.collect()  # call garbage collector to free memory
+            pattern.remove_useless_nodes()
         if num_nodes == pattern.get_number_of_nodes() and \
                 num_red_edges == pattern.get_number_of_red_edges() and \
                 num_green_edges == pattern.get_number_of_green_edges():
             return 4
         # pattern.log(True)
-        print(len(pattern.nodes))
+        if verbose:
+            print(len(pattern.nodes))
+    return 5
+
+
+# The lifting loop of check_pattern, done on adjacency matrices.
+def check_liftings_vectorized(pattern, max_nodes, lifting_sizes=None, verbose=False):
+    green, red = matrixlifting.pattern_to_matrices(pattern)
+    for i in range(9):
+        if matrixlifting.has_double_selfloop(green, red):
+            return 3
+        num_nodes = len(green)
+        if lifting_sizes is not None:
+            lifting_sizes.append(num_nodes)
+        num_red_edges = red.sum()
+        num_green_edges = green.sum()
+        if num_nodes > max_nodes:
+            return 5
+        green, red = matrixlifting.lifting(green, red)
+        green, red = matrixlifting.remove_useless_nodes(green, red)
+        if num_nodes == len(green) and num_red_edges == red.sum() and num_green_edges == green.sum():
+            return 4
+        if verbose:
+            print(len(green))
     return 5
 
 # Searches a homomorphism from a Tn into the pattern. The depth is the maximum n that is checked.
-def search_homo(pattern, depth):
+# If incremental is True, all depths are solved by one satsolver.IncrementalHomSolver. If arc_consistency is True,
+# the other CNFs are built by satsolver.SatSolver.code_to_pruned_cnf. The backend "debruijn" decides the depths with
+# debruijn.DeBruijnHomSolver instead of a SAT solver. If portfolio is a list of pysat solver names, every CNF is solved
+# by a satsolver.PortfolioSolver that races them. If a liftingcache.LiftingCache is given, the liftings are taken from
+# it, the depths up to which it knows that there is no homomorphism are not searched again, the search stops below a
+# known homomorphism, and the result is recorded there.
+def search_homo(pattern, depth, incremental=False, arc_consistency=False, backend="sat", portfolio=None,
+                lifting_cache=None):
+    if lifting_cache is None:
+        return search_homo_in_liftings(pattern, depth, incremental, arc_consistency, backend, portfolio)
+    homo_depth, depth_checked = lifting_cache.get_classification(pattern)
+    last_depth = depth if homo_depth is None else min(depth, homo_depth - 1)
+    first_depth = 0 if depth_checked is None else depth_checked + 1
+    homo_at = -1
+    if first_depth <= last_depth:
+        homo_at = search_homo_in_liftings(pattern, last_depth, incremental, arc_consistency, backend, portfolio,
+                                          lifting_cache, first_depth)
+        with pattern_timeout_deferred():
+            if homo_at == -1:
+                lifting_cache.add_classification(pattern, depth_checked=last_depth)
+            else:
+                lifting_cache.add_classification(pattern, homo_depth=homo_at, depth_checked=homo_at - 1)
+    if homo_at == -1 and homo_depth is not None and homo_depth <= depth:
+        return homo_depth
+    return homo_at
+
+
+# Searches a homomorphism from T_n into the pattern for first_depth <= n <= depth, for the callers that already know
+# that there is none for smaller n.
+def search_homo_in_liftings(pattern, depth, incremental=False, arc_consistency=False, backend="sat", portfolio=None,
+                            lifting_cache=None, first_depth=0):
     if pattern.has_double_selfloop():
         return 0
 
@@ -68,11 +140,16 @@ def search_homo(pattern, depth):
     for i in range(depth):
         if last.get_number_of_nodes() > 30:
             break
-        lifting = last.lifting()
+        if lifting_cache is not None:
+            with pattern_timeout_deferred():
+                lifting = lifting_cache.get_lifting(last)
+        else:
+            lifting = last.lifting()
         if lifting.has_double_selfloop():
             return i+1
-        lifting.normalize_names()
-        lifting.remove_useless_nodes()
+        if lifting_cache is None:
+            lifting.normalize_names()
+            lifting.remove_useless_nodes()
         last = lifting
         liftings.append(last)
 
@@ -81,12 +158,32 @@ def search_homo(pattern, depth):
         if liftings[i + 1].get_number_of_nodes() / liftings[i].get_number_of_nodes() < 2:
             best = i
 
-    for n in range(len(liftings), depth + 1):
-        solver = satsolver.SatSolver()
-        solver.make_hom_clauses_efficient(n - best, liftings[best])
-        if solver.solve():
-            return n
-        solver.delete()
+    if backend == "debruijn":
+        for n in range(max(len(liftings), first_depth), depth + 1):
+            if debruijn.DeBruijnHomSolver(n - best, liftings[best]).solve():
+                return n
+        return -1
+
+    # the solvers are deleted in any case, also if a PatternTimeout interrupts them
+    if incremental:
+        solver = satsolver.IncrementalHomSolver(liftings[best], depth - best)
+        try:
+            for n in range(max(len(liftings), first_depth), depth + 1):
+                solver.set_depth(n - best)
+                if solver.solve():
+                    return n
+        finally:
+            solver.delete()
+        return -1
+
+    for n in range(max(len(liftings), first_depth), depth + 1):
+        solver = satsolver.PortfolioSolver(portfolio) if portfolio else satsolver.SatSolver()
+        try:
+            solver.make_hom_clauses_efficient(n - best, liftings[best], arc_consistency)
+            if solver.solve():
+                return n
+        finally:
+            solver.delete()
         del solver
     return -1
 
@@ -109,14 +206,256 @@ def search_counterexample():
             continue
         homo_at = search_homo(pattern, 21)
         if homo_at == -1:
-            log_pattern(number_of_nodes, code)
+            log_pattern(code)
             break
         else:
             print(f"  homo at {homo_at}")
 
 
-def log_pattern(code):
+# The filters of search_counterexample_multicore, in the order in which they are applied. A code passes "screened" if
+# codes.screen_code does not reject it, "construction_nondeterministic" if the pattern is not construction
+# deterministic, "path_conditions" if it satisfies all three path conditions, and "counterexamples" if there is no
+# homomorphism from T_n for n up to the depth.
+COUNTEREXAMPLE_STAGES = ("screened", "construction_nondeterministic", "path_conditions", "counterexamples")
+
+
+# Worker of search_counterexample_multicore. Draws number_of_samples codes with codes.random_valid_code, or does not
+# stop if it is None, and skips every code whose class under codes.refined_canonical_code is already in the shared
+# dictionary seen. The other codes go through the filters of COUNTEREXAMPLE_STAGES, and the codes that pass a filter
+# are appended to the file <stage>.txt in the directory, one line per code, so that the files are complete at every
+# moment. Every counterexample is reported to the result queue right away, and the counts of the stages at the end.
+def search_counterexample_worker(worker, number_of_nodes, chance, depth, number_of_samples, seed, seen, directory,
+                                 results):
+    rng = random.Random(None if seed is None else seed + worker)
+    lifting_cache = LiftingCache()
+    files = {}
+    for stage in COUNTEREXAMPLE_STAGES:
+        files[stage] = open(os.path.join(directory, f"{stage}.txt"), "a", buffering=1)
+    counts = dict.fromkeys(("sampled", "duplicates") + COUNTEREXAMPLE_STAGES, 0)
+    while number_of_samples is None or counts["sampled"] < number_of_samples:
+        code = codes.random_valid_code(number_of_nodes, chance, rng)
+        counts["sampled"] += 1
+        token = (worker, counts["sampled"])
+        if seen.setdefault(codes.refined_canonical_code(number_of_nodes, code), token) != token:
+            counts["duplicates"] += 1
+            continue
+
+        def passes(stage, passed):
+            if passed:
+                counts[stage] += 1
+                files[stage].write(f"{number_of_nodes},{code}\n")
+            return passed
+
+        if not passes("screened", codes.screen_code(number_of_nodes, code) is None):
+            continue
+        pattern = Pattern.from_code(number_of_nodes, code)
+        if not passes("construction_nondeterministic",
+                      not constructiondeterministic.is_construction_deterministic(pattern)):
+            continue
+        cg = CaleyGraph(pattern)
+        if not passes("path_conditions", cg.check_first_path_condition() and cg.check_second_path_condition() and
+                      cg.check_third_path_condition()):
+            continue
+        if passes("counterexamples", search_homo(pattern, depth, lifting_cache=lifting_cache) == -1):
+            results.put(("counterexample", worker, code))
+    for file in files.values():
+        file.close()
+    results.put(("finished", worker, counts))
+
+
+# Like search_counterexample, but with several worker processes, see search_counterexample_worker, which share the
+# classes of the codes they have drawn, so that no class is checked twice. The codes that pass the filters are
+# written to files in the directory. If stop_at_first is True, the search ends with the first counterexample,
+# otherwise when every worker has drawn number_of_samples codes. Returns the list of counterexamples.
+def search_counterexample_multicore(number_of_nodes, cores, directory, chance=0.4, depth=21, number_of_samples=None,
+                                    seed=None, stop_at_first=True):
+    os.makedirs(directory, exist_ok=True)
+    manager = Manager()
+    seen = manager.dict()
+    results = Queue()
+    workers = [Process(target=search_counterexample_worker,
+                       args=(worker, number_of_nodes, chance, depth, number_of_samples, seed, seen, directory,
+                             results))
+               for worker in range(cores)]
+    for worker in workers:
+        worker.start()
+    counterexamples = []
+    totals = dict.fromkeys(("sampled", "duplicates") + COUNTEREXAMPLE_STAGES, 0)
+    finished = 0
+    while finished < cores:
+        try:
+            message = results.get(timeout=1)
+        except queue.Empty:
+            if not any(worker.is_alive() for worker in workers) and results.empty():
+                break
+            continue
+        if message[0] == "counterexample":
+            counterexamples.append(message[2])
+            print(colored(f"Counterexample: {number_of_nodes},{message[2]}", "red"))
+            if stop_at_first:
+                break
+        else:
+            finished += 1
+            for key, count in message[2].items():
+                totals[key] += count
+    for worker in workers:
+        worker.terminate()
+        worker.join()
+    manager.shutdown()
+    if finished == cores:
+        print(", ".join(f"{key}: {count}" for key, count in totals.items()))
+    return counterexamples
+
+
+# A cheap proxy for how deep the homomorphisms into the pattern are: the number of its liftings, starting with the
+# pattern itself, before the first one with more than max_size nodes or a double selfloop, and the negative number of
+# nodes of that lifting. The liftings of patterns with deep homomorphisms tend to grow slowly, and search_homo only
+# starts to solve CNFs at the depth of the first lifting with more than 30 nodes.
+def get_lifting_growth(pattern, lifting_cache, max_size=30):
+    count = 0
+    for lifting in lifting_cache.get_liftings(pattern, max_size):
+        if lifting.get_number_of_nodes() > max_size or lifting.has_double_selfloop():
+            return count, -lifting.get_number_of_nodes()
+        count += 1
+    return count, 0
+
+
+# Worker of local_search, see workerpool.WorkerPool. Takes tasks (kind, number_of_nodes, code) from its task queue
+# until it gets None, and sends ("finished", worker, task, value) through its result connection. For the kind "growth",
+# the value is get_lifting_growth of the pattern, or None if the pattern is construction deterministic or violates a
+# path condition, since then there is no homomorphism at all. For the kind "classify", it is the result of search_homo
+# up to the depth, or None if that took more than time_limit seconds of CPU time. The time limit is measured by
+# ITIMER_PROF, since the solver maplechrono sets ITIMER_REAL and takes over SIGALRM whenever it solves. A timeout
+# deletes the solver it interrupts, and waits until a write to the cache is finished.
+# The workers share their liftings and results through the liftingcache.LiftingCache in cache_filename, which is
+# written after every task.
+def local_search_worker(worker, tasks, results, depth, cache_filename, time_limit):
+    lifting_cache = LiftingCache(cache_filename)
+    signal.signal(signal.SIGPROF, raise_pattern_timeout)
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        kind, number_of_nodes, code = task
+        pattern = Pattern.from_code(number_of_nodes, code)
+        value = None
+        if kind == "growth":
+            if not constructiondeterministic.is_construction_deterministic(pattern):
+                cg = CaleyGraph(pattern)
+                if cg.check_first_path_condition() and cg.check_second_path_condition() and \
+                        cg.check_third_path_condition():
+                    value = get_lifting_growth(pattern, lifting_cache)
+        else:
+            # a timeout that arrives while the timer is reset is caught as well, and then it can not arrive later
+            try:
+                try:
+                    if time_limit is not None:
+                        signal.setitimer(signal.ITIMER_PROF, time_limit)
+                    value = search_homo(pattern, depth, lifting_cache=lifting_cache)
+                finally:
+                    signal.setitimer(signal.ITIMER_PROF, 0)
+            except PatternTimeout:
+                pass
+        lifting_cache.flush()
+        results.send(("finished", worker, task, value))
+    lifting_cache.close()
+
+
+# Gives the codes to the workers of local_search as tasks of the given kind and returns a dictionary from the codes to
+# the values the workers report for them. A code that kills the workers again and again gets the value None.
+def run_local_search_tasks(pool, kind, number_of_nodes, code_list):
+    values = {}
+
+    def handle(message):
+        values[message[2][2]] = message[3]
+
+    def give_up(task):
+        values[task[2]] = None
+
+    pool.run([(kind, number_of_nodes, code) for code in code_list], handle, give_up)
+    return values
+
+
+# Searches patterns with deep homomorphisms by a local search from the start codes, for example those of
+# patternlists/5/no_homo_until_21.txt, with a workerpool.WorkerPool, see local_search_worker. Every step collects
+# the codes within Hamming distance radius of the current codes, and skips those that codes.screen_code rejects and
+# all classes under codes.refined_canonical_code that were seen before, so no class is classified twice. The width
+# neighbours whose liftings grow slowest, or all if width is None, are classified by search_homo up to the depth,
+# where no homomorphism up to the depth counts as the deepest. The search moves on to the deepest of them as long as
+# they are at least as deep as the best codes so far, and stops when they are not or after max_steps steps. If
+# cache_filename is given, the liftings and results are stored in a liftingcache.LiftingCache there, so that a later
+# search does not solve them again. Returns a dictionary from all classified codes to their result of search_homo,
+# or None if the search took more than time_limit seconds of CPU time.
+def local_search(number_of_nodes, start_codes, cores, radius=1, depth=22, width=None, max_steps=None,
+                 cache_filename=None, time_limit=None):
+    pool = WorkerPool(local_search_worker, (depth, cache_filename, time_limit), cores)
+
+    def score(homo_at):
+        return depth + 1 if homo_at == -1 else homo_at
+
+    seen = set()
+    current = []
+    for code in start_codes:
+        key = codes.refined_canonical_code(number_of_nodes, code)
+        if key not in seen:
+            seen.add(key)
+            current.append(code)
+    classified = run_local_search_tasks(pool, "classify", number_of_nodes, current)
+    current = [code for code in current if classified[code] is not None]
+    best = max((score(classified[code]) for code in current), default=None)
+    current = [code for code in current if score(classified[code]) == best]
+    step = 0
+    while current and (max_steps is None or step < max_steps):
+        step += 1
+        neighbours = []
+        for code in current:
+            for distance in range(1, radius + 1):
+                for neighbour in codes.generate_nearby_patterns(number_of_nodes, code, distance):
+                    if codes.screen_code(number_of_nodes, neighbour) is not None:
+                        continue
+                    key = codes.refined_canonical_code(number_of_nodes, neighbour)
+                    if key not in seen:
+                        seen.add(key)
+                        neighbours.append(neighbour)
+        growth = run_local_search_tasks(pool, "growth", number_of_nodes, neighbours)
+        candidates = sorted((code for code in neighbours if growth[code] is not None), key=lambda code: growth[code],
+                            reverse=True)[:width]
+        step_results = run_local_search_tasks(pool, "classify", number_of_nodes, candidates)
+        classified.update(step_results)
+        depths = {code: score(homo_at) for code, homo_at in step_results.items() if homo_at is not None}
+        print(colored(f"Step {step}: {len(neighbours)} new neighbours, {len(candidates)} classified, deepest "
+                      f"{max(depths.values(), default=None)}, best so far {best}", "yellow"))
+        if not depths or max(depths.values()) < best:
+            break
+        best = max(depths.values())
+        current = [code for code, depth_reached in depths.items() if depth_reached == best]
+        for code in current:
+            homo_at = classified[code]
+            print(f"{number_of_nodes},{code}: " + ("no homo" if homo_at == -1 else f"homo at {homo_at}"))
+    pool.close()
+    return classified
+
+
+# Prints the properties of the pattern and searches a homomorphism from T_n for n up to max_depth. If incremental is
+# True, all depths are solved by one satsolver.IncrementalHomSolver. If a resultstore.ResultStore is given, the result
+# is recorded there, and the pattern is skipped if the store already classifies it up to max_depth. If arc_consistency
+# is True, the non incremental CNFs only get variables for the images that survive arc consistency. If portfolio is a
+# list of pysat solver names, they race on every CNF, and the one that answered the last CNF first is recorded.
+# If a cnfcache.CnfCache is given, the non incremental CNFs without arc consistency are taken from it or stored in
+# it, and if it has an export directory, the CNF of every depth is exported there as <code>_<lifting>_<depth>.cnf.
+def log_pattern(code, max_depth=22, incremental=False, store=None, arc_consistency=False, portfolio=None,
+                cnf_cache=None):
     number_of_nodes = codes.get_number_of_nodes(code)
+    if store is not None and store.is_classified(number_of_nodes, code, max_depth):
+        print(f"{code} is already classified: {store.get(number_of_nodes, code)}")
+        return
+    start_time = time.time()
+
+    def record(outcome, homo_depth=None, depth_checked=None, cnf_variables=None, cnf_clauses=None, solver=None):
+        if store is not None:
+            store.add(number_of_nodes, code, outcome, homo_depth, depth_checked, lifting_sizes,
+                      time.time() - start_time, cnf_variables, cnf_clauses, solver)
+
     YES = colored("YES", "green")
     NO = colored("NO", "red")
     pattern = Pattern.from_code(number_of_nodes, code)
@@ -128,7 +467,7 @@ def log_pattern(code):
     print(f"Construction nondet.:  {YES if const_nondet else NO}")
     print(f"Caleygraph size:       ", end="", flush=True)
     cg = CaleyGraph(pattern)
-    print(f"{cg.caley_graph.get_number_of_nodes()}")
+    print(f"{cg.get_number_of_nodes()}")
     first_pc = cg.check_first_path_condition()
     second_pc = cg.check_second_path_condition()
     third_pc = cg.check_third_path_condition()
@@ -149,6 +488,7 @@ def log_pattern(code):
     print(f"Lifting sizes:         {', '.join(lifting_sizes)}")
 
     if solved:
+        record(4)
         return
 
     best = 0
@@ -160,34 +500,64 @@ def log_pattern(code):
         if liftings[i].has_double_selfloop():
             homo_at = i
             print(colored(f"Homomorphism at:       {homo_at}", "green"))
+            record(3, homo_at)
             return
 
     if not solved:
         print(f"Search homomorphism...")
         print(f"No hom until:          {best-1}")
 
-    for n in range(best, 23):
+    number_of_variables, number_of_clauses = None, None
+    winner = None
+    if incremental:
+        solver = satsolver.IncrementalHomSolver(liftings[best], max_depth - best)
+    for n in range(best, max_depth + 1):
         print(f"Depth {n}:")
         print("    Create CNF... ", end="", flush=True)
-        solver = satsolver.SatSolver()
-        solver.make_hom_clauses_efficient(n-best, liftings[best])
-        print(f"{solver.solver.nof_vars():,} Variables and {solver.solver.nof_clauses():,} Clauses")
+        build_start = time.time()
+        if incremental:
+            solver.set_depth(n-best)
+            number_of_variables, number_of_clauses = solver.get_size_of_current_depth()
+        else:
+            solver = satsolver.PortfolioSolver(portfolio) if portfolio else satsolver.SatSolver()
+            solver.make_hom_clauses_efficient(n-best, liftings[best], arc_consistency, cnf_cache,
+                                              [f"pattern {code}", f"lifting {best}", f"depth {n}"])
+            if cnf_cache is not None and cnf_cache.export_directory is not None and not arc_consistency:
+                cnf_cache.export(n-best, *liftings[best].to_code(), f"{code}_{best}_{n}")
+            number_of_variables, number_of_clauses = solver.get_size()
+        print(f"{number_of_variables:,} Variables and {number_of_clauses:,} Clauses "
+              f"({time.time() - build_start:.2f} seconds)")
         print(f"    Solve CNF... ", end="", flush=True)
-        if solver.solve():
+        solve_start = time.time()
+        satisfiable = solver.solve()
+        print(f"({time.time() - solve_start:.2f} seconds) ", end="")
+        if portfolio and not incremental:
+            winner = solver.winner
+            print(f"[{winner}] ", end="")
+        if satisfiable:
             print(f"SATISFIABLE!")
             solved = True
             homo_at = n
             print(colored(f"\nHomomorphism at:       {homo_at}", "green"))
-            hom = solver.get_homo(liftings[best].get_number_of_nodes())
-            string_hom = homomorphism.convert_keys_of_hom_to_binary_strings(hom)
-            compressed_hom = homomorphism.compress_homomorphism(string_hom)
+            if incremental:
+                images = solver.get_image_array()
+            else:
+                images = solver.get_image_array(liftings[best].get_number_of_nodes())
+            compressed_hom = homomorphism.compress_image_array(images)
             misc.write_dict_to_file_sorted_by_keys(f"{code}.txt", compressed_hom)
+            homdiagram.write_hom_diagram(f"{code}.hom", images)
+            record(3, homo_at, n - 1, number_of_variables, number_of_clauses, winner)
         else:
             print("UNSATISFIABLE!")
-        solver.delete()
-        del solver
+        if not incremental:
+            solver.delete()
+            del solver
         if solved:
             break
+    if incremental:
+        solver.delete()
+    if not solved:
+        record(5, None, max_depth, number_of_variables, number_of_clauses, winner)
     print("")
 
 
@@ -202,15 +572,33 @@ def find_good_relations():
     out.close()
 
 
-def check_pattern_range(start, finish, filename):
+# The codes are screened in blocks by batchcodes.screen_code_blocks, so only the codes that pass go through
+# check_pattern. If store_filename is given, the results of check_pattern are recorded in this
+# resultstore.ResultStore, and codes that already have a result there are skipped. The codes that screening rejects
+# are not stored, since screening them again is cheaper than looking them up.
+def check_pattern_range(start, finish, filename, store_filename=None):
     results = [0, 0, 0, 0, 0, 0, 0]
-    for code in range(start, finish):
-        result = check_pattern(4, code)
-        results[result] += 1
-        if result == 5:
-            f = open(filename, "a")
-            f.write(f"4,{code}\n")
-            f.close()
+    store = None
+    classified = set()
+    if store_filename is not None:
+        store = ResultStore(store_filename)
+        classified = store.get_classified_codes(4, start, finish)
+    for survivors, rejections in batchcodes.screen_code_blocks(4, start, finish):
+        for result in range(len(results)):
+            results[result] += rejections[result]
+        for code in survivors:
+            if code in classified:
+                continue
+            lifting_sizes = []
+            start_time = time.time()
+            result = check_pattern(4, code, lifting_sizes=lifting_sizes)
+            results[result] += 1
+            if store is not None:
+                store.add(4, code, result, lifting_sizes=lifting_sizes, seconds=time.time() - start_time)
+            if result == 5:
+                f = open(filename, "a")
+                f.write(f"4,{code}\n")
+                f.close()
         # if code % 1000 == 0:
         #     print(results)
 
@@ -229,56 +617,180 @@ def check_pattern_range(start, finish, filename):
         # if result == 6:
         #     print(str(code) + ": " + colored("No Normal Form", "yellow"))
     # print(results)
+    if store is not None:
+        store.close()
 
 
-def check_pattern_range_multicore(start, finish, batch_size, cores, filename):
-    # Calculate how many batches and initialize batch counter
-    batches = (finish - start) // batch_size
-    current_batch = 0
-    processes = []
-
-    # Start the processes
-    while current_batch < cores:
-        p = Process(target=check_pattern_range, args=(
-        start + batch_size * current_batch, start + batch_size * (current_batch + 1), f"{current_batch}.txt"))
-        current_batch += 1
-        p.start()
-        processes.append(p)
-
-    # Check every second whether a process has finished. If this is the case, and if there are more batches,
-    # then start the process again with the next batch.
-    while current_batch < batches:
-        time.sleep(1)
-        for i in range(len(processes)):
-            if current_batch < batches and not processes[i].is_alive():
-                p = Process(target=check_pattern_range, args=(
-                start + batch_size * current_batch, start + batch_size * (current_batch + 1), f"{current_batch}.txt"))
-                current_batch += 1
-                p.start()
-                processes[i] = p
-                print(colored(f"{current_batch / batches * 100}%", "yellow"))
-
-    # Wait for all processes to finish
-    for p in processes:
-        p.join()
-
-    # Write all results into one file.
-    f = open(filename, "a")
-    for i in range(batches):
-        try:
-            f2 = open(f"{i}.txt", "r")
-            f.write(f2.read())
-            f2.close()
-        except OSError:
-            pass
-    f.close()
-
-if len(sys.argv) > 1:
-    code = int(sys.argv[1])
-else:
-    code = 586082719390259
-
-start_time = time.time()
-log_pattern(code)
-end_time = time.time()
-print(f"Finished in {end_time - start_time} seconds")
+# Like check_pattern_range, but checks only the canonical code of every class of patterns that arise from each
+# other by reordering the nodes and exchanging red and green.
+def check_canonical_patterns(number_of_nodes, filename):
+    results = [0, 0, 0, 0, 0, 0, 0]
+    for code in codes.canonical_codes(number_of_nodes, screen=True):
+        result = check_pattern(number_of_nodes, code)
+        results[result] += 1
+        if result == 5:
+            f = open(filename, "a")
+            f.write(f"{number_of_nodes},{code}\n")
+            f.close()
+    return results
+
+
+class PatternTimeout(Exception):
+    pass
+
+
+def raise_pattern_timeout(signum, frame):
+    raise PatternTimeout()
+
+
+# Blocks the signals of the time limits meanwhile, so that a PatternTimeout can not interrupt a write to a cache half
+# way. A signal that arrives meanwhile raises the PatternTimeout right afterwards.
+@contextmanager
+def pattern_timeout_deferred():
+    try:
+        # a signal that arrived just before is raised here, and the signals are unblocked again
+        signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM, signal.SIGPROF})
+        yield
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGALRM, signal.SIGPROF})
+
+
+# Splits the range into chunks for the workers of check_pattern_range_multicore. The chunks get smaller towards the
+# end of the range, so that all workers finish at about the same time, but never larger than batch_size.
+def get_chunks(start, finish, batch_size, cores):
+    chunks = []
+    position = start
+    while position < finish:
+        size = max(1, min(batch_size, (finish - position) // (4 * cores)))
+        chunks.append((position, min(finish, position + size)))
+        position += size
+    return chunks
+
+
+# Worker of check_pattern_range_multicore, see workerpool.WorkerPool. Takes chunks from its task queue until it gets
+# None, and reports every chunk it finishes through its result connection. If checking a pattern takes more than
+# time_limit seconds, it is interrupted by an alarm signal and reported as timed out. The codes are screened in blocks
+# by batchcodes.screen_code_blocks, and only those that pass are checked one by one and recorded in the store.
+def check_chunks(worker, tasks, results, store_filename, time_limit):
+    store = ResultStore(store_filename) if store_filename is not None else None
+    signal.signal(signal.SIGALRM, raise_pattern_timeout)
+    while True:
+        chunk = tasks.get()
+        if chunk is None:
+            break
+        outcomes = [0, 0, 0, 0, 0, 0, 0]
+        unknown = []
+        timed_out = []
+        rows = []
+        classified = store.get_classified_codes(4, chunk[0], chunk[1]) if store is not None else set()
+        for survivors, rejections in batchcodes.screen_code_blocks(4, chunk[0], chunk[1]):
+            for result in range(len(outcomes)):
+                outcomes[result] += rejections[result]
+            for code in survivors:
+                if code in classified:
+                    continue
+                lifting_sizes = []
+                start_time = time.time()
+                result = None
+                # an alarm that arrives while the alarm is reset is caught as well, and then it can not arrive later
+                try:
+                    try:
+                        if time_limit is not None:
+                            signal.setitimer(signal.ITIMER_REAL, time_limit)
+                        result = check_pattern(4, code, lifting_sizes=lifting_sizes)
+                    finally:
+                        signal.setitimer(signal.ITIMER_REAL, 0)
+                except PatternTimeout:
+                    pass
+                with pattern_timeout_deferred():
+                    if result is None:
+                        timed_out.append(code)
+                        continue
+                    outcomes[result] += 1
+                    if result == 5:
+                        unknown.append(code)
+                    if store is not None:
+                        rows.append((code, result, lifting_sizes, time.time() - start_time))
+        results.send(("finished", worker, chunk, outcomes, unknown, timed_out, rows))
+    if store is not None:
+        store.close()
+
+
+# Checks all 4-node codes in the range with a workerpool.WorkerPool, which hands out chunks of at most batch_size
+# codes. The unknown codes are appended to the file as soon as a chunk is finished, codes whose check takes longer than
+# time_limit seconds are appended to timeout_filename, and the progress is printed with an estimate of the remaining
+# time. If a worker dies, its chunk is given to a new worker, and if it has killed max_restarts workers already, the
+# codes of the chunk that pass screening are appended to timeout_filename instead. If store_filename is given, the
+# results are recorded in this resultstore.ResultStore, and codes that already have a result there are skipped.
+def check_pattern_range_multicore(start, finish, batch_size, cores, filename, store_filename=None, time_limit=None,
+                                  timeout_filename=None, max_restarts=2):
+    if timeout_filename is None:
+        timeout_filename = f"{filename}.timeouts"
+    chunks = get_chunks(start, finish, batch_size, cores)
+    store = ResultStore(store_filename) if store_filename is not None else None
+    pool = WorkerPool(check_chunks, (store_filename, time_limit), cores, max_restarts)
+    outcomes = [0, 0, 0, 0, 0, 0, 0]
+    number_of_checked_codes = 0
+    number_of_timeouts = 0
+    number_of_finished_chunks = 0
+    start_time = time.time()
+    last_report = [start_time]
+
+    def report_progress():
+        if time.time() - last_report[0] < 1 and number_of_finished_chunks < len(chunks):
+            return
+        last_report[0] = time.time()
+        seconds = time.time() - start_time
+        codes_per_second = number_of_checked_codes / seconds
+        eta = (finish - start - number_of_checked_codes) / codes_per_second
+        print(colored(f"{number_of_checked_codes / (finish - start) * 100:.2f}%  {codes_per_second:,.0f} codes/s  "
+                      f"ETA {eta:,.0f}s  timeouts: {number_of_timeouts}", "yellow"))
+
+    def handle(message):
+        nonlocal number_of_checked_codes, number_of_timeouts, number_of_finished_chunks
+        _, worker, chunk, chunk_outcomes, unknown, timed_out, rows = message
+        for i in range(len(outcomes)):
+            outcomes[i] += chunk_outcomes[i]
+        if unknown:
+            f = open(filename, "a")
+            f.write("".join(f"4,{code}\n" for code in unknown))
+            f.close()
+        if timed_out:
+            f = open(timeout_filename, "a")
+            f.write("".join(f"4,{code}\n" for code in timed_out))
+            f.close()
+        if store is not None:
+            for code, result, lifting_sizes, seconds in rows:
+                store.add(4, code, result, lifting_sizes=lifting_sizes, seconds=seconds)
+        number_of_checked_codes += chunk[1] - chunk[0]
+        number_of_timeouts += len(timed_out)
+        number_of_finished_chunks += 1
+        report_progress()
+
+    def give_up(chunk):
+        nonlocal number_of_checked_codes, number_of_timeouts, number_of_finished_chunks
+        survivors = [code for block, _ in batchcodes.screen_code_blocks(4, chunk[0], chunk[1]) for code in block]
+        f = open(timeout_filename, "a")
+        f.write("".join(f"4,{code}\n" for code in survivors))
+        f.close()
+        number_of_checked_codes += chunk[1] - chunk[0]
+        number_of_timeouts += len(survivors)
+        number_of_finished_chunks += 1
+        report_progress()
+
+    pool.run(chunks, handle, give_up)
+    pool.close()
+    if store is not None:
+        store.close()
+    return outcomes
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        code = int(sys.argv[1])
+    else:
+        code = 586082719390259
+
+    start_time = time.time()
+    log_pattern(code)
+    end_time = time.time()
+    print(f"Finished in {end_time - start_time} seconds")
@@ -0,0 +1,96 @@
+import numpy as np
+
+from pattern import Pattern
+from relation import Relation
+
+
+# A pattern with m nodes is represented by two boolean m x m matrices green and red, where green[i, j] is True iff
+# there is a green edge from node i to node j. The node names are the row indices, so every function here returns
+# matrices whose nodes are already normalized to 0, ..., m-1.
+
+# Returns the adjacency matrices of the pattern. Row i belongs to pattern.nodes[i].
+def pattern_to_matrices(pattern):
+    number_of_nodes = pattern.get_number_of_nodes()
+    index = {}
+    for i in range(number_of_nodes):
+        index[pattern.nodes[i]] = i
+    green = np.zeros((number_of_nodes, number_of_nodes), dtype=bool)
+    red = np.zeros((number_of_nodes, number_of_nodes), dtype=bool)
+    for i in range(number_of_nodes):
+        for node in pattern.get_green_successors(pattern.nodes[i]):
+            green[i, index[node]] = True
+        for node in pattern.get_red_successors(pattern.nodes[i]):
+            red[i, index[node]] = True
+    return green, red
+
+
+def matrices_to_pattern(green, red, relation_class=Relation):
+    pattern = Pattern.empty_pattern(relation_class)
+    for i in range(len(green)):
+        pattern.add_node(i)
+    for i, j in zip(*np.nonzero(green)):
+        pattern.add_green_edge(int(i), int(j))
+    for i, j in zip(*np.nonzero(red)):
+        pattern.add_red_edge(int(i), int(j))
+    return pattern
+
+
+def has_double_selfloop(green, red):
+    return bool(np.any(np.diagonal(green) & np.diagonal(red)))
+
+
+# Returns the matrix whose entry (i, j) is True iff the nodes i and j have a common predecessor.
+def _common_predecessors(matrix):
+    as_float = matrix.astype(np.float32)
+    return (as_float.T @ as_float) > 0
+
+
+# Computes the same pattern as Pattern.lifting followed by Pattern.normalize_names. The pair (u1, u2) is the node
+# number p, where the pairs are numbered in the order in which Pattern.lifting creates them. Write A[u, q] for
+# "both nodes of the pair q are successors of u". Then (u1, u2) -> q is an edge iff A[u1, q] or A[u2, q].
+def lifting(green, red):
+    candidates = np.triu(_common_predecessors(green) & _common_predecessors(red))
+    first, second = np.nonzero(candidates)
+    green_both = green[:, first] & green[:, second]
+    red_both = red[:, first] & red[:, second]
+    lifted_green = green_both[first] | green_both[second]
+    lifted_red = red_both[first] | red_both[second]
+    return lifted_green, lifted_red
+
+
+# Returns a boolean vector that marks the nodes that Pattern.get_useless_nodes returns.
+def get_useless_nodes(green, red):
+    useless = ~green.any(axis=0) | ~red.any(axis=0) | ~(green.any(axis=1) | red.any(axis=1))
+
+    # neighbourhood[a] consists of the red predecessors, red successors, green predecessors and green successors
+    neighbourhood = np.concatenate((red.T, red, green.T, green), axis=1).astype(np.float32)
+    # contained[a, b] is True iff every neighbour of a is a neighbour of b
+    contained = (neighbourhood @ (1 - neighbourhood).T) == 0
+    # for i < j, j is removed if i dominates j, and otherwise i is removed if j dominates i
+    useless |= np.tril(contained, -1).any(axis=1)
+    useless |= np.triu(contained & ~contained.T, 1).any(axis=1)
+    return useless
+
+
+# Does the same as Pattern.remove_useless_nodes followed by Pattern.normalize_names.
+def remove_useless_nodes(green, red):
+    while len(green) > 0:
+        useless = get_useless_nodes(green, red)
+        if not useless.any():
+            break
+        keep = ~useless
+        green = green[keep][:, keep]
+        red = red[keep][:, keep]
+    return green, red
+
+
+# Returns a list of pairs of matrices, where result[i] is the i-th lifting. Works like Pattern.get_liftings.
+def get_liftings(green, red, max_size=30, number_of_liftings=10):
+    liftings = [(green, red)]
+    for i in range(number_of_liftings):
+        if len(green) > max_size:
+            break
+        green, red = lifting(green, red)
+        green, red = remove_useless_nodes(green, red)
+        liftings.append((green, red))
+    return liftings
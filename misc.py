@@ -2,4 +2,20 @@ def write_dict_to_file_sorted_by_keys(filename, dic):
     file = open(filename, "w")
     for key in sorted(dic):
         file.write(key + " : " + str(dic[key]) + "\n")
-    file.close()
\ No newline at end of file
+    file.close()
+
+
+# Yields the positions of the bits that are set in the given integer, starting with the least significant one.
+def bits(mask):
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+# Returns the integer whose set bits are exactly the given positions.
+def mask_of(positions):
+    mask = 0
+    for position in positions:
+        mask |= 1 << position
+    return mask
@@ -1,3 +1,8 @@
+from collections import deque
+
+from misc import bits, mask_of
+
+
 class Nfa:
 
     def __init__(self):
@@ -112,13 +117,15 @@ class Nfa:
 
     def power_nfa(self, full):
         if full:
-            queue = [{state} for state in self.states]
+            queue = deque(frozenset({state}) for state in self.states)
         else:
-            queue = [self.start]
+            queue = deque([frozenset(self.start)])
         pow = Nfa()
         pow.start = {frozenset(self.start)}
+        for state in queue:
+            pow.add_state(state)
         while len(queue) > 0:
-            state = frozenset(queue.pop(0))
+            state = queue.popleft()
             green_successor = set()
             red_successor = set()
             for s in state:
@@ -126,22 +133,29 @@ class Nfa:
                 red_successor = red_successor.union(self.get_red_successors(s))
             green_successor = frozenset(green_successor)
             red_successor = frozenset(red_successor)
-            if state not in pow.states:
-                pow.add_state(state)
             if green_successor not in pow.states:
                 pow.add_state(green_successor)
-                if green_successor not in queue:
-                    queue.append(green_successor)
+                queue.append(green_successor)
             if red_successor not in pow.states:
                 pow.add_state(red_successor)
-                if red_successor not in queue:
-                    queue.append(red_successor)
+                queue.append(red_successor)
             pow.add_green_edge(state, green_successor)
             pow.add_red_edge(state, red_successor)
         pow.final = {macrostate for macrostate in pow.states if len(macrostate.intersection(self.final)) > 0}
 
         return pow
 
+    # Returns the list of states together with the successors of every state as bitmasks, where bit i stands for
+    # the i-th state of the list.
+    def get_successor_masks(self):
+        states = list(self.states)
+        index = {}
+        for i in range(len(states)):
+            index[states[i]] = i
+        green_rows = [mask_of(index[s] for s in self.green_succ[state]) for state in states]
+        red_rows = [mask_of(index[s] for s in self.red_succ[state]) for state in states]
+        return states, green_rows, red_rows
+
     # restricts the nfa to the given set of states
     def restrict_to(self, states):
         to_remove = set()
@@ -198,12 +212,129 @@ class Nfa:
         self.minimize()
         return not self.contains_cycle()
 
+    # Returns whether for every state q there is a word that leads from {q} to the set of all states in the power
+    # automaton. The power automaton is explored on demand, with sets of states as bitmasks, by a breadth first search
+    # from one singleton after the other. Sets that are known to lead to all states are remembered, so that a later
+    # search stops as soon as it reaches one of them, and the first singleton that cannot reach all states ends the
+    # check.
     def satisfies_path_condition(self):
-        singletons = set([frozenset({q}) for q in self.states])
-        all = frozenset(set(self.states))
-        pow = self.power_nfa()
-        reachable = pow.get_backwards_reachable_nodes({all})
-        return singletons.issubset(reachable)
+        states, green_rows, red_rows = self.get_successor_masks()
+        all_states = (1 << len(states)) - 1
+        leads_to_all = {all_states}
+        for q in range(len(states)):
+            start = 1 << q
+            parent = {start: None}
+            queue = deque([start])
+            found = start if start in leads_to_all else None
+            while queue and found is None:
+                subset = queue.popleft()
+                for rows in (green_rows, red_rows):
+                    successor = 0
+                    for state in bits(subset):
+                        successor |= rows[state]
+                    if successor in leads_to_all:
+                        found = subset
+                        break
+                    if successor not in parent:
+                        parent[successor] = subset
+                        queue.append(successor)
+            if found is None:
+                return False
+            while found is not None:
+                leads_to_all.add(found)
+                found = parent[found]
+        return True
+
+    # Returns whether for all but finitely many words w there is a state q such that {q} leads to the set of all states
+    # under w. This is what is_language_cofinite decides for the power automaton with the singletons as start states
+    # and the set of all states as final state, but without building any automaton.
+    # A word w is described by the macrostate of the sets {q}w, stored as one integer with n bits per state. A
+    # macrostate is bad if none of its sets contains all states, and the bad words are finite iff no cycle from which a
+    # bad macrostate can be reached is reachable. The macrostates are explored by a depth first search that finds the
+    # strongly connected components with Tarjan's algorithm and stops at the first component that is a cycle and can
+    # reach a bad macrostate. Since every word that is good for a macrostate is good for all larger macrostates, the
+    # minimal macrostates that cannot reach a bad one are kept as an antichain, and every macrostate above one of them
+    # is not explored.
+    def is_cofinite_from_singletons(self):
+        states, green_rows, red_rows = self.get_successor_masks()
+        n = len(states)
+        all_states = (1 << n) - 1
+        row_shifts = range(0, n * n, n)
+
+        def get_successor(macrostate, rows):
+            result = 0
+            for shift in row_shifts:
+                image = 0
+                for state in bits((macrostate >> shift) & all_states):
+                    image |= rows[state]
+                result |= image << shift
+            return result
+
+        def is_bad(macrostate):
+            return all((macrostate >> shift) & all_states != all_states for shift in row_shifts)
+
+        good_antichain = []
+
+        def is_known_good(macrostate):
+            return any(good & ~macrostate == 0 for good in good_antichain)
+
+        start = mask_of(n * i + i for i in range(n))
+        order = {}
+        low = {}
+        reaches_bad = {}
+        on_stack = set()
+        stack = []
+        counter = 0
+        # every entry of the call stack is a macrostate, its successors and the number of them visited so far
+        calls = []
+
+        def visit(macrostate):
+            nonlocal counter
+            order[macrostate] = low[macrostate] = counter
+            counter += 1
+            reaches_bad[macrostate] = is_bad(macrostate)
+            stack.append(macrostate)
+            on_stack.add(macrostate)
+            calls.append((macrostate, (get_successor(macrostate, green_rows), get_successor(macrostate, red_rows)), 0))
+
+        visit(start)
+        while calls:
+            macrostate, successors, visited = calls.pop()
+            if visited < 2:
+                calls.append((macrostate, successors, visited + 1))
+                next_macrostate = successors[visited]
+                if next_macrostate not in order:
+                    if not is_known_good(next_macrostate):
+                        visit(next_macrostate)
+                elif next_macrostate in on_stack:
+                    low[macrostate] = min(low[macrostate], order[next_macrostate])
+                elif reaches_bad[next_macrostate]:
+                    reaches_bad[macrostate] = True
+                continue
+            if calls:
+                parent = calls[-1][0]
+                low[parent] = min(low[parent], low[macrostate])
+                if reaches_bad[macrostate] and low[macrostate] != order[macrostate]:
+                    reaches_bad[parent] = True
+            if low[macrostate] == order[macrostate]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.remove(member)
+                    component.append(member)
+                    if member == macrostate:
+                        break
+                bad = any(reaches_bad[member] for member in component)
+                if bad and (len(component) > 1 or macrostate in successors):
+                    return False
+                for member in component:
+                    reaches_bad[member] = bad
+                    if not bad and not is_known_good(member):
+                        good_antichain[:] = [good for good in good_antichain if member & ~good != 0]
+                        good_antichain.append(member)
+                if bad and calls:
+                    reaches_bad[calls[-1][0]] = True
+        return True
 
     # Returns the set of all nodes that are backwards reachable from the given set of nodes.
     def get_backwards_reachable_nodes(self, start):
@@ -1,6 +1,8 @@
 from random import randint
 
 import codes
+from bitrelation import BitRelation
+from misc import bits, mask_of
 from relation import Relation
 
 
@@ -11,9 +13,10 @@ class Pattern:
         self.green = green
         self.red = red
 
+    # The relation class can be Relation or BitRelation. BitRelation requires the nodes to be integers.
     @classmethod
-    def empty_pattern(cls):
-        return cls([], Relation(), Relation())
+    def empty_pattern(cls, relation_class=Relation):
+        return cls([], relation_class(), relation_class())
 
     @classmethod
     def from_edge_lists(cls, nodes, red_edges, green_edges):
@@ -40,20 +43,18 @@ class Pattern:
         return pattern
 
     @classmethod
-    def from_code(cls, number_of_nodes, code):
-        pattern = cls.empty_pattern()
+    def from_code(cls, number_of_nodes, code, relation_class=Relation):
+        pattern = cls.empty_pattern(relation_class)
         for i in range(number_of_nodes):
             pattern.add_node(i)
-        green = codes.get_green_successor_lists(number_of_nodes, code)
-        for i in range(number_of_nodes):
-            for j in range(number_of_nodes):
-                if j in green[i]:
-                    pattern.add_green_edge(i, j)
-        red = codes.get_red_successor_lists(number_of_nodes, code)
-        for i in range(number_of_nodes):
-            for j in range(number_of_nodes):
-                if j in red[i]:
-                    pattern.add_red_edge(i, j)
+        # the predecessor masks are cut out of the code at once, instead of testing the bits of the code one by one
+        green_pred = codes.get_green_predecessor_masks(number_of_nodes, code)
+        red_pred = codes.get_red_predecessor_masks(number_of_nodes, code)
+        for j in range(number_of_nodes):
+            for i in bits(green_pred[j]):
+                pattern.add_green_edge(i, j)
+            for i in bits(red_pred[j]):
+                pattern.add_red_edge(i, j)
         return pattern
 
     @classmethod
@@ -131,6 +132,13 @@ class Pattern:
         self.green.remove_node(node)
         self.red.remove_node(node)
 
+    # Removes all the given nodes at once.
+    def remove_nodes(self, nodes):
+        removed = set(nodes)
+        self.nodes[:] = [node for node in self.nodes if node not in removed]
+        self.green.remove_nodes(removed)
+        self.red.remove_nodes(removed)
+
     def get_red_predecessors(self, node):
         return self.red.get_predecessors(node)
 
@@ -236,31 +244,34 @@ class Pattern:
     # Returns whether there are nodes without successor, without green predecessor, without red predecessor,
     # or dominated by another node.
     def has_useless_nodes(self):
-        # Is there a node with missing successors or predecessors?
+        n = len(self.nodes)
+        return len(self.find_useless_positions(self.get_signatures(), n, range(n), (1 << n) - 1, True)) > 0
+
+    # Returns a dictionary that maps every node to the tuple of the bitmasks of its red predecessors, red successors,
+    # green predecessors and green successors. For a BitRelation, bit i stands for node i, otherwise it stands for
+    # the node at position i of self.nodes.
+    def get_neighbourhoods(self):
+        neighbourhoods = {}
+        if isinstance(self.green, BitRelation):
+            for node in self.nodes:
+                neighbourhoods[node] = (self.red.get_predecessor_mask(node), self.red.get_successor_mask(node),
+                                        self.green.get_predecessor_mask(node), self.green.get_successor_mask(node))
+            return neighbourhoods
+        index = {}
+        for i in range(len(self.nodes)):
+            index[self.nodes[i]] = i
         for node in self.nodes:
-            red_successor = len(self.red.succ[node]) > 0
-            red_predecessor = len(self.red.pred[node]) > 0
-            green_successor = len(self.green.succ[node]) > 0
-            green_predecessor = len(self.green.pred[node]) > 0
-            if not red_predecessor or not green_predecessor:
-                return True
-            if not red_successor and not green_successor:
-                return True
+            neighbourhoods[node] = (mask_of(index[x] for x in self.red.get_predecessors(node)),
+                                    mask_of(index[x] for x in self.red.get_successors(node)),
+                                    mask_of(index[x] for x in self.green.get_predecessors(node)),
+                                    mask_of(index[x] for x in self.green.get_successors(node)))
+        return neighbourhoods
 
-        # Is there a node dominated by other node?
-        for a in self.nodes:
-            for b in self.nodes:
-                if a != b:
-                    if self.red.pred[a].issubset(self.red.pred[b]) and \
-                            self.red.succ[a].issubset(self.red.succ[b]) and \
-                            self.green.pred[a].issubset(self.green.pred[b]) and \
-                            self.green.succ[a].issubset(self.green.succ[b]):
-                        return True
-                    if self.red.pred[b].issubset(self.red.pred[a]) and self.red.succ[b].issubset(self.red.succ[a]) and \
-                            self.green.pred[b].issubset(self.green.pred[a]) and self.green.succ[b].issubset(
-                            self.green.succ[a]):
-                        return True
-        return False
+    # Given the neighbourhoods of two nodes a and b, returns whether every neighbour of a is a neighbour of b.
+    @staticmethod
+    def is_dominated(neighbourhood_a, neighbourhood_b):
+        return neighbourhood_a[0] & ~neighbourhood_b[0] == 0 and neighbourhood_a[1] & ~neighbourhood_b[1] == 0 and \
+            neighbourhood_a[2] & ~neighbourhood_b[2] == 0 and neighbourhood_a[3] & ~neighbourhood_b[3] == 0
 
     def to_code(self):
         number_of_nodes = len(self.nodes)
@@ -291,52 +302,83 @@ class Pattern:
         new_green = self.green.rename(renaming)
         return Pattern(new_nodes, new_green, new_red)
 
-    def get_useless_nodes(self):
-
-        useless_nodes = set()
-
-        # nodes that have missing successors or predecessors
+    # Returns the neighbourhoods of get_neighbourhoods as one bitmask per position in self.nodes, which holds the masks
+    # of the red predecessors, red successors, green predecessors and green successors in consecutive blocks of
+    # len(self.nodes) bits, where bit i of a block stands for the node at position i. Node a is dominated by node b
+    # iff the signature of a is a subset of the signature of b.
+    def get_signatures(self):
+        n = len(self.nodes)
+        neighbourhoods = self.get_neighbourhoods()
+        if isinstance(self.green, BitRelation) and self.nodes != list(range(n)):
+            # the bits stand for the nodes themselves and are moved to their positions
+            position = {}
+            for i in range(n):
+                position[self.nodes[i]] = i
+            for node in self.nodes:
+                neighbourhoods[node] = tuple(mask_of(position[x] for x in bits(mask)) for mask in neighbourhoods[node])
+        signatures = []
         for node in self.nodes:
-            red_successor = len(self.red.succ[node]) > 0
-            red_predecessor = len(self.red.pred[node]) > 0
-            green_successor = len(self.green.succ[node]) > 0
-            green_predecessor = len(self.green.pred[node]) > 0
-            if not red_predecessor or not green_predecessor:
-                useless_nodes.add(node)
-            if not red_successor and not green_successor:
-                useless_nodes.add(node)
-
-        # nodes dominated by other nodes
-        for i in range(len(self.nodes)):
-            a = self.nodes[i]
-            for j in range(i+1, len(self.nodes)):
-                b = self.nodes[j]
-                a_dominates_b = False
-                b_dominates_a = False
-                if self.red.pred[a].issubset(self.red.pred[b]) and \
-                        self.red.succ[a].issubset(self.red.succ[b]) and \
-                        self.green.pred[a].issubset(self.green.pred[b]) and \
-                        self.green.succ[a].issubset(self.green.succ[b]):
-                    b_dominates_a = True
-                if self.red.pred[b].issubset(self.red.pred[a]) and self.red.succ[b].issubset(self.red.succ[a]) and \
-                        self.green.pred[b].issubset(self.green.pred[a]) and self.green.succ[b].issubset(
-                        self.green.succ[a]):
-                    a_dominates_b = True
-                if a_dominates_b:
-                    useless_nodes.add(b)
-                elif b_dominates_a:
-                    useless_nodes.add(a)
-
-        return useless_nodes
+            red_predecessor, red_successor, green_predecessor, green_successor = neighbourhoods[node]
+            signatures.append(red_predecessor | red_successor << n | green_predecessor << 2*n | green_successor << 3*n)
+        return signatures
+
+    # Returns the candidates that are useless among the positions in the mask alive, given the signatures of
+    # get_signatures with n positions: those without a red or green predecessor or without any successor, and those
+    # dominated by another position, where of two positions with the same signature the later one is useless. The
+    # dominators are tried in the order of decreasing size, since a signature can only be dominated by a larger one.
+    # If stop_at_first is True, at most one position is returned.
+    @staticmethod
+    def find_useless_positions(signatures, n, candidates, alive, stop_at_first=False):
+        block = (1 << n) - 1
+        sizes = [signature.bit_count() for signature in signatures]
+        dominators = sorted(bits(alive), key=lambda y: -sizes[y])
+        useless = []
+        for x in candidates:
+            signature = signatures[x]
+            if signature & block == 0 or (signature >> 2*n) & block == 0 or \
+                    (signature >> n) & block == 0 and (signature >> 3*n) & block == 0:
+                useless.append(x)
+            else:
+                for y in dominators:
+                    if sizes[y] < sizes[x]:
+                        break
+                    if y != x and signature & ~signatures[y] == 0 and (y < x or signature != signatures[y]):
+                        useless.append(x)
+                        break
+            if stop_at_first and useless:
+                break
+        return useless
+
+    def get_useless_nodes(self):
+        n = len(self.nodes)
+        return {self.nodes[x] for x in self.find_useless_positions(self.get_signatures(), n, range(n), (1 << n) - 1)}
 
+    # Removes the useless nodes of get_useless_nodes until there are none. Removing nodes only shrinks the signatures
+    # of their neighbours, so a node that is not useless can only become useless if it is a neighbour of a removed
+    # node. Hence every round only looks at these neighbours, after the removed nodes were cleared from their
+    # signatures, and the nodes are removed from the relations at the end all at once.
     def remove_useless_nodes(self):
-        change_was_made = True
-        while (change_was_made):
-            to_remove = self.get_useless_nodes()
-            change_was_made = False
-            for node in to_remove:
-                change_was_made = True
-                self.remove_node(node)
+        n = len(self.nodes)
+        block = (1 << n) - 1
+        signatures = self.get_signatures()
+        alive = block
+        candidates = range(n)
+        while True:
+            useless = self.find_useless_positions(signatures, n, candidates, alive)
+            if not useless:
+                break
+            removed = mask_of(useless)
+            alive &= ~removed
+            neighbours = 0
+            for x in useless:
+                signature = signatures[x]
+                neighbours |= signature | signature >> n | signature >> 2*n | signature >> 3*n
+            keep = ~(removed | removed << n | removed << 2*n | removed << 3*n)
+            candidates = list(bits(neighbours & alive & block))
+            for y in candidates:
+                signatures[y] &= keep
+        if alive != block:
+            self.remove_nodes([self.nodes[x] for x in bits(block & ~alive)])
 
     # returns True if node1 and node2 have a common green predecessor
     def common_green_pred(self, node1, node2):
@@ -347,6 +389,8 @@ class Pattern:
         return self.red.common_pred(node1, node2)
 
     def lifting(self):
+        if isinstance(self.green, BitRelation):
+            return self.bit_lifting()
         prod = self.empty_pattern()
         for i in range(len(self.nodes)):
             for j in range(i, len(self.nodes)):
@@ -363,10 +407,56 @@ class Pattern:
                     prod.add_green_edge((u1,u2), (v1,v2))
         return prod
 
+    # Computes the same pattern as lifting().normalize_names(), but works on the bitmask rows of a pattern whose
+    # relations are BitRelations. The pair (u1, u2) with v1, v2 both being red successors of u1 or both being red
+    # successors of u2 is a red edge, so the lifted row of (u1, u2) is the union of the rows "pairs inside the
+    # successors of u1" and "pairs inside the successors of u2", which are computed once per node of this pattern.
+    def bit_lifting(self):
+        pairs = []
+        for i in range(len(self.nodes)):
+            u1 = self.nodes[i]
+            for j in range(i, len(self.nodes)):
+                u2 = self.nodes[j]
+                if self.green.common_pred(u1, u2) and self.red.common_pred(u1, u2):
+                    pairs.append((1 << u1) | (1 << u2))
+        lifted_green = {}
+        lifted_red = {}
+        for node in self.nodes:
+            green_succ = self.green.get_successor_mask(node)
+            red_succ = self.red.get_successor_mask(node)
+            green_row = 0
+            red_row = 0
+            for index in range(len(pairs)):
+                if pairs[index] & green_succ == pairs[index]:
+                    green_row |= 1 << index
+                if pairs[index] & red_succ == pairs[index]:
+                    red_row |= 1 << index
+            lifted_green[node] = green_row
+            lifted_red[node] = red_row
+        green_rows = []
+        red_rows = []
+        for pair in pairs:
+            ends = list(bits(pair))
+            green_rows.append(lifted_green[ends[0]] | lifted_green[ends[-1]])
+            red_rows.append(lifted_red[ends[0]] | lifted_red[ends[-1]])
+        node_mask = (1 << len(pairs)) - 1
+        return Pattern(list(range(len(pairs))), BitRelation.from_rows(node_mask, green_rows),
+                       BitRelation.from_rows(node_mask, red_rows))
+
     # Returns a list of patterns, where result[i] is the i-th lifting of the pattern.
     # The number of liftings computed depends on max_size. If a lifting has more than max_size many points,
-    # then no further lifting is computed.
-    def get_liftings(self, max_size=30):
+    # then no further lifting is computed. If vectorized is True, the liftings are computed on adjacency matrices
+    # with numpy (see matrixlifting.py) and only turned into patterns at the end. If a liftingcache.LiftingCache is
+    # given, the liftings are taken from it, see LiftingCache.get_liftings.
+    def get_liftings(self, max_size=30, vectorized=False, cache=None):
+        if cache is not None:
+            return cache.get_liftings(self, max_size)
+        if vectorized:
+            import matrixlifting
+            green, red = matrixlifting.pattern_to_matrices(self)
+            matrices = matrixlifting.get_liftings(green, red, max_size)
+            relation_class = type(self.green)
+            return [self] + [matrixlifting.matrices_to_pattern(g, r, relation_class) for g, r in matrices[1:]]
         liftings = [self]
         last = self
         for i in range(10):
@@ -398,7 +488,7 @@ class Pattern:
         if len(word) == 0:
             return set(self.nodes)
 
-        relation = Relation.diagonal(len(self.nodes))
+        relation = type(self.green).diagonal(len(self.nodes))
 
         for i in range(len(word)):
             if word[i] == 0:
@@ -51,6 +51,20 @@ class Relation:
             if node in self.pred[a]:
                 self.pred[a].remove(node)
 
+    # Removes all the given nodes, only looking at the neighbours of the removed nodes.
+    def remove_nodes(self, nodes):
+        removed = set(nodes)
+        for node in removed:
+            for succ in self.succ[node]:
+                if succ not in removed:
+                    self.pred[succ].discard(node)
+            for pred in self.pred[node]:
+                if pred not in removed:
+                    self.succ[pred].discard(node)
+        for node in removed:
+            del self.succ[node]
+            del self.pred[node]
+
     def add_edge(self, node1, node2):
         self.succ[node1].add(node2)
         self.pred[node2].add(node1)
@@ -0,0 +1,120 @@
+import sqlite3
+
+# The outcomes are the return values of main.check_pattern:
+# 0 trivial no homo, 1 trivial homo, 2 ignore, 3 non trivial homo, 4 non trivial no homo, 5 unknown, 6 no normal form.
+UNKNOWN = 5
+
+
+# Stores the classification of patterns in an SQLite database, keyed by the number of nodes and the code. Since SQLite
+# integers have 64 bits, this works for codes of patterns with up to five nodes. The database runs in WAL mode, so
+# that several processes can write to it, and results are written in batches of batch_size.
+# Besides the outcome, a result can contain the depth at which a homomorphism was found, the largest depth for which
+# no homomorphism was found, the sizes of the liftings, the running time, the size of the last CNF and, for a
+# satsolver.PortfolioSolver, the solver that answered the last CNF first.
+class ResultStore:
+
+    COLUMNS = ["number_of_nodes", "code", "outcome", "homo_depth", "depth_checked", "lifting_sizes", "seconds",
+               "cnf_variables", "cnf_clauses", "solver"]
+
+    def __init__(self, filename, batch_size=1000):
+        self.connection = sqlite3.connect(filename, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                number_of_nodes INTEGER NOT NULL,
+                code INTEGER NOT NULL,
+                outcome INTEGER NOT NULL,
+                homo_depth INTEGER,
+                depth_checked INTEGER,
+                lifting_sizes TEXT,
+                seconds REAL,
+                cnf_variables INTEGER,
+                cnf_clauses INTEGER,
+                solver TEXT,
+                PRIMARY KEY (number_of_nodes, code)
+            ) WITHOUT ROWID""")
+        # databases written before the solver was recorded get the column
+        columns = [column[1] for column in self.connection.execute("PRAGMA table_info(results)")]
+        if "solver" not in columns:
+            self.connection.execute("ALTER TABLE results ADD COLUMN solver TEXT")
+        self.connection.commit()
+        self.batch_size = batch_size
+        self.pending = {}
+
+    # Records a result. An older result for the same pattern is replaced.
+    def add(self, number_of_nodes, code, outcome, homo_depth=None, depth_checked=None, lifting_sizes=None,
+            seconds=None, cnf_variables=None, cnf_clauses=None, solver=None):
+        if lifting_sizes is not None:
+            lifting_sizes = ",".join(str(size) for size in lifting_sizes)
+        self.pending[(number_of_nodes, code)] = (number_of_nodes, code, outcome, homo_depth, depth_checked,
+                                                 lifting_sizes, seconds, cnf_variables, cnf_clauses, solver)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    # Writes all pending results to the database.
+    def flush(self):
+        if not self.pending:
+            return
+        self.connection.executemany(f"INSERT OR REPLACE INTO results VALUES ({', '.join('?' * len(self.COLUMNS))})",
+                                    list(self.pending.values()))
+        self.connection.commit()
+        self.pending = {}
+
+    # Returns the result for the pattern as a dictionary with the keys COLUMNS, or None if there is none.
+    def get(self, number_of_nodes, code):
+        row = self.pending.get((number_of_nodes, code))
+        if row is None:
+            row = self.connection.execute("SELECT * FROM results WHERE number_of_nodes = ? AND code = ?",
+                                          (number_of_nodes, code)).fetchone()
+        if row is None:
+            return None
+        result = dict(zip(self.COLUMNS, row))
+        if result["lifting_sizes"] is not None:
+            result["lifting_sizes"] = [int(size) for size in result["lifting_sizes"].split(",") if size != ""]
+        return result
+
+    # Returns whether there is a result for the pattern. If depth is given, an unknown outcome only counts if no
+    # homomorphism was found up to this depth.
+    def is_classified(self, number_of_nodes, code, depth=None):
+        result = self.get(number_of_nodes, code)
+        if result is None:
+            return False
+        if depth is None or result["outcome"] != UNKNOWN:
+            return True
+        return result["depth_checked"] is not None and result["depth_checked"] >= depth
+
+    # Returns the set of codes with start <= code < finish that have a result.
+    def get_classified_codes(self, number_of_nodes, start, finish):
+        classified = set()
+        for (code,) in self.connection.execute(
+                "SELECT code FROM results WHERE number_of_nodes = ? AND code >= ? AND code < ?",
+                (number_of_nodes, start, finish)):
+            classified.add(code)
+        for (nodes, code) in self.pending:
+            if nodes == number_of_nodes and start <= code < finish:
+                classified.add(code)
+        return classified
+
+    # Returns a list with the number of results of every outcome.
+    def count_outcomes(self, number_of_nodes):
+        self.flush()
+        counts = [0, 0, 0, 0, 0, 0, 0]
+        for (outcome, count) in self.connection.execute(
+                "SELECT outcome, COUNT(*) FROM results WHERE number_of_nodes = ? GROUP BY outcome", (number_of_nodes,)):
+            counts[outcome] = count
+        return counts
+
+    # Returns a dictionary that says for every solver how often it answered first.
+    def count_solvers(self, number_of_nodes):
+        self.flush()
+        counts = {}
+        for (solver, count) in self.connection.execute(
+                "SELECT solver, COUNT(*) FROM results WHERE number_of_nodes = ? AND solver IS NOT NULL "
+                "GROUP BY solver", (number_of_nodes,)):
+            counts[solver] = count
+        return counts
+
+    def close(self):
+        self.flush()
+        self.connection.close()
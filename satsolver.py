@@ -1,16 +1,41 @@
+import multiprocessing
+import queue
+import time
+from functools import lru_cache
+
+import numpy as np
 import pysat.solvers
 from pysat.formula import CNF
 
+import arcconsistency
 import codes
 from pattern import Pattern
 
 
+# Returns the green and the red edges of T_n, each as a pair of arrays of sources and targets. The edges of a node
+# are consecutive, and the arrays are shared by all patterns, so they are only computed once per n.
+@lru_cache(maxsize=None)
+def get_t_n_edges(n):
+    if n == 0:
+        loop = np.zeros(1, dtype=np.int64)
+        return (loop, loop), (loop, loop)
+    half = 2**(n-1)
+    # green edges i -> 2i, 2i+1 for i < 2^(n-1)
+    green_sources = np.repeat(np.arange(half, dtype=np.int64), 2)
+    # red edges i -> 2i-2^n, 2i-2^n+1 for i >= 2^(n-1)
+    red_sources = np.repeat(np.arange(half, 2*half, dtype=np.int64), 2)
+    targets = np.arange(2*half, dtype=np.int64)
+    return (green_sources, targets), (red_sources, targets)
+
+
 class SatSolver:
 
-    def __init__(self):
+    # name is the pysat name of the solver, see pysat.solvers.SolverNames.
+    def __init__(self, name="maplechrono"):
         self.pattern1 = None
         self.pattern2 = None
-        self.solver = pysat.solvers.MapleChrono()
+        self.variables = None
+        self.solver = pysat.solvers.Solver(name=name)
 
     def make_hom_clauses(self, pattern1, pattern2):
         self.pattern1 = pattern1
@@ -107,69 +132,114 @@ class SatSolver:
 
     @classmethod
     def code_to_cnf(self, n, number_of_nodes, code):
-        cnf = CNF()
         green = codes.get_green_successor_lists(number_of_nodes, code)
         red = codes.get_red_successor_lists(number_of_nodes, code)
-
-        # Every node from pattern1 has exactly one image in pattern2
-        for i in range(2**n):
-            # Node i goes to at least one node from pattern2
-            cnf.append(list(range(number_of_nodes*i+1, number_of_nodes*(i+1)+1)))
-            # Node i does not go to two different nodes from pattern2
-            for j in range(number_of_nodes):
-                for k in range(j+1, number_of_nodes):
-                    cnf.append([-(number_of_nodes*i+1+j), -(number_of_nodes*i+1+k)])
-
-        if n > 0:
-            # For every green edge i->i2 in T_n: If i is mapped to j, then i2 has to be mapped to a green successor of j
-            for j in range(number_of_nodes):
-                for i in range(2**(n-1)):
-                    i2 = 2*i
-                    antecendent = - (number_of_nodes * i + 1 + j)
-                    literals = [number_of_nodes * i2 + 1 + j2 for j2 in green[j]]
-                    literals.append(antecendent)
-                    cnf.append(literals)
-                    i2 = 2*i+1
-                    literals = [number_of_nodes * i2 + 1 + j2 for j2 in green[j]]
-                    literals.append(antecendent)
-                    cnf.append(literals)
-
-            # For every red edge i->i2 in T_n: If i is mapped to j, then i2 has to be mapped to a red successor of j
-            for j in range(number_of_nodes):
-                for i in range(2**(n-1), 2**n):
-                    i2 = i+i-2**n
-                    antecendent = - (number_of_nodes * i + 1 + j)
-                    literals = [number_of_nodes * i2 + 1 + j2 for j2 in red[j]]
-                    literals.append(antecendent)
-                    cnf.append(literals)
-                    i2 = i+i-2**n+1
-                    literals = [number_of_nodes * i2 + 1 + j2 for j2 in red[j]]
-                    literals.append(antecendent)
-                    cnf.append(literals)
-        if n == 0:
-            for j in range(number_of_nodes):
-                i = 0
-                i2 = 0
-                antecendent = - (number_of_nodes * i + 1 + j)
-                literals = [number_of_nodes * i2 + 1 + j2 for j2 in green[j]]
-                literals.append(antecendent)
-                cnf.append(literals)
-
-            # For every red edge i->i2 in T_n: If i is mapped to j, then i2 has to be mapped to a red successor of j
-            for j in range(number_of_nodes):
-                i = 0
-                i2 = 0
-                antecendent = - (number_of_nodes * i + 1 + j)
-                literals = [number_of_nodes * i2 + 1 + j2 for j2 in red[j]]
-                literals.append(antecendent)
-                cnf.append(literals)
+        # CNF.extend would check every clause for its largest variable, which is known here
+        cnf = CNF()
+        cnf.clauses = self.node_clauses(number_of_nodes, 0, 2**n) + self.edge_clauses(n, number_of_nodes, green, red)
+        cnf.nv = number_of_nodes * 2**n
         return cnf
 
-    def make_hom_clauses_efficient(self, n, pattern):
-        cnf = self.code_to_cnf(n, pattern.get_number_of_nodes(), pattern.to_code()[1])
-        for clause in cnf:
-            #print(clause)
-            self.solver.add_clause(clause)
+    # Returns the clauses saying that every node i of T_n with start <= i < finish has exactly one image in the
+    # pattern. The variable offset+number_of_nodes*i+1+j means that node i is mapped to node j.
+    @staticmethod
+    def node_clauses(number_of_nodes, start, finish, offset=0):
+        variables = np.arange(number_of_nodes*start, number_of_nodes*finish).reshape(-1, number_of_nodes) + 1 + offset
+        # Node i goes to at least one node from pattern2
+        at_least_one = variables.tolist()
+        # Node i does not go to two different nodes from pattern2
+        first, second = np.triu_indices(number_of_nodes, 1)
+        at_most_one = np.stack((-variables[:, first], -variables[:, second]), axis=2).reshape(-1, 2).tolist()
+        return at_least_one + at_most_one
+
+    # Returns the clauses saying that the edges of T_n are mapped to edges of the pattern, which is given by its
+    # green and red successor lists. The clauses of a node j of the pattern and a color only differ in the edge of
+    # T_n, so they are the rows of one matrix built from the edge arrays of get_t_n_edges. If a selector is given,
+    # its negation is added to every clause.
+    @staticmethod
+    def edge_clauses(n, number_of_nodes, green, red, offset=0, selector=None):
+        clauses = []
+        for successor_lists, (sources, targets) in zip((green, red), get_t_n_edges(n)):
+            for j in range(number_of_nodes):
+                # If the source is mapped to j, then the target has to be mapped to a successor of j
+                successors = np.array(successor_lists[j], dtype=np.int64)
+                columns = [number_of_nodes*targets[:, None] + 1 + offset + successors[None, :],
+                           -(number_of_nodes*sources[:, None] + 1 + offset + j)]
+                if selector is not None:
+                    columns.append(np.full((len(sources), 1), -selector))
+                clauses.extend(np.hstack(columns).tolist())
+        return clauses
+
+    # Like code_to_cnf, but only the images that survive arc consistency, see arcconsistency.get_t_n_domains, get a
+    # variable. The variables are numbered consecutively, and the returned array says for every node i of T_n and
+    # node j of the pattern which variable means that i is mapped to j, or 0 if i cannot be mapped to j. If some node
+    # has no possible image, the cnf consists of the empty clause.
+    @classmethod
+    def code_to_pruned_cnf(self, n, number_of_nodes, code):
+        green = codes.get_green_successor_lists(number_of_nodes, code)
+        red = codes.get_red_successor_lists(number_of_nodes, code)
+        domains = arcconsistency.get_t_n_domains(n, number_of_nodes, green, red)
+        variables = np.zeros(domains.shape, dtype=np.int64)
+        variables[domains] = np.arange(1, np.count_nonzero(domains) + 1)
+        cnf = CNF()
+        if not domains.any(axis=1).all():
+            cnf.clauses = [[]]
+            return cnf, variables
+        cnf.clauses = self.pruned_node_clauses(variables) + self.pruned_edge_clauses(n, green, red, variables)
+        cnf.nv = int(variables.max())
+        return cnf, variables
+
+    # Returns the rows of the matrix without their zeros.
+    @staticmethod
+    def nonzero_rows(matrix):
+        complete = (matrix != 0).all(axis=1)
+        return matrix[complete].tolist() + [[x for x in row if x != 0] for row in matrix[~complete].tolist()]
+
+    # The clauses of node_clauses for the variables of code_to_pruned_cnf.
+    @classmethod
+    def pruned_node_clauses(self, variables):
+        # Node i goes to at least one possible image
+        at_least_one = self.nonzero_rows(variables)
+        # Node i does not go to two different images
+        first, second = np.triu_indices(variables.shape[1], 1)
+        pairs = np.stack((-variables[:, first], -variables[:, second]), axis=2).reshape(-1, 2)
+        at_most_one = pairs[(pairs != 0).all(axis=1)].tolist()
+        return at_least_one + at_most_one
+
+    # The clauses of edge_clauses for the variables of code_to_pruned_cnf. Arc consistency guarantees that every
+    # clause keeps at least one positive literal.
+    @classmethod
+    def pruned_edge_clauses(self, n, green, red, variables):
+        clauses = []
+        for successor_lists, (sources, targets) in zip((green, red), get_t_n_edges(n)):
+            for j in range(variables.shape[1]):
+                # If the source is mapped to j, then the target has to be mapped to a successor of j
+                possible = variables[sources, j] != 0
+                columns = [variables[targets[possible]][:, successor_lists[j]],
+                           -variables[sources[possible], j][:, None]]
+                clauses.extend(self.nonzero_rows(np.hstack(columns)))
+        return clauses
+
+    # Returns the cnf of code_to_cnf and None, or the cnf and the variables of code_to_pruned_cnf if arc_consistency
+    # is True. If a cnfcache.CnfCache is given, the cnf of code_to_cnf is taken from it, or stored in it with the
+    # comments if it is not there yet. The pruned cnfs are not cached.
+    @classmethod
+    def get_hom_cnf(self, n, pattern, arc_consistency=False, cnf_cache=None, comments=()):
+        number_of_nodes, code = pattern.get_number_of_nodes(), pattern.to_code()[1]
+        if arc_consistency:
+            return self.code_to_pruned_cnf(n, number_of_nodes, code)
+        if cnf_cache is None:
+            return self.code_to_cnf(n, number_of_nodes, code), None
+        cnf = cnf_cache.load(n, number_of_nodes, code)
+        if cnf is None:
+            cnf = self.code_to_cnf(n, number_of_nodes, code)
+            cnf_cache.store(n, number_of_nodes, code, cnf, comments)
+        return cnf, None
+
+    # Adds the clauses of get_hom_cnf.
+    def make_hom_clauses_efficient(self, n, pattern, arc_consistency=False, cnf_cache=None, comments=()):
+        cnf, self.variables = self.get_hom_cnf(n, pattern, arc_consistency, cnf_cache, comments)
+        self.solver.append_formula(cnf.clauses)
 
     def make_iso_clauses(self, pattern1, pattern2):
         self.pattern1 = pattern1
@@ -271,7 +341,9 @@ class SatSolver:
         return self.solver.solve()
 
     def get_homo(self, number_of_nodes):
-        assignment = self.solver.get_model()
+        if self.variables is not None:
+            return dict(enumerate(self.get_image_array(number_of_nodes).tolist()))
+        assignment = self.get_model()
         homo = {}
         for i in assignment:
             if i > 0:
@@ -281,8 +353,17 @@ class SatSolver:
                 homo[node1] = node2
         return homo
 
+    # Returns the homomorphism as an array whose entry i is the image of node i. After make_hom_clauses_efficient with
+    # arc consistency, the variables of code_to_pruned_cnf are decoded.
+    def get_image_array(self, number_of_nodes):
+        if self.variables is not None:
+            model = np.array(self.get_model(), dtype=np.int64)
+            true_variables = (self.variables != 0) & (model[self.variables - 1] > 0)
+            return np.argmax(true_variables, axis=1)
+        return decode_model(self.get_model(), number_of_nodes, 0)
+
     def get_homo_with_keys_as_binary_strings(self, n, number_of_nodes):
-        assignment = self.solver.get_model()
+        assignment = self.get_model()
         homo = {}
         for i in assignment:
             if i > 0:
@@ -295,6 +376,174 @@ class SatSolver:
     def get_model(self):
         return self.solver.get_model()
 
+    # Returns the number of variables and the number of clauses.
+    def get_size(self):
+        return self.solver.nof_vars(), self.solver.nof_clauses()
+
+    def delete(self):
+        self.solver.delete()
+        del self.solver
+
+
+# The solvers that PortfolioSolver races against each other by default. pysat does not expose the options of the
+# solvers, so the configurations differ in the solver and its version.
+PORTFOLIO = ["maplechrono", "cadical195", "glucose42", "lingeling", "maplecm"]
+
+
+def run_portfolio_solver(name, clauses, results):
+    solver = pysat.solvers.Solver(name=name, bootstrap_with=clauses)
+    satisfiable = solver.solve()
+    true_variables = None
+    if satisfiable:
+        model = np.array(solver.get_model(), dtype=np.int64)
+        true_variables = model[model > 0]
+    solver.delete()
+    results.put((name, satisfiable, true_variables))
+
+
+# Solves the clauses with every solver of the portfolio in its own process and returns the name of the solver that
+# answered first, its answer and, if the clauses are satisfiable, the array of the variables that are true. The other
+# solvers are terminated. The processes are forked, so that the clauses do not have to be sent to them.
+def solve_portfolio(clauses, names=PORTFOLIO):
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    processes = [context.Process(target=run_portfolio_solver, args=(name, clauses, results)) for name in names]
+    for process in processes:
+        process.start()
+    try:
+        while True:
+            try:
+                return results.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    raise RuntimeError(f"All solvers of the portfolio {names} failed.")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+# A SatSolver that races several solvers on its clauses, see solve_portfolio. After solve, winner is the name of the
+# solver that answered first and seconds is the time it took.
+class PortfolioSolver(SatSolver):
+
+    def __init__(self, names=PORTFOLIO):
+        self.pattern1 = None
+        self.pattern2 = None
+        self.variables = None
+        self.names = names
+        self.clauses = []
+        self.number_of_variables = 0
+        self.model = None
+        self.winner = None
+        self.seconds = None
+
+    def make_hom_clauses_efficient(self, n, pattern, arc_consistency=False, cnf_cache=None, comments=()):
+        cnf, self.variables = self.get_hom_cnf(n, pattern, arc_consistency, cnf_cache, comments)
+        self.clauses.extend(cnf.clauses)
+        self.number_of_variables = max(self.number_of_variables, cnf.nv)
+
+    def solve(self):
+        start_time = time.time()
+        self.winner, satisfiable, true_variables = solve_portfolio(self.clauses, self.names)
+        self.seconds = time.time() - start_time
+        self.model = None
+        if satisfiable:
+            self.model = -np.arange(1, self.number_of_variables + 1)
+            self.model[true_variables - 1] = true_variables
+        return satisfiable
+
+    def get_model(self):
+        return self.model
+
+    def get_size(self):
+        return self.number_of_variables, len(self.clauses)
+
+    def delete(self):
+        self.clauses = []
+        self.model = None
+
+
+# Takes a model in which the variable offset+number_of_nodes*i+1+j means that node i is mapped to node j, and returns
+# the array whose entry i is the image of node i. Variables beyond the last complete node are ignored.
+def decode_model(model, number_of_nodes, offset):
+    model = np.array(model, dtype=np.int64)[offset:]
+    number_of_variables = len(model) - len(model) % number_of_nodes
+    true_variables = np.nonzero(model[:number_of_variables] > 0)[0]
+    images = np.zeros(number_of_variables // number_of_nodes, dtype=np.int64)
+    images[true_variables // number_of_nodes] = true_variables % number_of_nodes
+    return images
+
+
+# Decides for n = 0, 1, 2, ... whether there is a homomorphism from T_n into a fixed pattern, keeping one solver
+# alive so that what it has learned carries over from one depth to the next.
+# Node i of T_n is always encoded by the same variables, so the "exactly one image" clauses are only added for the
+# nodes that are new at a depth. The edge clauses of depth n contain the negation of a selector variable, which is
+# assumed to be true while solving depth n and set to false by a unit clause when moving on. This also retires every
+# learned clause that depends on them. The variables 1, ..., max_depth+1 are the selectors, and the node variables of
+# SatSolver.code_to_cnf are shifted behind them, so that the solver never sees variables of depths not reached yet.
+class IncrementalHomSolver:
+
+    def __init__(self, pattern, max_depth):
+        number_of_nodes, code = pattern.to_code()
+        self.number_of_nodes = number_of_nodes
+        self.green = codes.get_green_successor_lists(number_of_nodes, code)
+        self.red = codes.get_red_successor_lists(number_of_nodes, code)
+        self.max_depth = max_depth
+        self.depth = None
+        self.number_of_encoded_nodes = 0
+        self.number_of_node_clauses = 0
+        self.number_of_edge_clauses = 0
+        self.solver = pysat.solvers.MapleChrono()
+
+    def get_selector(self, n):
+        return n + 1
+
+    # Replaces the clauses of the current depth by those of depth n. Depths have to be added in increasing order.
+    def set_depth(self, n):
+        if n > self.max_depth:
+            raise ValueError(f"Depth {n} is larger than the maximum depth {self.max_depth}.")
+        if self.depth is not None:
+            if n <= self.depth:
+                raise ValueError(f"Depth {n} is not larger than the current depth {self.depth}.")
+            self.solver.add_clause([-self.get_selector(self.depth)])
+        self.depth = n
+        offset = self.max_depth + 1
+        node_clauses = SatSolver.node_clauses(self.number_of_nodes, self.number_of_encoded_nodes, 2**n, offset)
+        self.solver.append_formula(node_clauses)
+        self.number_of_node_clauses += len(node_clauses)
+        self.number_of_encoded_nodes = max(self.number_of_encoded_nodes, 2**n)
+        edge_clauses = SatSolver.edge_clauses(n, self.number_of_nodes, self.green, self.red, offset,
+                                              self.get_selector(n))
+        self.solver.append_formula(edge_clauses)
+        self.number_of_edge_clauses = len(edge_clauses)
+
+    # Returns the number of node variables and the number of clauses that encode the current depth.
+    def get_size_of_current_depth(self):
+        return self.number_of_nodes * 2**self.depth, self.number_of_node_clauses + self.number_of_edge_clauses
+
+    # Returns whether there is a homomorphism from T_n into the pattern, where n is the current depth.
+    def solve(self):
+        return self.solver.solve(assumptions=[self.get_selector(self.depth)])
+
+    # Returns the homomorphism found by the last call of solve as a dictionary from the nodes of T_n to the indices
+    # of the nodes of the pattern.
+    def get_homo(self):
+        offset = self.max_depth + 1
+        number_of_variables = self.number_of_nodes * 2**self.depth
+        homo = {}
+        for i in self.solver.get_model():
+            if offset < i <= offset + number_of_variables:
+                i = i - offset - 1
+                homo[i // self.number_of_nodes] = i % self.number_of_nodes
+        return homo
+
+    # Like get_homo, but returns an array whose entry i is the image of node i.
+    def get_image_array(self):
+        model = self.solver.get_model()[:self.max_depth + 1 + self.number_of_nodes * 2**self.depth]
+        return decode_model(model, self.number_of_nodes, self.max_depth + 1)
+
     def delete(self):
         self.solver.delete()
         del self.solver
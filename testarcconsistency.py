@@ -0,0 +1,41 @@
+import random
+import unittest
+
+import codes
+from arcconsistency import ArcConsistency, get_t_n_domains
+from pattern import Pattern
+
+
+class TestArcConsistencyMethods(unittest.TestCase):
+
+    def test_t_n_domains_agree_with_arc_consistency(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            number_of_nodes = rng.randint(1, 4)
+            code = rng.getrandbits(2*number_of_nodes*number_of_nodes)
+            pattern = Pattern.from_code(number_of_nodes, code)
+            green = codes.get_green_successor_lists(number_of_nodes, code)
+            red = codes.get_red_successor_lists(number_of_nodes, code)
+            for n in range(6):
+                domains = get_t_n_domains(n, number_of_nodes, green, red)
+                arc_consistency = ArcConsistency(Pattern.T_n(n), pattern)
+                arc_consistency.initialise_candidate_sets()
+                arc_consistency.do_arc_consistency()
+                if arc_consistency.is_contradiction():
+                    self.assertFalse(domains.any(axis=1).all())
+                    continue
+                for i in range(2**n):
+                    self.assertEqual(set(domains[i].nonzero()[0]), arc_consistency.candidates[i])
+
+    def test_candidates_of_a_homomorphism_survive(self):
+        # T_2 maps onto T_1 by forgetting the last bit
+        arc_consistency = ArcConsistency(Pattern.T_n(2), Pattern.T_n(1))
+        arc_consistency.initialise_candidate_sets()
+        arc_consistency.do_arc_consistency()
+        self.assertFalse(arc_consistency.is_contradiction())
+        for i in range(4):
+            self.assertIn(i // 2, arc_consistency.candidates[i])
+
+
+if __name__ == '__main__':
+    unittest.main()
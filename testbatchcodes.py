@@ -0,0 +1,57 @@
+import random
+import unittest
+
+import numpy as np
+
+import batchcodes
+import codes
+from pattern import Pattern
+
+
+class TestBatchCodesMethods(unittest.TestCase):
+
+    def random_codes(self, rng, n):
+        # sparse codes are rejected early, dense ones get further
+        return [rng.getrandbits(2*n*n) | rng.getrandbits(2*n*n) * rng.randint(0, 1) for _ in range(3000)]
+
+    def test_screen_codes_agrees_with_screen_code(self):
+        rng = random.Random(0)
+        for n in range(1, 6):
+            code_list = self.random_codes(rng, n)
+            expected = [codes.screen_code(n, code) for code in code_list]
+            results = batchcodes.screen_codes(n, code_list)
+            self.assertEqual([None if result == -1 else result for result in results.tolist()], expected)
+
+    def test_predicates_agree_with_codes(self):
+        rng = random.Random(1)
+        for n in range(1, 6):
+            code_list = self.random_codes(rng, n)
+            array = np.array(code_list, dtype=np.uint64)
+            self.assertEqual(batchcodes.has_useless_nodes(n, array).tolist(),
+                             [codes.has_useless_nodes(n, code) for code in code_list])
+            self.assertEqual(batchcodes.check_red_connected(n, array).tolist(),
+                             [codes.check_red_connected(n, code) for code in code_list])
+            self.assertEqual(batchcodes.check_green_connected(n, array).tolist(),
+                             [codes.check_green_connected(n, code) for code in code_list])
+            self.assertEqual(batchcodes.check_code_normal_form(n, array).tolist(),
+                             [Pattern.check_code_normal_form(n, code) for code in code_list])
+
+    def test_screen_code_blocks(self):
+        start = 308622726 - 2500
+        screened = [(code, codes.screen_code(4, code)) for code in range(start, start + 5000)]
+        blocks = list(batchcodes.screen_code_blocks(4, start, start + 5000, block_size=1024))
+        self.assertEqual(len(blocks), 5)
+        self.assertEqual([code for survivors, _ in blocks for code in survivors],
+                         [code for code, result in screened if result is None])
+        counts = [sum(block_counts[result] for _, block_counts in blocks) for result in range(7)]
+        self.assertEqual(counts, [sum(1 for _, other in screened if other == result) for result in range(7)])
+        survivors = batchcodes.get_survivors(4, np.arange(start, start + 5000, dtype=np.uint64))
+        self.assertEqual(survivors.tolist(), [code for code, result in screened if result is None])
+
+    def test_six_nodes_do_not_fit(self):
+        with self.assertRaises(ValueError):
+            batchcodes.screen_codes(6, [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
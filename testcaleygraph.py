@@ -0,0 +1,77 @@
+import random
+import unittest
+
+from caleygraph import CaleyGraph, CaleyGraphTooLarge
+from pattern import Pattern
+from relation import Relation
+
+
+class TestCaleyGraphMethods(unittest.TestCase):
+
+    def test_successors_are_compositions(self):
+        rng = random.Random(0)
+        for _ in range(100):
+            n = rng.randint(1, 5)
+            pattern = Pattern.from_code(n, rng.getrandbits(2*n*n))
+            cg = CaleyGraph(pattern)
+            self.assertEqual(cg.codes[0], Relation.diagonal(n).to_code(pattern.nodes)[1])
+            self.assertEqual(len(set(cg.codes)), cg.get_number_of_nodes())
+            for i in range(cg.get_number_of_nodes()):
+                relation = Relation.from_code(n, cg.codes[i])
+                self.assertEqual(cg.codes[cg.green_successors[i]], relation.compose(pattern.green).to_code(pattern.nodes)[1])
+                self.assertEqual(cg.codes[cg.red_successors[i]], relation.compose(pattern.red).to_code(pattern.nodes)[1])
+
+    def test_infinitely_reachable_agrees_with_transitive_closure(self):
+        rng = random.Random(1)
+        for _ in range(100):
+            n = rng.randint(1, 4)
+            pattern = Pattern.from_code(n, rng.getrandbits(2*n*n))
+            cg = CaleyGraph(pattern)
+            forget_colors = cg.caley_graph.red.union(cg.caley_graph.green)
+            expected = forget_colors.transitive_closure().get_nodes_reachable_from_a_selfloop()
+            self.assertEqual(cg.get_nodes_reachable_by_infinitely_many_words(), expected)
+            self.assertEqual(cg.get_nodes_reachable_by_finitely_many_words(), set(cg.caley_graph.nodes) - expected)
+
+    def test_idempotent_power(self):
+        rng = random.Random(2)
+        for _ in range(50):
+            n = rng.randint(1, 4)
+            pattern = Pattern.from_code(n, rng.getrandbits(2*n*n))
+            cg = CaleyGraph(pattern)
+            for code in cg.codes:
+                idempotent = cg.get_idempotent_power(code)
+                self.assertEqual(cg.compose_codes(idempotent, idempotent), idempotent)
+                power = code
+                for _ in range(cg.get_number_of_nodes()):
+                    if power == idempotent:
+                        break
+                    power = cg.compose_codes(power, code)
+                self.assertEqual(power, idempotent)
+
+    def test_first_path_condition_agrees_with_powers(self):
+        rng = random.Random(3)
+        for _ in range(100):
+            n = rng.randint(1, 4)
+            pattern = Pattern.from_code(n, rng.getrandbits(2*n*n))
+            cg = CaleyGraph(pattern)
+            expected = True
+            for (number, code) in cg.get_nodes_reachable_by_finitely_many_words():
+                if code == cg.codes[0]:
+                    continue
+                relation = Relation.from_code(number, code)
+                powers = [relation]
+                for _ in range(cg.get_number_of_nodes()):
+                    powers.append(powers[-1].compose(relation))
+                if not any(power.sees_all(c) for c in relation.get_nodes_with_a_selfloop() for power in powers):
+                    expected = False
+            self.assertEqual(cg.check_first_path_condition(), expected)
+
+    def test_max_size(self):
+        pattern = Pattern.from_code(5, 586082719390259)
+        self.assertEqual(CaleyGraph(pattern, 239).get_number_of_nodes(), 239)
+        with self.assertRaises(CaleyGraphTooLarge):
+            CaleyGraph(pattern, 238)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import random
+import tempfile
+import unittest
+
+from pysat.formula import CNF
+
+from cnfcache import CnfCache, read_dimacs, write_dimacs
+from pattern import Pattern
+from satsolver import SatSolver
+
+
+class TestCnfCacheMethods(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_read_dimacs_inverts_write_dimacs(self):
+        cnf = CNF()
+        cnf.clauses = [[1, -2], [3], [-1, 2, 3], [2, 3, -4], [4, -3], []]
+        cnf.nv = 4
+        for name in ("plain.cnf", "compressed.cnf.gz"):
+            filename = os.path.join(self.directory.name, name)
+            write_dimacs(filename, cnf, ["a comment"])
+            loaded = read_dimacs(filename)
+            self.assertEqual(loaded.nv, 4)
+            self.assertEqual(loaded.clauses, cnf.clauses)
+        # a standalone parser reads the same formula
+        self.assertEqual(CNF(from_file=os.path.join(self.directory.name, "plain.cnf")).clauses, cnf.clauses)
+
+    def test_cached_cnf_equals_code_to_cnf(self):
+        cache = CnfCache(os.path.join(self.directory.name, "cache"))
+        rng = random.Random(0)
+        for _ in range(10):
+            number_of_nodes = rng.randint(1, 4)
+            code = rng.getrandbits(2*number_of_nodes*number_of_nodes)
+            pattern = Pattern.from_code(number_of_nodes, code)
+            for n in range(5):
+                expected = SatSolver.code_to_cnf(n, number_of_nodes, code)
+                first, _ = SatSolver.get_hom_cnf(n, pattern, cnf_cache=cache)
+                self.assertTrue(cache.contains(n, number_of_nodes, code))
+                second, _ = SatSolver.get_hom_cnf(n, pattern, cnf_cache=cache)
+                for cnf in (first, second):
+                    self.assertEqual(cnf.nv, expected.nv)
+                    self.assertEqual(cnf.clauses, expected.clauses)
+
+    def test_solver_with_cache_agrees_with_solver_without(self):
+        cache = CnfCache(os.path.join(self.directory.name, "cache"))
+        rng = random.Random(1)
+        for _ in range(20):
+            pattern = Pattern.from_code(3, rng.getrandbits(18))
+            for n in range(6):
+                results = []
+                for cnf_cache in (None, cache, cache):
+                    solver = SatSolver()
+                    solver.make_hom_clauses_efficient(n, pattern, cnf_cache=cnf_cache)
+                    results.append(solver.solve())
+                    solver.delete()
+                self.assertEqual(results[0], results[1])
+                self.assertEqual(results[0], results[2])
+
+    def test_export_writes_plain_dimacs(self):
+        cache = CnfCache(os.path.join(self.directory.name, "cache"), os.path.join(self.directory.name, "export"))
+        pattern = Pattern.from_code(2, 0b01100110)
+        number_of_nodes, code = pattern.to_code()
+        cnf, _ = SatSolver.get_hom_cnf(3, pattern, cnf_cache=cache, comments=["depth 3"])
+        filename = cache.export(3, number_of_nodes, code, "example")
+        self.assertEqual(filename, os.path.join(self.directory.name, "export", "example.cnf"))
+        with open(filename) as file:
+            self.assertEqual(file.readline(), "c depth 3\n")
+        self.assertEqual(CNF(from_file=filename).clauses, cnf.clauses)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,9 @@
+import math
+import random
 import unittest
 
 import codes
+from pattern import Pattern
 
 
 class TestCodesMethods(unittest.TestCase):
@@ -53,6 +56,77 @@ class TestCodesMethods(unittest.TestCase):
         self.assertEqual(codes.get_red_predecessors(4, code, 2), red_pred_of_2)
         self.assertEqual(codes.get_red_predecessors(4, code, 3), red_pred_of_3)
 
+    def test_predicates_agree_with_pattern(self):
+        rng = random.Random(0)
+        for _ in range(2000):
+            n = rng.randint(2, 5)
+            code = rng.getrandbits(2*n*n)
+            pattern = Pattern.from_code(n, code)
+            self.assertEqual(codes.has_double_selfloop(n, code), pattern.has_double_selfloop())
+            self.assertEqual(codes.has_green_selfloop(n, code), pattern.has_green_selfloop())
+            self.assertEqual(codes.has_red_selfloop(n, code), pattern.has_red_selfloop())
+            self.assertEqual(codes.has_useless_nodes(n, code), pattern.has_useless_nodes())
+            self.assertEqual(codes.check_red_connected(n, code), pattern.check_red_connected())
+            self.assertEqual(codes.check_green_connected(n, code), pattern.check_green_connected())
+
+    def test_screen_code(self):
+        self.assertEqual(codes.screen_code(4, 0b10101110110110011011011111010101), 1)
+        self.assertIsNone(codes.screen_code(5, 586082719390259))
+
+    def test_random_valid_code(self):
+        rng = random.Random(3)
+        for n in range(1, 6):
+            for chance in (0.1, 0.5, 0.9):
+                for _ in range(50):
+                    code = codes.random_valid_code(n, chance, rng)
+                    self.assertLess(code, 2**(2*n*n))
+                    self.assertTrue(all(codes.get_green_predecessor_masks(n, code)))
+                    self.assertTrue(all(codes.get_red_predecessor_masks(n, code)))
+        # every valid code with two nodes is drawn
+        valid = {code for code in range(2**8) if all(codes.get_green_predecessor_masks(2, code)) and
+                 all(codes.get_red_predecessor_masks(2, code))}
+        self.assertEqual({codes.random_valid_code(2, 0.5, rng) for _ in range(3000)}, valid)
+        self.assertTrue(all(codes.get_green_predecessor_masks(5, codes.bias_random_code(5, 0.4))))
+
+    def test_generate_nearby_patterns(self):
+        code = 0b10101110110110011011011111010101
+        self.assertEqual(codes.generate_nearby_patterns(4, code), [code ^ (1 << i) for i in range(32)])
+        for distance in range(4):
+            nearby = codes.generate_nearby_patterns(2, 0b01100110, distance)
+            self.assertEqual(len(set(nearby)), math.comb(8, distance))
+            self.assertTrue(all(bin(other ^ 0b01100110).count("1") == distance for other in nearby))
+
+    def test_canonical_code(self):
+        rng = random.Random(1)
+        for _ in range(200):
+            n = rng.randint(2, 5)
+            code = rng.getrandbits(2*n*n)
+            order = list(range(n))
+            rng.shuffle(order)
+            relabelled = codes.relabel_code(n, code, order, rng.randint(0, 1) == 1)
+            self.assertEqual(codes.canonical_code(n, relabelled), codes.canonical_code(n, code))
+            self.assertTrue(codes.is_canonical_code(n, codes.canonical_code(n, code)))
+
+    def test_refined_canonical_code(self):
+        rng = random.Random(2)
+        for _ in range(200):
+            n = rng.randint(1, 8)
+            code = rng.getrandbits(2*n*n)
+            order = list(range(n))
+            rng.shuffle(order)
+            relabelled = codes.relabel_code(n, code, order, rng.randint(0, 1) == 1)
+            self.assertEqual(codes.refined_canonical_code(n, relabelled), codes.refined_canonical_code(n, code))
+        # the classes are those of canonical_code
+        classes = {}
+        for code in range(2**8):
+            classes.setdefault(codes.refined_canonical_code(2, code), set()).add(codes.canonical_code(2, code))
+        self.assertTrue(all(len(canonical) == 1 for canonical in classes.values()))
+
+    def test_canonical_codes(self):
+        generated = list(codes.canonical_codes(2))
+        self.assertEqual(len(generated), len(set(generated)))
+        self.assertEqual(set(generated), {codes.canonical_code(2, code) for code in range(2**8)})
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,48 @@
+import random
+import unittest
+
+from constructiondeterministic import is_construction_deterministic
+from pattern import Pattern
+
+
+# The fixpoint iteration over all pairs of sets that is_construction_deterministic replaces.
+def is_construction_deterministic_by_fixpoint(pattern):
+    sets = {frozenset({node}) for node in pattern.nodes}
+    change = True
+    while change:
+        change = False
+        sets_to_add = set()
+        for set1 in sets:
+            for set2 in sets:
+                intersection = pattern.get_green_successors_of_set(set1).intersection(
+                    pattern.get_red_successors_of_set(set2))
+                if not any(intersection.issubset(set3) for set3 in sets):
+                    sets_to_add.add(frozenset(intersection))
+        for new_set in sets_to_add:
+            change = True
+            sets.add(new_set)
+        sets = {set1 for set1 in sets if not any(set1 != set2 and set1.issubset(set2) for set2 in sets)}
+    return set(pattern.nodes) not in sets
+
+
+class TestConstructionDeterministicMethods(unittest.TestCase):
+
+    def test_agrees_with_fixpoint(self):
+        rng = random.Random(0)
+        for _ in range(500):
+            n = rng.randint(1, 5)
+            code = rng.getrandbits(2*n*n) & rng.getrandbits(2*n*n)
+            pattern = Pattern.from_code(n, code)
+            self.assertEqual(is_construction_deterministic(pattern), is_construction_deterministic_by_fixpoint(pattern))
+
+    def test_small_patterns(self):
+        # a single node is the set of all nodes
+        self.assertFalse(is_construction_deterministic(Pattern.from_code(1, 0)))
+        # green and red loops on two nodes only construct the singletons
+        self.assertTrue(is_construction_deterministic(Pattern.from_code(2, 0b1001_1001)))
+        # all green and red edges construct both nodes
+        self.assertFalse(is_construction_deterministic(Pattern.from_code(2, 0b1111_1111)))
+
+
+if __name__ == '__main__':
+    unittest.main()
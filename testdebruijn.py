@@ -0,0 +1,36 @@
+import random
+import unittest
+
+from debruijn import DeBruijnHomSolver
+from pattern import Pattern
+from satsolver import SatSolver
+
+
+class TestDeBruijnMethods(unittest.TestCase):
+
+    def test_agrees_with_sat_solver(self):
+        rng = random.Random(0)
+        for _ in range(60):
+            number_of_nodes = rng.randint(1, 4)
+            code = rng.getrandbits(2*number_of_nodes*number_of_nodes) | rng.getrandbits(2*number_of_nodes*number_of_nodes)
+            pattern = Pattern.from_code(number_of_nodes, code)
+            for n in range(7):
+                solver = SatSolver()
+                solver.make_hom_clauses_efficient(n, pattern)
+                expected = solver.solve()
+                solver.delete()
+                de_bruijn = DeBruijnHomSolver(n, pattern)
+                self.assertEqual(de_bruijn.solve(), expected)
+                if expected:
+                    self.assertTrue(Pattern.is_homo(Pattern.T_n(n), pattern, de_bruijn.get_homo()))
+                    self.assertEqual(list(de_bruijn.get_image_array()), [de_bruijn.get_homo()[x] for x in range(2**n)])
+
+    def test_t_n_maps_to_t_m(self):
+        # forgetting the last bits is a homomorphism from T_n to T_m for m <= n
+        for n in range(5):
+            for m in range(n + 1):
+                self.assertTrue(DeBruijnHomSolver(n, Pattern.T_n(m)).solve())
+
+
+if __name__ == '__main__':
+    unittest.main()
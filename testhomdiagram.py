@@ -0,0 +1,42 @@
+import os
+import random
+import tempfile
+import unittest
+
+import homdiagram
+import homomorphism
+import misc
+
+
+class TestHomDiagramMethods(unittest.TestCase):
+
+    def test_diagram_returns_images(self):
+        rng = random.Random(0)
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, "hom.hom")
+        for _ in range(100):
+            n = rng.randint(0, 8)
+            images = [rng.randint(0, 4)]
+            for _ in range(n):
+                images = [image if rng.random() < 0.7 else rng.randint(0, 4) for image in images for _ in range(2)]
+            homdiagram.write_hom_diagram(filename, images)
+            diagram = homdiagram.HomDiagram(filename)
+            self.assertEqual(diagram.n, n)
+            self.assertEqual(list(diagram.to_image_array()), images)
+            diagram.close()
+        os.remove(filename)
+        os.rmdir(directory)
+
+    def test_read_hom_text_file(self):
+        rng = random.Random(1)
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, "hom.txt")
+        images = [rng.randint(0, 2) for _ in range(2**4)] + [3] * 2**4
+        misc.write_dict_to_file_sorted_by_keys(filename, homomorphism.compress_image_array(images))
+        self.assertEqual(list(homdiagram.read_hom_text_file(filename)), images)
+        os.remove(filename)
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
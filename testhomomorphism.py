@@ -0,0 +1,23 @@
+import random
+import unittest
+
+import homomorphism
+
+
+class TestHomomorphismMethods(unittest.TestCase):
+
+    def test_compress_image_array_agrees_with_compress_homomorphism(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            n = rng.randint(0, 7)
+            # images that are constant on random subtrees, so that there is something to merge
+            images = [rng.randint(0, 2)]
+            for _ in range(n):
+                images = [image if rng.random() < 0.7 else rng.randint(0, 2) for image in images for _ in range(2)]
+            hom = {i: images[i] for i in range(len(images))}
+            expected = homomorphism.compress_homomorphism(homomorphism.convert_keys_of_hom_to_binary_strings(hom))
+            self.assertEqual(homomorphism.compress_image_array(images), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
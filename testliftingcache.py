@@ -0,0 +1,157 @@
+import os
+import random
+import signal
+import tempfile
+import unittest
+from unittest import mock
+
+import codes
+import main
+import satsolver
+from liftingcache import LiftingCache
+from pattern import Pattern
+
+
+class TestLiftingCacheMethods(unittest.TestCase):
+
+    def test_liftings_are_isomorphic_to_get_liftings(self):
+        cache = LiftingCache()
+        for code in (586082719390259, 586082719391291, 586082719390265):
+            pattern = Pattern.from_code(codes.get_number_of_nodes(code), code)
+            pattern.remove_useless_nodes()
+            expected = pattern.get_liftings()
+            liftings = pattern.get_liftings(cache=cache)
+            self.assertIs(liftings[0], pattern)
+            self.assertEqual([LiftingCache.get_key(lifting) for lifting in liftings],
+                             [LiftingCache.get_key(lifting) for lifting in expected])
+
+    def test_relabelled_pattern_reuses_liftings(self):
+        cache = LiftingCache()
+        rng = random.Random(0)
+        code = 586082719390259
+        number_of_nodes = codes.get_number_of_nodes(code)
+        liftings = cache.get_liftings(Pattern.from_code(number_of_nodes, code))
+        computed = cache.computed
+        for _ in range(5):
+            order = list(range(number_of_nodes))
+            rng.shuffle(order)
+            relabelled = codes.relabel_code(number_of_nodes, code, order, rng.randint(0, 1) == 1)
+            self.assertEqual([LiftingCache.get_key(lifting) for lifting in
+                              cache.get_liftings(Pattern.from_code(number_of_nodes, relabelled))],
+                             [LiftingCache.get_key(lifting) for lifting in liftings])
+        self.assertEqual(cache.computed, computed)
+
+    def test_classification_of_liftings_counts(self):
+        cache = LiftingCache()
+        pattern = Pattern.from_code(5, 586082719390259)
+        liftings = cache.get_liftings(pattern)
+        self.assertEqual(cache.get_classification(pattern), (None, None))
+        cache.add_classification(liftings[2], homo_depth=12, depth_checked=11)
+        self.assertEqual(cache.get_classification(pattern), (14, 13))
+        cache.add_classification(pattern, depth_checked=5)
+        self.assertEqual(cache.get_classification(pattern), (14, 13))
+        cache.add_classification(pattern, homo_depth=13)
+        self.assertEqual(cache.get_classification(pattern), (13, 13))
+
+    def test_search_homo_skips_checked_depths(self):
+        pattern = Pattern.from_code(4, 305410769)
+        solved = []
+        make_hom_clauses = satsolver.SatSolver.make_hom_clauses_efficient
+
+        def record(solver, n, *args, **kwargs):
+            solved.append(n)
+            return make_hom_clauses(solver, n, *args, **kwargs)
+
+        with mock.patch.object(satsolver.SatSolver, "make_hom_clauses_efficient", record):
+            self.assertEqual(main.search_homo(pattern, 12), 10)
+            # the liftings reach 30 nodes at depth 5, so the depths 6 to 10 are solved
+            uncached = solved[:]
+            self.assertEqual(len(uncached), 5)
+            del solved[:]
+            cache = LiftingCache()
+            self.assertEqual(main.search_homo(pattern, 7, lifting_cache=cache), -1)
+            self.assertEqual(solved, uncached[:2])
+            del solved[:]
+            # only the depths 8 to 10 are solved
+            self.assertEqual(main.search_homo(pattern, 12, lifting_cache=cache), 10)
+            self.assertEqual(solved, uncached[2:])
+            del solved[:]
+            self.assertEqual(main.search_homo(pattern, 14, lifting_cache=cache), 10)
+            self.assertEqual(main.search_homo(pattern, 9, lifting_cache=cache), -1)
+            self.assertEqual(solved, [])
+            # a known homomorphism ends the search below it
+            cache = LiftingCache()
+            cache.add_classification(pattern, homo_depth=10)
+            self.assertEqual(main.search_homo(pattern, 12, lifting_cache=cache), 10)
+            self.assertEqual(solved, uncached[:-1])
+
+    def test_timeout_deletes_solver_and_finishes_writes(self):
+        filename = os.path.join(tempfile.mkdtemp(), "liftings.db")
+        cache = LiftingCache(filename, batch_size=1)
+        # there is a homomorphism at depth 20, which takes more than half a minute to find
+        pattern = Pattern.from_code(4, 2705860935)
+        made = []
+        deleted = []
+        make_hom_clauses = satsolver.SatSolver.make_hom_clauses_efficient
+        delete = satsolver.SatSolver.delete
+
+        def record_make(solver, *args, **kwargs):
+            made.append(solver)
+            return make_hom_clauses(solver, *args, **kwargs)
+
+        def record_delete(solver):
+            deleted.append(solver)
+            return delete(solver)
+
+        previous_handler = signal.signal(signal.SIGPROF, main.raise_pattern_timeout)
+        try:
+            with mock.patch.object(satsolver.SatSolver, "make_hom_clauses_efficient", record_make), \
+                    mock.patch.object(satsolver.SatSolver, "delete", record_delete):
+                for time_limit in (0.05, 0.5, 2):
+                    try:
+                        signal.setitimer(signal.ITIMER_PROF, time_limit)
+                        main.search_homo(pattern, 20, lifting_cache=cache)
+                        self.fail("The search should time out.")
+                    except main.PatternTimeout:
+                        pass
+                    finally:
+                        signal.setitimer(signal.ITIMER_PROF, 0)
+                    self.assertEqual(made, deleted)
+                    self.assertFalse(cache.connection.in_transaction)
+        finally:
+            signal.signal(signal.SIGPROF, previous_handler)
+        self.assertTrue(made)
+        cache.close()
+
+    def test_entries_survive_reopening(self):
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, "liftings.db")
+        cache = LiftingCache(filename, max_size=2, batch_size=3)
+        pattern = Pattern.from_code(5, 586082719390259)
+        liftings = cache.get_liftings(pattern)
+        cache.add_classification(pattern, homo_depth=21)
+        # the memory only holds two entries, the others are read from the database
+        self.assertEqual([lifting.to_code() for lifting in cache.get_liftings(pattern)],
+                         [lifting.to_code() for lifting in liftings])
+        self.assertEqual(len(cache.entries), 2)
+        cache.close()
+        cache = LiftingCache(filename)
+        self.assertEqual([LiftingCache.get_key(lifting) for lifting in cache.get_liftings(pattern)],
+                         [LiftingCache.get_key(lifting) for lifting in liftings])
+        self.assertEqual(cache.computed, 0)
+        self.assertEqual(cache.get_classification(pattern), (21, None))
+        cache.close()
+
+    def test_large_codes_survive_reopening(self):
+        filename = os.path.join(tempfile.mkdtemp(), "liftings.db")
+        cache = LiftingCache(filename)
+        key = (120, 2**(2*120*120) - 1)
+        cache.write((5, 1), [key, None, 3])
+        cache.close()
+        cache = LiftingCache(filename)
+        self.assertEqual(cache.get_entry((5, 1)), [key, None, 3])
+        cache.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
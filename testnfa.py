@@ -0,0 +1,50 @@
+import random
+import unittest
+
+from nfa import Nfa
+
+
+class TestNfaMethods(unittest.TestCase):
+
+    def test_path_condition_agrees_with_power_nfa(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            n = rng.randint(1, 5)
+            code = rng.getrandbits(2*n*n)
+            nfa = Nfa.from_pattern_code(n, code)
+            pow = nfa.power_nfa(True)
+            reachable = pow.get_backwards_reachable_nodes({frozenset(nfa.states)})
+            expected = all(frozenset({q}) in reachable for q in nfa.states)
+            self.assertEqual(nfa.satisfies_path_condition(), expected)
+
+    def test_path_condition_of_small_patterns(self):
+        # a single node without edges sees every node under the empty word
+        self.assertTrue(Nfa.from_pattern_code(1, 0).satisfies_path_condition())
+        # green loops on both nodes and red edges between all nodes
+        self.assertTrue(Nfa.from_pattern_code(2, 0b1111_1001).satisfies_path_condition())
+        # two nodes with green and red loops never see each other
+        self.assertFalse(Nfa.from_pattern_code(2, 0b1001_1001).satisfies_path_condition())
+
+    def test_cofinite_from_singletons_agrees_with_power_nfa(self):
+        rng = random.Random(1)
+        for _ in range(300):
+            n = rng.randint(1, 4)
+            code = rng.getrandbits(2*n*n) & rng.getrandbits(2*n*n)
+            nfa = Nfa.from_pattern_code(n, code)
+            pow = nfa.power_nfa(True)
+            pow.clear_start_states()
+            pow.clear_final_states()
+            for state in nfa.states:
+                pow.add_start_state(frozenset({state}))
+            pow.add_final_state(frozenset(nfa.states))
+            self.assertEqual(nfa.is_cofinite_from_singletons(), pow.is_language_cofinite())
+
+    def test_cofinite_from_singletons_of_small_patterns(self):
+        # every word except the empty word leads from node 0 to both nodes
+        self.assertTrue(Nfa.from_pattern_code(2, 0b0011_0011).is_cofinite_from_singletons())
+        # the words green^k lead from every node to a single node
+        self.assertFalse(Nfa.from_pattern_code(2, 0b1111_1001).is_cofinite_from_singletons())
+
+
+if __name__ == '__main__':
+    unittest.main()
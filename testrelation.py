@@ -0,0 +1,94 @@
+import random
+import unittest
+
+from bitrelation import BitRelation
+from pattern import Pattern
+from relation import Relation
+
+
+class TestBitRelationMethods(unittest.TestCase):
+
+    def test_operations_agree_with_relation(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            n = rng.randint(1, 6)
+            nodes = list(range(n))
+            code1 = rng.getrandbits(n * n)
+            code2 = rng.getrandbits(n * n)
+            rel1, rel2 = Relation.from_code(n, code1), Relation.from_code(n, code2)
+            bit1, bit2 = BitRelation.from_code(n, code1), BitRelation.from_code(n, code2)
+            self.assertEqual(bit1.to_code(nodes), rel1.to_code(nodes))
+            self.assertEqual(bit1.compose(bit2).to_code(nodes), rel1.compose(rel2).to_code(nodes))
+            self.assertEqual(bit1.union(bit2).to_code(nodes), rel1.union(rel2).to_code(nodes))
+            self.assertEqual(bit1.transitive_closure().to_code(nodes), rel1.transitive_closure().to_code(nodes))
+            self.assertEqual(bit1.get_selfloops_that_can_reach_all(), rel1.get_selfloops_that_can_reach_all())
+            self.assertEqual(bit1.get_nodes_reachable_from_a_selfloop(), rel1.get_nodes_reachable_from_a_selfloop())
+            self.assertEqual(dict(bit1.pred), rel1.pred)
+            rel1.remove_node(0)
+            bit1.remove_node(0)
+            self.assertEqual(dict(bit1.succ), rel1.succ)
+            self.assertEqual(dict(bit1.pred), rel1.pred)
+
+    def test_liftings_agree_with_relation(self):
+        code = 586082719390259
+        pattern = Pattern.from_code(5, code)
+        bit_pattern = Pattern.from_code(5, code, BitRelation)
+        liftings = pattern.get_liftings()
+        bit_liftings = bit_pattern.get_liftings()
+        self.assertEqual([l.to_code() for l in bit_liftings], [l.to_code() for l in liftings])
+
+    # The fixpoint that Pattern.remove_useless_nodes computed before it worked incrementally.
+    @staticmethod
+    def remove_useless_nodes_reference(pattern):
+        while True:
+            neighbourhoods = pattern.get_neighbourhoods()
+            useless_nodes = set()
+            for node in pattern.nodes:
+                red_predecessor, red_successor, green_predecessor, green_successor = neighbourhoods[node]
+                if not red_predecessor or not green_predecessor or not red_successor and not green_successor:
+                    useless_nodes.add(node)
+            for i in range(len(pattern.nodes)):
+                a = pattern.nodes[i]
+                for j in range(i + 1, len(pattern.nodes)):
+                    b = pattern.nodes[j]
+                    if Pattern.is_dominated(neighbourhoods[b], neighbourhoods[a]):
+                        useless_nodes.add(b)
+                    elif Pattern.is_dominated(neighbourhoods[a], neighbourhoods[b]):
+                        useless_nodes.add(a)
+            if not useless_nodes:
+                return
+            for node in useless_nodes:
+                pattern.remove_node(node)
+
+    def test_remove_useless_nodes_agrees_with_reference(self):
+        rng = random.Random(0)
+        for _ in range(300):
+            n = rng.randint(1, 7)
+            code = rng.getrandbits(2*n*n)
+            for relation_class in (Relation, BitRelation):
+                pattern = Pattern.from_code(n, code, relation_class)
+                # afterwards the nodes are not their positions
+                pattern.remove_node(rng.randrange(n))
+                green_edges = [(u, v) for u in pattern.nodes for v in pattern.get_green_successors(u)]
+                red_edges = [(u, v) for u in pattern.nodes for v in pattern.get_red_successors(u)]
+                expected = Pattern(list(pattern.nodes), relation_class.from_edge_list(pattern.nodes, green_edges),
+                                   relation_class.from_edge_list(pattern.nodes, red_edges))
+                self.assertEqual(pattern.has_useless_nodes(), len(pattern.get_useless_nodes()) > 0)
+                self.remove_useless_nodes_reference(expected)
+                pattern.remove_useless_nodes()
+                self.assertEqual(pattern.nodes, expected.nodes)
+                self.assertEqual(pattern.to_code(), expected.to_code())
+                self.assertFalse(pattern.has_useless_nodes())
+
+    def test_matrix_liftings_agree_with_relation(self):
+        rng = random.Random(0)
+        for _ in range(50):
+            pattern = Pattern.from_code(4, rng.getrandbits(32))
+            pattern.remove_useless_nodes()
+            liftings = pattern.get_liftings(max_size=20)
+            matrix_liftings = pattern.get_liftings(max_size=20, vectorized=True)
+            self.assertEqual([l.to_code() for l in matrix_liftings], [l.to_code() for l in liftings])
+
+
+if __name__ == '__main__':
+    unittest.main()
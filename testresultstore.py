@@ -0,0 +1,61 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from resultstore import ResultStore
+
+
+class TestResultStoreMethods(unittest.TestCase):
+
+    def test_results_survive_reopening(self):
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, "results.db")
+        store = ResultStore(filename, batch_size=2)
+        store.add(4, 10, 3, lifting_sizes=[4, 6, 9], seconds=0.5)
+        store.add(4, 11, 5, depth_checked=12)
+        store.add(4, 12, 0)
+        self.assertEqual(store.get_classified_codes(4, 10, 12), {10, 11})
+        store.close()
+
+        store = ResultStore(filename)
+        self.assertEqual(store.get(4, 10)["lifting_sizes"], [4, 6, 9])
+        self.assertEqual(store.get_classified_codes(4, 0, 100), {10, 11, 12})
+        self.assertIsNone(store.get(5, 10))
+        self.assertTrue(store.is_classified(4, 11))
+        self.assertTrue(store.is_classified(4, 11, 12))
+        self.assertFalse(store.is_classified(4, 11, 13))
+        self.assertTrue(store.is_classified(4, 10, 22))
+        self.assertEqual(store.count_outcomes(4), [1, 0, 0, 1, 0, 1, 0])
+        store.close()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+    def test_solvers_are_counted_in_old_databases(self):
+        directory = tempfile.mkdtemp()
+        filename = os.path.join(directory, "results.db")
+        connection = sqlite3.connect(filename)
+        connection.execute("CREATE TABLE results (number_of_nodes INTEGER NOT NULL, code INTEGER NOT NULL, "
+                           "outcome INTEGER NOT NULL, homo_depth INTEGER, depth_checked INTEGER, lifting_sizes TEXT, "
+                           "seconds REAL, cnf_variables INTEGER, cnf_clauses INTEGER, "
+                           "PRIMARY KEY (number_of_nodes, code)) WITHOUT ROWID")
+        connection.execute("INSERT INTO results VALUES (5, 1, 3, 20, 19, NULL, 1.0, 100, 200)")
+        connection.commit()
+        connection.close()
+
+        store = ResultStore(filename)
+        self.assertIsNone(store.get(5, 1)["solver"])
+        store.add(5, 2, 5, depth_checked=22, solver="cadical195")
+        store.add(5, 3, 3, homo_depth=21, solver="cadical195")
+        store.add(5, 4, 3, homo_depth=21, solver="maplechrono")
+        self.assertEqual(store.count_solvers(5), {"cadical195": 2, "maplechrono": 1})
+        self.assertEqual(store.get(5, 2)["solver"], "cadical195")
+        store.close()
+        for name in os.listdir(directory):
+            os.remove(os.path.join(directory, name))
+        os.rmdir(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import random
+import unittest
+
+from pattern import Pattern
+from satsolver import IncrementalHomSolver, PortfolioSolver, SatSolver
+
+
+class TestSatSolverMethods(unittest.TestCase):
+
+    def test_code_to_cnf_agrees_with_hom_clauses(self):
+        rng = random.Random(0)
+        for _ in range(20):
+            number_of_nodes = rng.randint(1, 4)
+            code = rng.getrandbits(2*number_of_nodes*number_of_nodes)
+            pattern = Pattern.from_code(number_of_nodes, code)
+            for n in range(5):
+                expected = SatSolver.make_hom_clauses_cnf(Pattern.T_n(n), pattern).clauses
+                clauses = SatSolver.code_to_cnf(n, number_of_nodes, code).clauses
+                self.assertEqual(sorted(sorted(clause) for clause in clauses),
+                                 sorted(sorted(clause) for clause in expected))
+
+    def test_incremental_agrees_with_fresh_solver(self):
+        rng = random.Random(0)
+        for _ in range(30):
+            pattern = Pattern.from_code(3, rng.getrandbits(18))
+            incremental = IncrementalHomSolver(pattern, 6)
+            for n in range(7):
+                solver = SatSolver()
+                solver.make_hom_clauses_efficient(n, pattern)
+                expected = solver.solve()
+                if expected:
+                    homo = solver.get_homo(3)
+                    self.assertEqual(list(solver.get_image_array(3)), [homo[i] for i in range(2**n)])
+                solver.delete()
+                incremental.set_depth(n)
+                self.assertEqual(incremental.solve(), expected)
+                if expected:
+                    self.assertTrue(Pattern.is_homo(Pattern.T_n(n), pattern, incremental.get_homo()))
+                    self.assertEqual(list(incremental.get_image_array()), [incremental.get_homo()[i] for i in range(2**n)])
+            incremental.delete()
+
+    def test_arc_consistency_agrees_with_plain_cnf(self):
+        rng = random.Random(1)
+        for _ in range(40):
+            number_of_nodes = rng.randint(1, 4)
+            pattern = Pattern.from_code(number_of_nodes, rng.getrandbits(2*number_of_nodes*number_of_nodes))
+            for n in range(7):
+                solver = SatSolver()
+                solver.make_hom_clauses_efficient(n, pattern)
+                pruned = SatSolver()
+                pruned.make_hom_clauses_efficient(n, pattern, arc_consistency=True)
+                self.assertLessEqual(pruned.solver.nof_vars(), solver.solver.nof_vars())
+                satisfiable = pruned.solve()
+                self.assertEqual(satisfiable, solver.solve())
+                if satisfiable:
+                    self.assertTrue(Pattern.is_homo(Pattern.T_n(n), pattern, pruned.get_homo(number_of_nodes)))
+                solver.delete()
+                pruned.delete()
+
+    def test_portfolio_agrees_with_sat_solver(self):
+        rng = random.Random(2)
+        names = ["maplechrono", "cadical195"]
+        for _ in range(10):
+            number_of_nodes = rng.randint(1, 3)
+            pattern = Pattern.from_code(number_of_nodes, rng.getrandbits(2*number_of_nodes*number_of_nodes))
+            for n in (2, 4):
+                solver = SatSolver("glucose42")
+                solver.make_hom_clauses_efficient(n, pattern)
+                portfolio = PortfolioSolver(names)
+                portfolio.make_hom_clauses_efficient(n, pattern)
+                self.assertEqual(portfolio.get_size()[1], len(SatSolver.code_to_cnf(n, *pattern.to_code()).clauses))
+                satisfiable = portfolio.solve()
+                self.assertIn(portfolio.winner, names)
+                self.assertEqual(satisfiable, solver.solve())
+                if satisfiable:
+                    self.assertTrue(Pattern.is_homo(Pattern.T_n(n), pattern, portfolio.get_homo(number_of_nodes)))
+                solver.delete()
+                portfolio.delete()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from workerpool import WorkerPool
+
+
+# Squares the numbers it gets. A number that is negative kills the worker every time, and the first time a number
+# that is a multiple of ten arrives, the worker dies before it starts working on it.
+def square_numbers(worker, tasks, results, directory):
+    while True:
+        number = tasks.get()
+        if number is None:
+            break
+        if number < 0:
+            os._exit(1)
+        marker = os.path.join(directory, str(number))
+        if number % 10 == 0 and not os.path.exists(marker):
+            open(marker, "w").close()
+            os._exit(1)
+        results.send(("finished", worker, number, number * number))
+
+
+class TestWorkerPoolMethods(unittest.TestCase):
+
+    def test_dead_workers_are_restarted(self):
+        directory = tempfile.mkdtemp()
+        pool = WorkerPool(square_numbers, (directory,), 2, max_restarts=2)
+        squares = {}
+        given_up = []
+        numbers = list(range(1, 25)) + [-1]
+        pool.run(numbers, lambda message: squares.__setitem__(message[2], message[3]), given_up.append)
+        self.assertEqual(squares, {number: number * number for number in range(1, 25)})
+        self.assertEqual(given_up, [-1])
+        # the pool can run more tasks afterwards
+        pool.run([30, 31], lambda message: squares.__setitem__(message[2], message[3]), given_up.append)
+        self.assertEqual(squares[30], 900)
+        self.assertEqual(squares[31], 961)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
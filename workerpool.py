@@ -0,0 +1,102 @@
+from collections import deque
+from multiprocessing import Pipe, Process, Queue
+from multiprocessing.connection import wait
+
+from termcolor import colored
+
+
+# A pool of worker processes that run target(worker, tasks, results, *args). Every worker takes its tasks from its own
+# queue until it gets None, and sends a message (kind, worker, task, ...) through its own result connection for every
+# task it finishes. Since every worker has its own queue, the task of a worker is known from the moment it is handed
+# out, also if the worker dies before it starts it. And since every worker has its own connection, a worker that dies
+# while it sends a message can not block the others. A worker that dies is restarted with a new queue and connection,
+# and its task is handed out again, unless the task has already killed max_restarts workers.
+class WorkerPool:
+
+    def __init__(self, target, args, cores, max_restarts=2):
+        self.target = target
+        self.args = args
+        self.max_restarts = max_restarts
+        self.queues = [None] * cores
+        self.connections = [None] * cores
+        self.workers = [None] * cores
+        for worker in range(cores):
+            self.start_worker(worker)
+
+    def start_worker(self, worker):
+        self.queues[worker] = Queue()
+        self.connections[worker], results = Pipe(duplex=False)
+        self.workers[worker] = Process(target=self.target,
+                                       args=(worker, self.queues[worker], results) + tuple(self.args))
+        self.workers[worker].start()
+        # without the copy of the parent, the connection reports the end of the worker
+        results.close()
+
+    # Returns the messages that the worker has sent and that have not been received yet.
+    def receive_all(self, worker):
+        messages = []
+        try:
+            while self.connections[worker].poll():
+                messages.append(self.connections[worker].recv())
+        except (EOFError, OSError):
+            pass
+        return messages
+
+    # Hands out the tasks, which must be hashable, and calls handle with the message of every finished task, and
+    # give_up with every task that killed more than max_restarts workers. Returns when every task is finished or
+    # given up.
+    def run(self, tasks, handle, give_up):
+        pending = deque(tasks)
+        remaining = len(pending)
+        in_flight = {}
+        restarts = {}
+
+        def hand_out(worker):
+            if pending and self.workers[worker].is_alive():
+                in_flight[worker] = pending.popleft()
+                self.queues[worker].put(in_flight[worker])
+
+        def receive(message):
+            nonlocal remaining
+            worker, task = message[1], message[2]
+            if in_flight.get(worker) != task:
+                return
+            del in_flight[worker]
+            remaining -= 1
+            handle(message)
+            hand_out(worker)
+
+        for worker in range(len(self.workers)):
+            hand_out(worker)
+        while remaining > 0:
+            wait(self.connections, timeout=1)
+            for worker in range(len(self.workers)):
+                # a worker that is dead has sent everything, so all of it is read before its task is handed out again
+                alive = self.workers[worker].is_alive()
+                for message in self.receive_all(worker):
+                    receive(message)
+                if alive:
+                    continue
+                self.workers[worker].join()
+                self.connections[worker].close()
+                self.start_worker(worker)
+                task = in_flight.pop(worker, None)
+                if task is not None:
+                    restarts[task] = restarts.get(task, 0) + 1
+                    if restarts[task] > self.max_restarts:
+                        print(colored(f"Worker {worker} died while working on {task}, giving it up.", "red"))
+                        remaining -= 1
+                        give_up(task)
+                    else:
+                        print(colored(f"Worker {worker} died while working on {task}, restarting it.", "red"))
+                        pending.appendleft(task)
+                hand_out(worker)
+
+    # Stops all workers.
+    def close(self):
+        for tasks in self.queues:
+            tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+        for connection in self.connections:
+            connection.close()